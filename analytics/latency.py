@@ -0,0 +1,68 @@
+"""
+صدک‌های زمان پاسخ API از روی rollupهای ساعتی APIUsageRollup
+
+هر ردیف rollup هیستوگرام زمان پاسخ یک endpoint در یک ساعت (با مرزهای ثابت
+detection.rollups.RESPONSE_TIME_EDGES) است؛ بنابراین هزینه هر درخواست به تعداد
+ساعت‌ها و endpointها بستگی دارد، نه به تعداد درخواست‌های ثبت شده.
+"""
+from detection import rollups
+from detection.models import APIUsageRollup, DetectionRollup
+from detection.usage import get_config as get_usage_config
+
+
+PERCENTILES = (50, 95, 99)
+
+
+def latency_summary(since, until=None, endpoint=None):
+    """
+    خلاصه زمان پاسخ هر endpoint در بازه [since, until)
+
+    since و until به شروع ساعت گرد می‌شوند. صدک‌ها از هیستوگرام ادغام شده ساعت‌ها با
+    درون‌یابی خطی درون هر بازه تخمین زده می‌شوند (خطای نسبی حداکثر حدود ۱۲٪ یعنی پهنای
+    یک بازه؛ ۲۰ بازه هندسی در هر دهه).
+    """
+    queryset = APIUsageRollup.objects.filter(
+        bucket_start__gte=rollups.bucket_start(since, DetectionRollup.PERIOD_HOUR)
+    )
+    if until is not None:
+        queryset = queryset.filter(bucket_start__lt=rollups.bucket_start(until, DetectionRollup.PERIOD_HOUR))
+    if endpoint:
+        queryset = queryset.filter(endpoint=endpoint)
+
+    totals = {}
+    for name, count, error_count, time_sum, time_max, data in queryset.values_list(
+        'endpoint', 'count', 'error_count', 'response_time_sum', 'response_time_max', 'response_time_histogram'
+    ).order_by():
+        total = totals.get(name)
+        if total is None:
+            total = totals[name] = {
+                'count': 0, 'errors': 0, 'sum': 0.0, 'max': 0.0, 'histogram': rollups.load_response_times(b''),
+            }
+        total['count'] += count
+        total['errors'] += error_count
+        total['sum'] += time_sum
+        total['max'] = max(total['max'], time_max)
+        total['histogram'].merge(rollups.load_response_times(data))
+
+    sample_rate = get_usage_config()['SAMPLE_RATE'] or 1.0
+    summary = []
+    for name in sorted(totals):
+        total = totals[name]
+        count = total['count']
+        if not count:
+            continue
+        summary.append({
+            'endpoint': name,
+            'samples': count,
+            # تعداد تقریبی کل درخواست‌ها با نرخ نمونه‌برداری فعلی
+            'estimated_requests': round(count / sample_rate),
+            # صدک تخمینی هرگز از بیشینه واقعی بزرگ‌تر گزارش نمی‌شود
+            **{
+                f'p{p}': round(min(total['histogram'].quantile(p / 100), total['max']), 3)
+                for p in PERCENTILES
+            },
+            'max': round(total['max'], 3),
+            'mean': round(total['sum'] / count, 3),
+            'error_rate': total['errors'] / count,
+        })
+    return summary
@@ -0,0 +1,237 @@
+"""
+سری‌های زمانی ترافیک تشخیص از روی rollupهای ساعتی و روزانه
+
+هر صفحه حداکثر limit بازه متوالی (ساعت یا روز) را برمی‌گرداند؛ بازه‌های بدون
+تشخیص هم با مقدار صفر آمده‌اند. cursor صفحه بعد شروع اولین بازه آن صفحه است و
+بنابراین با اضافه شدن داده‌های جدید جابه‌جا نمی‌شود. ETag هر صفحه از پارامترهای
+کوئری، تعداد rollupهای بازه و آخرین زمان به‌روزرسانی آن‌ها ساخته می‌شود؛ تا زمانی
+که rollupهای بازه تغییر نکرده‌اند پاسخ 304 فقط یک کوئری تجمیعی روی ایندکس
+(period، bucket_start، language) هزینه دارد.
+"""
+import base64
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from detection import rollups
+from detection.language_catalog import language_catalog
+from detection.models import DetectionRollup
+
+
+METRICS = ('detections', 'confidence', 'processing_time', 'text_length')
+
+STEPS = {
+    DetectionRollup.PERIOD_HOUR: timedelta(hours=1),
+    DetectionRollup.PERIOD_DAY: timedelta(days=1),
+}
+
+# طول پیش‌فرض بازه در صورت نبود since: ۴۸ ساعت یا ۳۰ روز
+DEFAULT_SPANS = {
+    DetectionRollup.PERIOD_HOUR: 48,
+    DetectionRollup.PERIOD_DAY: 30,
+}
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+
+# ستون‌های لازم هر معیار (sketch کاربران و هیستوگرام‌های دیگر خوانده نمی‌شوند)
+_FIELDS = {
+    'detections': ('language__code', 'count'),
+    'confidence': ('count', 'confidence_sum', 'confidence_histogram'),
+    'processing_time': ('processing_time_sum', 'processing_time_count', 'processing_time_histogram'),
+    'text_length': ('count', 'text_length_histogram'),
+}
+
+
+def encode_cursor(start):
+    return base64.urlsafe_b64encode(start.isoformat().encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        start = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError('cursor نامعتبر است')
+    if timezone.is_naive(start):
+        raise ValueError('cursor نامعتبر است')
+    return start
+
+
+def _parse_moment(value, name):
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f'{name} باید تاریخ و زمان ISO 8601 باشد')
+    if timezone.is_naive(moment):
+        moment = moment.replace(tzinfo=dt_timezone.utc)
+    return moment
+
+
+class TimeSeriesQuery:
+    """
+    پارامترهای یک صفحه سری زمانی
+
+    since و until به مرز بازه‌ها گرد می‌شوند (until شامل بازه جاری است)؛ بنابراین
+    درخواست‌های تکراری داشبورد در طول یک بازه همان ETag را دارند.
+    """
+
+    def __init__(self, metric, period, since, until, limit=DEFAULT_LIMIT, cursor=None, language=None):
+        self.metric = metric
+        self.period = period
+        self.step = STEPS[period]
+        self.since = rollups.bucket_start(since, period)
+        self.until = rollups.bucket_start(until, period) + self.step
+        self.language = language
+        self.limit = limit
+
+        self.start = self.since
+        if cursor:
+            self.start = rollups.bucket_start(decode_cursor(cursor), period)
+            if not self.since <= self.start < self.until:
+                raise ValueError('cursor خارج از بازه since تا until است')
+        self.end = min(self.start + self.step * limit, self.until)
+
+    @classmethod
+    def from_params(cls, metric, params):
+        """ساخت کوئری از پارامترهای GET؛ ValueError برای مقادیر نامعتبر"""
+        if metric not in METRICS:
+            raise ValueError(f'معیار نامعتبر؛ مقادیر مجاز: {", ".join(METRICS)}')
+
+        period = params.get('period', DetectionRollup.PERIOD_HOUR)
+        if period not in STEPS:
+            raise ValueError('period باید hour یا day باشد')
+
+        until = _parse_moment(params['until'], 'until') if params.get('until') else timezone.now()
+        if params.get('since'):
+            since = _parse_moment(params['since'], 'since')
+        else:
+            since = until - STEPS[period] * (DEFAULT_SPANS[period] - 1)
+        if since > until:
+            raise ValueError('since باید پیش از until باشد')
+
+        limit = params.get('limit', str(DEFAULT_LIMIT))
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_LIMIT:
+            raise ValueError(f'limit باید عدد صحیح بین 1 و {MAX_LIMIT} باشد')
+
+        language = None
+        if params.get('language'):
+            language = language_catalog.get(params['language'])
+            if language is None:
+                raise ValueError('زبان یافت نشد')
+
+        return cls(metric, period, since, until, int(limit), params.get('cursor'), language)
+
+    def queryset(self):
+        queryset = DetectionRollup.objects.filter(
+            period=self.period, bucket_start__gte=self.start, bucket_start__lt=self.end
+        )
+        if self.language is not None:
+            queryset = queryset.filter(language=self.language)
+        return queryset.order_by()
+
+    def etag(self):
+        """شناسه نسخه داده‌های این صفحه (بدون خواندن هیستوگرام‌ها)"""
+        state = self.queryset().aggregate(rows=Count('id'), updated=Max('updated_at'))
+        key = '|'.join(str(part) for part in (
+            self.metric, self.period, self.start.isoformat(), self.end.isoformat(), self.until.isoformat(),
+            self.language.code if self.language else '', state['rows'],
+            state['updated'].isoformat() if state['updated'] else '',
+        ))
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+    def next_cursor(self):
+        return encode_cursor(self.end) if self.end < self.until else None
+
+    def intervals(self):
+        start = self.start
+        while start < self.end:
+            yield start
+            start += self.step
+
+    def run(self):
+        """داده‌های صفحه: دیکشنری قابل تبدیل به JSON"""
+        rows = {}
+        fields = _FIELDS[self.metric]
+        for row in self.queryset().values_list('bucket_start', *fields):
+            rows.setdefault(row[0], []).append(row[1:])
+
+        build = getattr(self, f'_{self.metric}')
+        data = {
+            'metric': self.metric,
+            'period': self.period,
+            'since': self.since.isoformat(),
+            'until': self.until.isoformat(),
+            'language': self.language.code if self.language else None,
+            'next_cursor': self.next_cursor(),
+        }
+        data.update(build(rows))
+        return data
+
+    def _detections(self, rows):
+        series = []
+        for start in self.intervals():
+            languages = {}
+            for code, count in rows.get(start, ()):
+                key = code or 'unknown'
+                languages[key] = languages.get(key, 0) + count
+            series.append({
+                'start': start.isoformat(),
+                'total': sum(languages.values()),
+                'languages': languages,
+            })
+        return {'intervals': series}
+
+    def _merged(self, rows, field, column):
+        histogram = rollups.load_histogram(b'', field)
+        for row in rows:
+            histogram.merge(rollups.load_histogram(row[column], field))
+        return histogram
+
+    def _confidence(self, rows):
+        series = []
+        for start in self.intervals():
+            interval_rows = rows.get(start, ())
+            histogram = self._merged(interval_rows, 'confidence_histogram', 2)
+            count = sum(row[0] for row in interval_rows)
+            series.append({
+                'start': start.isoformat(),
+                'count': count,
+                'avg_confidence': round(sum(row[1] for row in interval_rows) / count, 4) if count else None,
+                'histogram': histogram.counts.tolist(),
+            })
+        bounds = rollups.load_histogram(b'', 'confidence_histogram').bounds()
+        return {'bins': [[lower, upper if upper is not None else 1.0] for lower, upper in bounds], 'intervals': series}
+
+    def _processing_time(self, rows):
+        series = []
+        for start in self.intervals():
+            interval_rows = rows.get(start, ())
+            histogram = self._merged(interval_rows, 'processing_time_histogram', 2)
+            count = sum(row[1] for row in interval_rows)
+            item = {
+                'start': start.isoformat(),
+                'count': count,
+                'mean_ms': round(sum(row[0] for row in interval_rows) / count * 1000, 3) if count else None,
+            }
+            for q in QUANTILES:
+                value = histogram.quantile(q)
+                item[f'p{q * 100:g}_ms'] = round(value * 1000, 3) if value is not None else None
+            series.append(item)
+        return {'quantiles': list(QUANTILES), 'intervals': series}
+
+    def _text_length(self, rows):
+        series = []
+        for start in self.intervals():
+            interval_rows = rows.get(start, ())
+            histogram = self._merged(interval_rows, 'text_length_histogram', 1)
+            series.append({
+                'start': start.isoformat(),
+                'count': sum(row[0] for row in interval_rows),
+                'histogram': histogram.counts.tolist(),
+            })
+        bounds = rollups.load_histogram(b'', 'text_length_histogram').bounds()
+        return {'bins': [[int(lower), upper] for lower, upper in bounds], 'intervals': series}
@@ -1,6 +1,10 @@
 from django.urls import path
+from . import views
 
 app_name = 'analytics'
 urlpatterns = [
-
+    # صدک‌های زمان پاسخ هر endpoint API از روی rollupهای ساعتی APIUsageRollup
+    path('api/latency/', views.api_latency, name='api_latency'),
+    # سری‌های زمانی تعداد تشخیص، اطمینان، زمان پردازش و طول متن از روی rollupها
+    path('api/timeseries/<str:metric>/', views.api_timeseries, name='api_timeseries'),
 ]
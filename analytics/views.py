@@ -1,3 +1,64 @@
-from django.shortcuts import render
+from datetime import timedelta
 
-# Create your views here.
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_http_methods
+
+from detection.usage import get_config as get_usage_config
+from .latency import latency_summary
+from .timeseries import TimeSeriesQuery
+
+
+@require_http_methods(["GET"])
+def api_latency(request):
+    """
+    صدک‌های p50/p95/p99 زمان پاسخ (میلی‌ثانیه) هر endpoint API (فقط کارکنان)
+
+    پارامترهای اختیاری: hours (طول بازه تا اکنون، پیش‌فرض 24 و حداکثر 720) و endpoint
+    (مسیر دقیق، مثلاً /api/detect/). بازه به ساعت کامل گرد می‌شود.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'دسترسی غیرمجاز', 'success': False}, status=403)
+    
+    hours = request.GET.get('hours', '24')
+    if not hours.isdigit() or not 1 <= int(hours) <= 720:
+        return JsonResponse({'error': 'hours باید عدد صحیح بین 1 و 720 باشد', 'success': False}, status=400)
+    
+    since = timezone.now() - timedelta(hours=int(hours))
+    return JsonResponse({
+        'success': True,
+        'since': since.isoformat(),
+        'sample_rate': get_usage_config()['SAMPLE_RATE'],
+        'endpoints': latency_summary(since, endpoint=request.GET.get('endpoint')),
+    })
+
+
+@require_http_methods(["GET"])
+def api_timeseries(request, metric):
+    """
+    سری زمانی ترافیک تشخیص از روی rollupها (فقط کارکنان)
+
+    metric: detections (تعداد هر زبان)، confidence (هیستوگرام اطمینان)، processing_time
+    (صدک‌های زمان پردازش) یا text_length (هیستوگرام طول متن).
+    پارامترهای اختیاری: period (hour یا day)، since و until (ISO 8601)، language (کد زبان)،
+    limit (تعداد بازه‌های هر صفحه) و cursor (مقدار next_cursor صفحه قبل).
+    با If-None-Match برابر ETag قبلی و بدون تغییر rollupها پاسخ 304 برگردانده می‌شود.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'دسترسی غیرمجاز', 'success': False}, status=403)
+    
+    try:
+        query = TimeSeriesQuery.from_params(metric, request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e), 'success': False}, status=400)
+    
+    etag = quote_etag(query.etag())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse({'success': True, **query.run()})
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'ANALYTICS_TIMESERIES_MAX_AGE', 5))
+    return response
@@ -1,7 +1,20 @@
+from django.conf import settings
 from rest_framework import serializers
 
 class LanguageDetectionInputSerializer(serializers.Serializer):
     text = serializers.CharField()
+    top_k = serializers.IntegerField(required=False, min_value=1)
+
+class LanguageDetectionBatchInputSerializer(serializers.Serializer):
+    # متن خالی کل درخواست را رد نمی‌کند؛ برای همان مورد در پاسخ خطا برگردانده می‌شود
+    texts = serializers.ListField(child=serializers.CharField(allow_blank=True), allow_empty=False)
+    top_k = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_texts(self, value):
+        max_size = getattr(settings, 'DETECTION_BATCH_MAX_SIZE', 1000)
+        if len(value) > max_size:
+            raise serializers.ValidationError(f'حداکثر {max_size} متن در هر درخواست قابل پردازش است.')
+        return value
 
 class LanguageDetectionResultSerializer(serializers.Serializer):
     detected_language = serializers.CharField()
@@ -14,4 +27,13 @@ class LanguageDetectionResultSerializer(serializers.Serializer):
 class SupportedLanguageSerializer(serializers.Serializer):
     code = serializers.CharField()
     name = serializers.CharField()
-    native_name = serializers.CharField()
\ No newline at end of file
+    native_name = serializers.CharField()
+class DetectionHistorySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    input_text = serializers.CharField()
+    detected_language = serializers.CharField(source='detected_language.code', default=None)
+    confidence_score = serializers.FloatField()
+    processing_time = serializers.FloatField()
+    text_length = serializers.IntegerField()
+    word_count = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
@@ -1,7 +1,14 @@
 from django.urls import path
-from .views import LanguageDetectAPIView, SupportedLanguagesAPIView
+from .views import (
+    DetectionHistoryAPIView, LanguageDetectAPIView, LanguageDetectAsyncAPIView, LanguageDetectBatchAPIView,
+    SupportedLanguagesAPIView, detect_stream_view,
+)
 
 urlpatterns = [
     path('detect/', LanguageDetectAPIView.as_view(), name='api_detect'),
+    path('detect/async/', LanguageDetectAsyncAPIView.as_view(), name='api_detect_async'),
+    path('detect/batch/', LanguageDetectBatchAPIView.as_view(), name='api_detect_batch'),
+    path('detect/stream/', detect_stream_view, name='api_detect_stream'),
     path('languages/', SupportedLanguagesAPIView.as_view(), name='api_languages'),
+    path('history/', DetectionHistoryAPIView.as_view(), name='api_history'),
 ]
@@ -1,10 +1,30 @@
+from django.conf import settings
 from django.shortcuts import render
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from django.utils.decorators import method_decorator
+from django.views import View
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from detection.language_detector import LanguageDetector
-from detection.models import Language
-from .serializers import LanguageDetectionInputSerializer, LanguageDetectionResultSerializer, SupportedLanguageSerializer
+from rest_framework.permissions import IsAuthenticated
+from detection.registry import get_detector
+from detection.streaming import detect_stream, iter_lines, to_ndjson
+from detection.executor import InferenceBusy
+from detection.history_writer import alog_detection, build_detection, log_detections
+from detection.language_catalog import language_catalog
+from detection.metrics import bind_endpoint, stage
+from detection.models import DetectionHistory
+from detection.pagination import history_count, keyset_page
+from detection.views import arun_detection, get_client_ip, run_detection
+from .serializers import (
+    DetectionHistorySerializer, LanguageDetectionInputSerializer, LanguageDetectionBatchInputSerializer,
+    LanguageDetectionResultSerializer, SupportedLanguageSerializer,
+)
+import json
+import time
 
 # Create your views here.
 
@@ -13,13 +33,10 @@ class LanguageDetectAPIView(APIView):
         serializer = LanguageDetectionInputSerializer(data=request.data)
         if serializer.is_valid():
             text = serializer.validated_data['text']
-            detector = LanguageDetector()
-            import time
-            start_time = time.time()
-            result = detector.predict_with_confidence(text)
-            processing_time = time.time() - start_time
-            # Try to get language name from DB
-            lang_obj = Language.objects.filter(code=result['predicted_language']).first()
+            result, processing_time = run_detection(text, serializer.validated_data.get('top_k'))
+            # Try to get language name from the cached catalog
+            with stage('db_lookup'):
+                lang_obj = language_catalog.get(result['predicted_language'])
             detected_language = lang_obj.name if lang_obj else result['predicted_language']
             output = {
                 'detected_language': detected_language,
@@ -32,8 +49,194 @@ class LanguageDetectAPIView(APIView):
             return Response(output)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@method_decorator(csrf_exempt, name='dispatch')
+class LanguageDetectAsyncAPIView(View):
+    """
+    نسخه async از LanguageDetectAPIView برای اجرا با ASGI (DRF از viewهای async پشتیبانی نمی‌کند)
+
+    ورودی با همان serializer اعتبارسنجی می‌شود، محاسبه در executor محدود انجام
+    می‌شود و تاریخچه از طریق صف write-behind ثبت می‌شود.
+    """
+    http_method_names = ['post']
+
+    async def post(self, request):
+        try:
+            with stage('parse'):
+                data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+        except json.JSONDecodeError:
+            return JsonResponse({'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = LanguageDetectionInputSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        text = serializer.validated_data['text']
+        try:
+            result, processing_time = await arun_detection(text, serializer.validated_data.get('top_k'))
+        except InferenceBusy as e:
+            return JsonResponse({'detail': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        code = result['predicted_language']
+        with stage('db_lookup'):
+            language = await sync_to_async(language_catalog.get_or_create)(code) if code else None
+        if language is not None:
+            user = await request.auser()
+            with stage('db_write'):
+                await alog_detection(
+                    user=user if user.is_authenticated else None,
+                    input_text=text,
+                    detected_language=language,
+                    confidence_score=result['confidence'],
+                    processing_time=processing_time,
+                    ip_address=get_client_ip(request),
+                    user_agent=request.META.get('HTTP_USER_AGENT', '')
+                )
+        with stage('serialize'):
+            return JsonResponse({
+                'detected_language': language.name if language else code,
+                'confidence': round(result['confidence'] * 100, 1),
+                'all_probabilities': {k: round(v * 100, 1) for k, v in result['all_probabilities'].items()},
+                'processing_time': processing_time,
+                'text_length': result['text_length'],
+                'word_count': len(text.split()),
+            })
+
+class LanguageDetectBatchAPIView(APIView):
+    def post(self, request):
+        serializer = LanguageDetectionBatchInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        texts = serializer.validated_data['texts']
+        detector = get_detector()
+        start_time = time.time()
+        with stage('inference'):
+            results = detector.predict_batch(texts, top_k=serializer.validated_data.get('top_k'))
+        processing_time = time.time() - start_time
+
+        # یک رکورد زبان برای هر کد متمایز، نه برای هر متن
+        languages = {}
+        with stage('db_lookup'):
+            for code in {result['predicted_language'] for result in results if result['predicted_language']}:
+                languages[code] = language_catalog.get_or_create(code)
+
+        # ذخیره تاریخچه همه متن‌ها با bulk_create (write-behind)
+        per_item_time = processing_time / len(texts)
+        user = request.user if request.user.is_authenticated else None
+        ip_address = get_client_ip(request)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        with stage('db_write'):
+            log_detections([
+                build_detection(
+                    user=user,
+                    input_text=text,
+                    detected_language=languages[result['predicted_language']],
+                    confidence_score=result['confidence'],
+                    processing_time=per_item_time,
+                    ip_address=ip_address,
+                    user_agent=user_agent
+                )
+                for text, result in zip(texts, results) if result['predicted_language']
+            ])
+
+        output = []
+        with stage('serialize'):
+            for text, result in zip(texts, results):
+                if not result['predicted_language']:
+                    # متن خالی (یا بدون محتوای قابل تشخیص) فقط همان مورد را ناموفق می‌کند
+                    output.append({
+                        'detected_language': None,
+                        'language_code': None,
+                        'error': 'متن خالی است یا پس از پیش‌پردازش محتوایی برای تشخیص ندارد.',
+                        'text_length': len(text),
+                        'word_count': len(text.split()),
+                    })
+                    continue
+                language = languages.get(result['predicted_language'])
+                output.append({
+                    'detected_language': language.name if language else None,
+                    'language_code': result['predicted_language'],
+                    'confidence': round(result['confidence'] * 100, 1),
+                    'all_probabilities': {k: round(v * 100, 1) for k, v in result['all_probabilities'].items()},
+                    'text_length': result['text_length'],
+                    'word_count': len(text.split()),
+                })
+        return Response({
+            'results': output,
+            'count': len(output),
+            'processing_time': processing_time,
+        })
+
 class SupportedLanguagesAPIView(APIView):
     def get(self, request):
-        languages = Language.objects.filter(is_active=True)
+        languages = language_catalog.active()
         serializer = SupportedLanguageSerializer(languages, many=True)
         return Response(serializer.data)
+
+
+class DetectionHistoryAPIView(APIView):
+    """
+    تاریخچه تشخیص‌های کاربر جاری با صفحه‌بندی keyset (جدیدترین اول)
+
+    پارامترها: page_size (پیش‌فرض 20، حداکثر 100) و cursor (مقدار next یا previous
+    پاسخ قبلی). count تقریبی است.
+    """
+    permission_classes = [IsAuthenticated]
+    max_page_size = 100
+
+    def get(self, request):
+        page_size = request.query_params.get('page_size', '20')
+        if not page_size.isdigit() or not 1 <= int(page_size) <= self.max_page_size:
+            return Response(
+                {'error': f'page_size باید عدد صحیح بین 1 و {self.max_page_size} باشد'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        detections = DetectionHistory.objects.filter(user=request.user).select_related('detected_language')
+        try:
+            page = keyset_page(detections, request.query_params.get('cursor'), page_size=int(page_size))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'count': history_count(request.user),
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+            'results': DetectionHistorySerializer(page.object_list, many=True).data,
+        })
+
+
+def _request_body_stream(request):
+    """
+    stream بدنه درخواست بدون خواندن کامل آن
+
+    جنگو در WSGI بدنه بدون Content-Length را خالی در نظر می‌گیرد؛ برای درخواست‌های
+    chunked در صورتی که سرور پایان ورودی را مشخص کند (wsgi.input_terminated، مانند
+    gunicorn) مستقیماً از wsgi.input خوانده می‌شود.
+    """
+    environ = getattr(request, 'environ', {})
+    if not environ.get('CONTENT_LENGTH') and environ.get('wsgi.input_terminated'):
+        return environ['wsgi.input']
+    return request
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def detect_stream_view(request):
+    """
+    تشخیص زبان جریانی: بدنه NDJSON (هر خط یک رشته یا شیء با کلید text و id اختیاری)
+    و پاسخ NDJSON به همان ترتیب؛ ورودی در دسته‌های کوچک پردازش می‌شود.
+    پارامترهای اختیاری: top_k و field (نام کلید متن، پیش‌فرض text)
+    """
+    top_k = request.GET.get('top_k')
+    if top_k is not None:
+        if not top_k.isdigit() or int(top_k) < 1:
+            return JsonResponse({'error': 'top_k باید عدد صحیح مثبت باشد'}, status=400)
+        top_k = int(top_k)
+    field = request.GET.get('field', 'text')
+
+    detector = get_detector()
+    if detector.model is None:
+        return JsonResponse({'error': 'مدل آموزش داده نشده است.'}, status=503)
+
+    max_line_bytes = getattr(settings, 'DETECTION_STREAM_MAX_LINE_BYTES', 1024 * 1024)
+    lines = iter_lines(_request_body_stream(request), max_line_bytes)
+    results = detect_stream(lines, detector, top_k=top_k, field=field)
+    return StreamingHttpResponse(bind_endpoint(to_ndjson(results)), content_type='application/x-ndjson; charset=utf-8')
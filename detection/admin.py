@@ -1,8 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Language, DetectionHistory, ModelTrainingLog, UserFeedback, APIUsage
+from . import rollups, training_jobs
+from .model_versions import ModelVersionError
+from .models import (
+    Language, DetectionHistory, DetectionRollup, ModelTrainingLog, TrainingJob, UserFeedback, APIUsage, APIUsageRollup,
+)
 
 
 @admin.register(Language)
@@ -13,13 +17,18 @@ class LanguageAdmin(admin.ModelAdmin):
     list_editable = ['is_active']
     ordering = ['name']
     
+    def get_queryset(self, request):
+        # تعداد تشخیص همه ردیف‌ها در همان کوئری فهرست، از روی rollupها
+        return super().get_queryset(request).annotate(detection_total=rollups.language_count_subquery())
+    
     def detection_count(self, obj):
-        count = obj.detectionhistory_set.count()
+        count = obj.detection_total
         if count > 0:
             url = reverse('admin:detection_detectionhistory_changelist')
             return format_html('<a href="{}?detected_language__id={}">{} تشخیص</a>', url, obj.id, count)
         return '0 تشخیص'
     detection_count.short_description = 'تعداد تشخیص'
+    detection_count.admin_order_field = 'detection_total'
 
 
 @admin.register(DetectionHistory)
@@ -75,6 +84,7 @@ class ModelTrainingLogAdmin(admin.ModelAdmin):
     search_fields = ['version', 'notes']
     readonly_fields = ['created_at']
     ordering = ['-created_at']
+    actions = ['activate_version']
     
     fieldsets = (
         ('اطلاعات مدل', {
@@ -97,7 +107,8 @@ class ModelTrainingLogAdmin(admin.ModelAdmin):
             color = 'orange'
         else:
             color = 'red'
-        return format_html('<span style="color: {}; font-weight: bold;">{:.2f}%</span>', color, percentage)
+        # format_html آرگومان‌ها را به رشته escape شده تبدیل می‌کند؛ قالب‌بندی عدد پیش از آن
+        return format_html('<span style="color: {}; font-weight: bold;">{}%</span>', color, f'{percentage:.2f}')
     accuracy_display.short_description = 'دقت'
     
     def training_time_display(self, obj):
@@ -108,6 +119,38 @@ class ModelTrainingLogAdmin(admin.ModelAdmin):
             seconds = obj.training_time % 60
             return f'{int(minutes)}m {seconds:.1f}s'
     training_time_display.short_description = 'زمان آموزش'
+    
+    @admin.action(description='فعال‌سازی نسخه انتخاب شده (rollback)')
+    def activate_version(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'دقیقاً یک نسخه را انتخاب کنید.', messages.ERROR)
+            return
+        training_log = queryset.get()
+        try:
+            detector = training_jobs.activate_version(training_log.version)
+        except ModelVersionError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        self.message_user(
+            request, f'نسخه {training_log.version} ({detector.model_version}) فعال شد.', messages.SUCCESS
+        )
+
+
+@admin.register(TrainingJob)
+class TrainingJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'progress_display', 'stage', 'worker', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['status', 'progress', 'stage', 'parameters', 'error', 'worker', 'training_log',
+                       'created_by', 'created_at', 'started_at', 'heartbeat_at', 'attempts', 'finished_at']
+    ordering = ['-created_at']
+    
+    def has_add_permission(self, request):
+        # کارها از صفحه آموزش مدل ثبت می‌شوند
+        return False
+    
+    def progress_display(self, obj):
+        return f'{obj.progress * 100:.0f}%'
+    progress_display.short_description = 'پیشرفت'
 
 
 @admin.register(UserFeedback)
@@ -161,10 +204,50 @@ class APIUsageAdmin(admin.ModelAdmin):
             color = 'orange'
         else:
             color = 'red'
-        return format_html('<span style="color: {};">{:.1f}ms</span>', color, obj.response_time)
+        return format_html('<span style="color: {};">{}ms</span>', color, f'{obj.response_time:.1f}')
     response_time_display.short_description = 'زمان پاسخ'
 
 
+@admin.register(DetectionRollup)
+class DetectionRollupAdmin(admin.ModelAdmin):
+    list_display = ['bucket_start', 'period', 'language', 'count', 'avg_confidence_display', 'updated_at']
+    list_filter = ['period', 'language']
+    date_hierarchy = 'bucket_start'
+    list_per_page = 100
+    exclude = ['users_sketch', 'confidence_histogram', 'processing_time_histogram', 'text_length_histogram']
+    
+    def has_add_permission(self, request):
+        # rollupها فقط از روی تاریخچه ساخته می‌شوند
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def avg_confidence_display(self, obj):
+        return f"{obj.confidence_sum / obj.count * 100:.1f}%" if obj.count else '-'
+    avg_confidence_display.short_description = 'میانگین اطمینان'
+
+
+@admin.register(APIUsageRollup)
+class APIUsageRollupAdmin(admin.ModelAdmin):
+    list_display = ['bucket_start', 'endpoint', 'count', 'error_count', 'mean_response_time_display', 'updated_at']
+    list_filter = ['endpoint']
+    date_hierarchy = 'bucket_start'
+    list_per_page = 100
+    exclude = ['response_time_histogram']
+    
+    def has_add_permission(self, request):
+        # rollupها فقط از روی رکوردهای APIUsage ساخته می‌شوند
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def mean_response_time_display(self, obj):
+        return f"{obj.response_time_sum / obj.count:.1f}ms" if obj.count else '-'
+    mean_response_time_display.short_description = 'میانگین زمان پاسخ'
+
+
 # تنظیمات سایت ادمین
 admin.site.site_header = "مدیریت سیستم تشخیص زبان"
 admin.site.site_title = "تشخیص زبان"
@@ -0,0 +1,277 @@
+"""
+micro-batching درخواست‌های همزمان تشخیص تکی
+
+درخواست‌های تک‌متنی که تقریباً همزمان می‌رسند در یک صف قرار می‌گیرند و یک thread
+پس‌زمینه آن‌ها را حداکثر MAX_WAIT_MS میلی‌ثانیه (از رسیدن اولین درخواست دسته) یا تا
+رسیدن به MAX_BATCH_SIZE جمع می‌کند و با یک فراخوانی برداری predict_many پاسخ
+می‌دهد؛ هر فراخوانی‌کننده سهم خود از نتیجه را از طریق یک Future دریافت می‌کند.
+
+درخواست همگامی که به تنهایی می‌رسد (هیچ تشخیص دیگری در جریان نیست) مستقیماً در
+همان thread پاسخ داده می‌شود و هزینه صف و جابه‌جایی thread را نمی‌پردازد. پنجره
+انتظار هم فقط زیر بار (وقتی دسته قبلی بیش از یک درخواست داشت) اعمال می‌شود.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+
+from .executor import InferenceBusy, run_inference
+from .metrics import current_endpoint, endpoint, metrics
+from .registry import get_detector
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_BATCH_SIZE': 64,
+    'MAX_WAIT_MS': 1.0,
+    'MAX_QUEUE_SIZE': 1024,
+    'TIMEOUT_MS': 5000,
+}
+
+# مرزهای بالای بازه‌های توزیع اندازه دسته
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DETECTION_MICRO_BATCHING', {}))
+    return config
+
+
+class MicroBatcher:
+    """
+    تجمیع درخواست‌های تشخیص تکی در دسته‌های برداری
+
+    تأخیر اضافه هر درخواست حداکثر max_wait ثانیه (به اضافه زمان پردازش دسته) است.
+    درخواست‌ها با top_k متفاوت در یک دسته، در گروه‌های جداگانه امتیازدهی می‌شوند.
+    اگر صف پر باشد InferenceBusy ایجاد می‌شود. اگر نتیجه دسته تا timeout ثانیه
+    آماده نشود، متن مستقیماً تشخیص داده می‌شود.
+    """
+
+    def __init__(self, max_batch_size=64, max_wait=0.001, max_queue_size=1024, timeout=5.0,
+                 detector_getter=get_detector):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout
+        self._get_detector = detector_getter
+
+        self.batches = 0
+        self.items = 0
+        self.direct = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.max_depth = 0
+        self.wait_seconds = 0.0
+        self.batch_sizes = dict.fromkeys(BATCH_SIZE_BUCKETS + (None,), 0)
+
+        self._lock = threading.Lock()
+        self._active_lock = threading.Lock()
+        # تعداد تشخیص‌های در جریان (همگام و async) در این پروسس
+        self._active = 0
+        self._last_batch_size = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    @classmethod
+    def from_settings(cls):
+        config = get_config()
+        return cls(
+            max_batch_size=config['MAX_BATCH_SIZE'],
+            max_wait=config['MAX_WAIT_MS'] / 1000,
+            max_queue_size=config['MAX_QUEUE_SIZE'],
+            timeout=config['TIMEOUT_MS'] / 1000,
+        )
+
+    @property
+    def enabled(self):
+        return get_config()['ENABLED'] and self.max_batch_size > 1
+
+    def _ensure_started(self):
+        # پس از fork (مثلاً gunicorn --preload) thread والد در فرزند وجود ندارد
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._thread = threading.Thread(target=self._run, name='detection-micro-batcher', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, text, top_k=None):
+        """قرار دادن یک متن در صف؛ خروجی: Future نتیجه predict_with_confidence"""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((text, top_k, future, time.monotonic(), current_endpoint()))
+        except queue.Full:
+            self.rejected += 1
+            raise InferenceBusy('صف تشخیص پر است؛ بعداً دوباره تلاش کنید')
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return future
+
+    def _enter(self):
+        """ثبت شروع یک تشخیص؛ خروجی: True اگر تشخیص دیگری در جریان نباشد"""
+        with self._active_lock:
+            self._active += 1
+            return self._active == 1
+
+    def _exit(self):
+        with self._active_lock:
+            self._active -= 1
+
+    def predict(self, text, top_k=None, timeout=None):
+        """
+        تشخیص همگام یک متن از طریق دسته‌بندی
+
+        اگر تشخیص دیگری در جریان نباشد، دسته‌ای برای تشکیل وجود ندارد و متن مستقیماً
+        در همین thread تشخیص داده می‌شود.
+        """
+        alone = self._enter()
+        try:
+            if alone:
+                self.direct += 1
+                return self._get_detector().predict_with_confidence(text, top_k=top_k)
+            future = self.submit(text, top_k)
+            try:
+                return future.result(self.timeout if timeout is None else timeout)
+            except FutureTimeoutError:
+                self._timed_out(future)
+                return self._get_detector().predict_with_confidence(text, top_k=top_k)
+        finally:
+            self._exit()
+
+    async def apredict(self, text, top_k=None):
+        """تشخیص یک متن در viewهای async بدون اشغال thread"""
+        self._enter()
+        try:
+            future = self.submit(text, top_k)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except asyncio.TimeoutError:
+                self._timed_out(future)
+                return await run_inference(self._get_detector().predict_with_confidence, text, top_k=top_k)
+        finally:
+            self._exit()
+
+    def _timed_out(self, future):
+        # درخواست هنوز برداشته نشده باشد از دسته حذف می‌شود؛ در غیر این صورت نتیجه دور ریخته می‌شود
+        future.cancel()
+        self.timeouts += 1
+        logger.warning('نتیجه micro-batching در %g ثانیه آماده نشد؛ تشخیص مستقیم', self.timeout)
+
+    def _next_batch(self):
+        """
+        انتظار برای اولین درخواست و جمع‌آوری بقیه تا max_wait پس از رسیدن آن
+
+        اگر دسته قبلی تک‌درخواستی بود (بار کم) فقط درخواست‌های موجود در صف برداشته
+        می‌شوند و انتظاری برای درخواست‌های بعدی نیست.
+        """
+        batch = [self._queue.get()]
+        wait = self.max_wait if self._last_batch_size > 1 else 0.0
+        deadline = batch[0][3] + wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._last_batch_size = len(batch)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.exception('خطا در پردازش دسته %d تایی تشخیص', len(batch))
+                # هیچ فراخوانی‌کننده‌ای نباید برای همیشه منتظر بماند
+                for _, _, future, _, _ in batch:
+                    try:
+                        future.set_exception(e)
+                    except InvalidStateError:
+                        # نتیجه آماده شده یا درخواست پس از timeout لغو شده است
+                        pass
+
+    def _process(self, batch):
+        started = time.monotonic()
+        self._record(batch, started)
+
+        groups = {}
+        for item in batch:
+            # درخواست‌هایی که پس از timeout لغو شده‌اند پردازش نمی‌شوند
+            if item[2].set_running_or_notify_cancel():
+                groups.setdefault(item[1], []).append(item)
+
+        detector = self._get_detector()
+        for top_k, items in groups.items():
+            try:
+                # مراحل پیش پردازش تا امتیازدهی برای کل دسته یک بار اجرا می‌شوند
+                with endpoint('micro_batch'):
+                    results = detector.predict_many([text for text, _, _, _, _ in items], top_k=top_k)
+            except Exception as e:
+                for _, _, future, _, _ in items:
+                    future.set_exception(e)
+                continue
+            for (_, _, future, _, _), result in zip(items, results):
+                future.set_result(result)
+
+    def _record(self, batch, started):
+        self.batches += 1
+        self.items += len(batch)
+        self.wait_seconds += sum(started - enqueued for _, _, _, enqueued, _ in batch)
+        for _, _, _, enqueued, endpoint_name in batch:
+            # زمان انتظار در صف به حساب endpoint درخواست‌کننده ثبت می‌شود
+            metrics.record_stage('batch_wait', int((started - enqueued) * 1e9), endpoint_name)
+        for bound in BATCH_SIZE_BUCKETS:
+            if len(batch) <= bound:
+                self.batch_sizes[bound] += 1
+                break
+        else:
+            self.batch_sizes[None] += 1
+
+    def pending(self):
+        """تعداد درخواست‌های منتظر در صف"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self):
+        return {
+            'queue_depth': self.pending(),
+            'max_queue_depth': self.max_depth,
+            'batches': self.batches,
+            'items': self.items,
+            'direct': self.direct,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'avg_batch_size': self.items / self.batches if self.batches else 0.0,
+            'avg_wait_ms': self.wait_seconds / self.items * 1000 if self.items else 0.0,
+            'batch_size_distribution': {
+                f'<={bound}' if bound is not None else f'>{BATCH_SIZE_BUCKETS[-1]}': count
+                for bound, count in self.batch_sizes.items()
+            },
+        }
+
+
+micro_batcher = MicroBatcher.from_settings()
+
+
+def detect_text(text, top_k=None):
+    """تشخیص یک متن؛ در صورت فعال بودن micro-batching از طریق دسته‌بندی"""
+    if micro_batcher.enabled:
+        return micro_batcher.predict(text, top_k)
+    return get_detector().predict_with_confidence(text, top_k=top_k)
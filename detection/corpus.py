@@ -0,0 +1,114 @@
+"""
+خواندن جریانی داده آموزشی تشخیص زبان از فایل‌های روی دیسک
+
+ساختار یک corpus (نام زبان همان برچسب آموزش است):
+    <root>/<language>.txt          هر خط یک نمونه
+    <root>/<language>.jsonl        هر خط یک رشته JSON یا شیء با کلید text
+    <root>/<language>/*.txt|jsonl  چند shard برای یک زبان
+
+نمونه‌ها با generator و خط به خط خوانده می‌شوند؛ بنابراین حافظه مصرفی به اندازه
+corpus بستگی ندارد و آموزش با بردارساز hashing و partial_fit روی قطعه‌ها انجام
+می‌شود.
+"""
+import os
+from itertools import islice
+
+from django.conf import settings
+
+from .streaming import parse_line
+
+
+EXTENSIONS = ('.txt', '.jsonl')
+
+
+def default_corpus_path():
+    return getattr(settings, 'DETECTION_CORPUS_PATH',
+                   os.path.join(settings.BASE_DIR, 'detection', 'training_data'))
+
+
+class CorpusError(Exception):
+    """ساختار corpus نامعتبر است"""
+
+
+class Corpus:
+    def __init__(self, path=None):
+        self.path = path or default_corpus_path()
+        if not os.path.isdir(self.path):
+            raise CorpusError(f'پوشه corpus یافت نشد: {self.path}')
+        self._shards = self._discover()
+        if not self._shards:
+            raise CorpusError(f'هیچ فایل {"/".join(EXTENSIONS)} در {self.path} یافت نشد')
+
+    def _discover(self):
+        shards = {}
+        for entry in sorted(os.scandir(self.path), key=lambda entry: entry.name):
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir():
+                files = sorted(
+                    os.path.join(entry.path, name) for name in os.listdir(entry.path)
+                    if name.endswith(EXTENSIONS) and not name.startswith('.')
+                )
+                if files:
+                    shards.setdefault(entry.name, []).extend(files)
+            elif entry.name.endswith(EXTENSIONS):
+                shards.setdefault(os.path.splitext(entry.name)[0], []).append(entry.path)
+        return shards
+
+    @property
+    def languages(self):
+        return sorted(self._shards)
+
+    def files(self, language):
+        return list(self._shards[language])
+
+    def iter_language(self, language):
+        """نمونه‌های متنی یک زبان به ترتیب فایل‌ها؛ خطوط خالی و نامعتبر نادیده گرفته می‌شوند"""
+        for path in self._shards[language]:
+            is_jsonl = path.endswith('.jsonl')
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    if not is_jsonl:
+                        yield line.rstrip('\n')
+                        continue
+                    try:
+                        text, _ = parse_line(line)
+                    except ValueError:
+                        continue
+                    yield text
+
+    def iter_samples(self):
+        """
+        نمونه‌های همه زبان‌ها به صورت (متن، زبان)
+
+        زبان‌ها به صورت نوبتی (round-robin) خوانده می‌شوند تا هر قطعه از جریان
+        ترکیبی از همه زبان‌ها باشد.
+        """
+        iterators = [(language, self.iter_language(language)) for language in self.languages]
+        while iterators:
+            active = []
+            for language, iterator in iterators:
+                text = next(iterator, None)
+                if text is not None:
+                    active.append((language, iterator))
+                    yield text, language
+            iterators = active
+
+    def iter_chunks(self, chunk_size):
+        """قطعه‌های (فهرست متن‌ها، فهرست زبان‌ها) با حداکثر chunk_size نمونه"""
+        samples = self.iter_samples()
+        while True:
+            chunk = list(islice(samples, chunk_size))
+            if not chunk:
+                return
+            yield [text for text, _ in chunk], [language for _, language in chunk]
+
+    def size_bytes(self):
+        """حجم کل فایل‌های corpus (برای تخمین پیشرفت خواندن جریانی)"""
+        return sum(os.path.getsize(path) for files in self._shards.values() for path in files)
+
+    def count(self):
+        """تعداد نمونه‌ها (با یک بار خواندن کامل corpus)"""
+        return sum(1 for language in self.languages for _ in self.iter_language(language))
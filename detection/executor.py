@@ -0,0 +1,71 @@
+"""
+اجرای محاسبات CPU تشخیص زبان خارج از event loop در viewهای async
+
+یک ThreadPoolExecutor با تعداد thread ثابت و سقف مشخص برای کارهای در انتظار. وقتی
+سقف پر است کار جدید پذیرفته نمی‌شود (InferenceBusy) تا view بتواند فوراً پاسخ 503
+بدهد و صف بی‌انتها در حافظه ساخته نشود.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class InferenceBusy(Exception):
+    """ظرفیت executor تکمیل است"""
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers=None, max_pending=None):
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    max_workers = self._max_workers or getattr(
+                        settings, 'DETECTION_INFERENCE_WORKERS', min(4, os.cpu_count() or 1)
+                    )
+                    max_pending = self._max_pending or getattr(settings, 'DETECTION_INFERENCE_MAX_PENDING', 256)
+                    self._slots = threading.BoundedSemaphore(max_pending)
+                    self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='detection-inference')
+        return self._executor
+
+    def submit(self, func, *args, **kwargs):
+        """ارسال کار؛ اگر سقف کارهای در انتظار پر باشد InferenceBusy"""
+        executor = self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            raise InferenceBusy('ظرفیت پردازش تکمیل است؛ بعداً دوباره تلاش کنید')
+        try:
+            # contextvarهای درخواست (مثلاً endpoint معیارها) در thread اجرا هم در دسترس باشند
+            future = executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, func, *args, **kwargs):
+        """اجرای func در executor و انتظار async برای نتیجه"""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+inference_executor = BoundedExecutor()
+
+
+async def run_inference(func, *args, **kwargs):
+    """اجرای یک تابع همگام تشخیص زبان در executor مشترک"""
+    return await inference_executor.run(func, *args, **kwargs)
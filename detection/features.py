@@ -0,0 +1,182 @@
+"""
+پیش‌پردازش و بردارسازی متن برای تشخیص زبان
+
+پیش‌پردازش (حذف علائم و اعداد، حروف کوچک و حذف فاصله‌های اضافی) و توکن‌سازی در یک
+مسیر با الگوهای کامپایل‌شده انجام می‌شود و خروجی آن دقیقاً همان ویژگی‌هایی است که
+CountVectorizer روی متن پیش‌پردازش‌شده تولید می‌کرد. CharNgramHashingVectorizer
+جایگزینی بدون واژگان بر پایه n-gramهای کاراکتری است.
+"""
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+# الگوها یک بار در زمان import کامپایل می‌شوند
+_DIGITS_RE = re.compile(r'\d+')
+_WORD_RE = re.compile(r'\w+')
+# همان token_pattern پیش‌فرض CountVectorizer
+_TOKEN_RE = re.compile(r'(?u)\b\w\w+\b')
+
+
+def normalize_text(text):
+    """
+    معادل سه re.sub قبلی به همراه lower و strip
+
+    حذف اعداد و جایگزینی علائم با فاصله جابه‌جاپذیرند، پس کافی است پس از حذف اعداد
+    دنباله‌های حروف را با یک فاصله به هم بچسبانیم.
+    """
+    return ' '.join(_WORD_RE.findall(_DIGITS_RE.sub('', text))).lower()
+
+
+def word_ngrams(tokens, ngram_range=(1, 1)):
+    """ساخت n-gramهای کلمه‌ای با همان ترتیب و قالب CountVectorizer"""
+    min_n, max_n = ngram_range
+    if max_n == 1:
+        return tokens
+
+    original_tokens = tokens
+    if min_n == 1:
+        tokens = list(original_tokens)
+        min_n += 1
+    else:
+        tokens = []
+
+    n_original_tokens = len(original_tokens)
+    for n in range(min_n, min(max_n + 1, n_original_tokens + 1)):
+        for i in range(n_original_tokens - n + 1):
+            tokens.append(' '.join(original_tokens[i:i + n]))
+    return tokens
+
+
+def _build_csr(rows, n_features):
+    """ساخت ماتریس sparse از فهرست Counterهای (اندیس ویژگی -> تعداد)"""
+    indices = []
+    values = []
+    indptr = [0]
+    for counts in rows:
+        for index in sorted(counts):
+            indices.append(index)
+            values.append(counts[index])
+        indptr.append(len(indices))
+    return csr_matrix(
+        (np.asarray(values, dtype=np.int64), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int32)),
+        shape=(len(rows), n_features)
+    )
+
+
+def analyze(text, ngram_range=(1, 1)):
+    """
+    پیش‌پردازش و توکن‌سازی در یک مسیر
+
+    خروجی: متن پیش‌پردازش‌شده و فهرست ویژگی‌های کلمه‌ای (unigram و n-gram)
+    """
+    normalized = normalize_text(text)
+    return normalized, word_ngrams(_TOKEN_RE.findall(normalized), ngram_range)
+
+
+def char_ngrams(normalized, ngram_range=(1, 3)):
+    """n-gramهای کاراکتری درون هر کلمه (با یک فاصله در ابتدا و انتهای کلمه)"""
+    min_n, max_n = ngram_range
+    grams = []
+    append = grams.append
+    for word in normalized.split():
+        padded = f' {word} '
+        length = len(padded)
+        for n in range(min_n, max_n + 1):
+            for i in range(length - n + 1):
+                append(padded[i:i + n])
+    return grams
+
+
+class VocabularyFeatures:
+    """
+    بردارسازی با واژگان یک CountVectorizer آموزش‌دیده بدون عبور از analyzer آن
+
+    ماتریس خروجی با CountVectorizer.transform روی متن پیش‌پردازش‌شده برابر است.
+    """
+
+    def __init__(self, vocabulary, ngram_range=(1, 1)):
+        self.vocabulary = vocabulary
+        self.ngram_range = tuple(ngram_range)
+        self.n_features = len(vocabulary)
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        """ساخت از CountVectorizer؛ اگر تنظیمات آن با مسیر سریع سازگار نباشد None برمی‌گردد"""
+        vocabulary = getattr(vectorizer, 'vocabulary_', None)
+        if vocabulary is None:
+            return None
+
+        compatible = (
+            getattr(vectorizer, 'analyzer', None) == 'word'
+            and vectorizer.token_pattern == _TOKEN_RE.pattern
+            and vectorizer.lowercase
+            and vectorizer.preprocessor is None
+            and vectorizer.tokenizer is None
+            and vectorizer.stop_words is None
+            and vectorizer.strip_accents is None
+            and not vectorizer.binary
+        )
+        if not compatible:
+            return None
+        return cls(vocabulary, vectorizer.ngram_range)
+
+    def transform(self, normalized_texts):
+        """بردارسازی متن‌های پیش‌پردازش‌شده"""
+        vocabulary = self.vocabulary
+        ngram_range = self.ngram_range
+        rows = [
+            Counter(vocabulary[f] for f in word_ngrams(_TOKEN_RE.findall(text), ngram_range) if f in vocabulary)
+            for text in normalized_texts
+        ]
+        return _build_csr(rows, self.n_features)
+
+    def featurize(self, texts):
+        """
+        پیش‌پردازش و بردارسازی متن‌های خام
+
+        خروجی: فهرست متن‌های پیش‌پردازش‌شده و ماتریس sparse شمارش ویژگی‌ها
+        """
+        normalized_texts = [normalize_text(text) for text in texts]
+        return normalized_texts, self.transform(normalized_texts)
+
+
+class CharNgramHashingVectorizer:
+    """
+    بردارساز n-gram کاراکتری با فضای ویژگی درهم‌سازی‌شده (hashing)
+
+    واژگانی نگهداری نمی‌شود؛ اندیس هر n-gram با crc32 محاسبه می‌شود که در همه
+    پروسس‌ها پایدار است. حافظه مستقل از اندازه داده آموزشی است و بارگذاری آن
+    هزینه‌ای ندارد. برای زبان‌هایی مانند چینی و ژاپنی که کلمات با فاصله جدا
+    نمی‌شوند، n-gramهای کاراکتری بسیار بهتر از توکن‌های کلمه‌ای عمل می‌کنند.
+    """
+
+    def __init__(self, n_features=2 ** 16, ngram_range=(1, 3)):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+
+    def get_params(self):
+        return {'n_features': self.n_features, 'ngram_range': list(self.ngram_range)}
+
+    def _count(self, normalized):
+        n_features = self.n_features
+        return Counter(
+            zlib.crc32(gram.encode('utf-8')) % n_features
+            for gram in char_ngrams(normalized, self.ngram_range)
+        )
+
+    def transform(self, texts):
+        """بردارسازی متن‌های پیش‌پردازش‌شده (سازگار با رابط CountVectorizer)"""
+        return _build_csr([self._count(text) for text in texts], self.n_features)
+
+    def fit_transform(self, texts):
+        # بردارساز بدون حالت است و نیازی به fit ندارد
+        return self.transform(texts)
+
+    def featurize(self, texts):
+        """پیش‌پردازش و بردارسازی متن‌های خام"""
+        normalized_texts = [normalize_text(text) for text in texts]
+        return normalized_texts, self.transform(normalized_texts)
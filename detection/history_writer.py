@@ -0,0 +1,276 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import rollups
+from .metrics import stage
+from .models import DetectionHistory
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'OVERFLOW_POLICY': 'drop_oldest',
+    'BLOCK_TIMEOUT': 0.05,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DETECTION_HISTORY_WRITE_BEHIND', {}))
+    return config
+
+
+class DetectionHistoryWriter:
+    """
+    ثبت write-behind تاریخچه تشخیص‌ها
+
+    رکوردها در یک صف محدود درون پروسس قرار می‌گیرند و یک thread پس‌زمینه آن‌ها را
+    هر بار که BATCH_SIZE رکورد جمع شد یا FLUSH_INTERVAL ثانیه گذشت با bulk_create
+    می‌نویسد؛ مسیر تشخیص هرگز منتظر پایگاه‌داده نمی‌ماند.
+
+    سیاست‌های پر شدن صف:
+    - 'drop_oldest': قدیمی‌ترین رکورد صف حذف می‌شود
+    - 'drop_newest': رکورد جدید حذف می‌شود
+    - 'block': حداکثر BLOCK_TIMEOUT ثانیه منتظر می‌ماند و سپس رکورد جدید حذف می‌شود
+    - 'sync': رکورد همان لحظه و به صورت همگام نوشته می‌شود
+    """
+
+    OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block', 'sync')
+
+    def __init__(self, max_queue_size=10000, batch_size=500, flush_interval=1.0,
+                 overflow_policy='drop_oldest', block_timeout=0.05):
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f'سیاست نامعتبر برای پر شدن صف: {overflow_policy}')
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._stopping = None
+        self._pid = None
+
+    @classmethod
+    def from_settings(cls):
+        config = get_config()
+        return cls(
+            max_queue_size=config['MAX_QUEUE_SIZE'],
+            batch_size=config['BATCH_SIZE'],
+            flush_interval=config['FLUSH_INTERVAL'],
+            overflow_policy=config['OVERFLOW_POLICY'],
+            block_timeout=config['BLOCK_TIMEOUT'],
+        )
+
+    def _ensure_started(self):
+        # پس از fork (مثلاً gunicorn --preload) thread والد در فرزند وجود ندارد
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='detection-history-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, records):
+        """قرار دادن رکوردها (نمونه‌های ذخیره نشده DetectionHistory) در صف"""
+        self._ensure_started()
+        for record in records:
+            try:
+                self._queue.put_nowait(record)
+                continue
+            except queue.Full:
+                pass
+
+            if self.overflow_policy == 'sync':
+                self._write([record])
+            elif self.overflow_policy == 'drop_newest':
+                self.dropped += 1
+            elif self.overflow_policy == 'block':
+                try:
+                    self._queue.put(record, timeout=self.block_timeout)
+                except queue.Full:
+                    self.dropped += 1
+            else:
+                self._put_dropping_oldest(record)
+
+    def _put_dropping_oldest(self, record):
+        while True:
+            try:
+                self._queue.get_nowait()
+                # بدون task_done، queue.join در flush برای همیشه منتظر رکورد حذف شده می‌ماند
+                self._queue.task_done()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(record)
+                return
+            except queue.Full:
+                continue
+
+    def _next_batch(self):
+        """جمع‌آوری رکوردها تا رسیدن به BATCH_SIZE یا گذشت FLUSH_INTERVAL"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                # فقط در thread پس‌زمینه؛ در thread درخواست (سیاست sync یا flush) اتصال درخواست نباید بسته شود
+                close_old_connections()
+                self._write(batch)
+                self._task_done(batch)
+
+    def _task_done(self, batch):
+        for _ in batch:
+            self._queue.task_done()
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                with stage('db_write', endpoint='history_writer'):
+                    DetectionHistory.objects.bulk_create(batch, batch_size=self.batch_size)
+                self.written += len(batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception('خطا در ثبت %d رکورد تاریخچه تشخیص', len(batch))
+                return
+            update_rollups(batch)
+
+    def pending(self):
+        """تعداد رکوردهای منتظر در صف"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def flush(self):
+        """نوشتن همگام همه رکوردهای موجود در صف و انتظار برای دسته در حال نوشتن thread"""
+        if self._queue is None:
+            return
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self._write(batch)
+            self._task_done(batch)
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stop(self, timeout=5.0):
+        """توقف thread پس‌زمینه و نوشتن باقی‌مانده صف (هنگام خاموش شدن پروسس)"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        return {
+            'pending': self.pending(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+
+writer = DetectionHistoryWriter.from_settings()
+atexit.register(writer.stop)
+
+
+def update_rollups(records):
+    """به‌روزرسانی آمار تجمیعی؛ خطای آن ثبت تاریخچه را بی‌اثر نمی‌کند"""
+    try:
+        rollups.apply(records)
+    except Exception:
+        # با دستور rollup_detections --rebuild قابل بازسازی است
+        logger.exception('خطا در به‌روزرسانی آمار تجمیعی برای %d رکورد', len(records))
+
+
+def build_detection(**fields):
+    """ساخت نمونه DetectionHistory با همان محاسبات DetectionHistory.save برای bulk_create"""
+    record = DetectionHistory(**fields)
+    if record.input_text:
+        record.text_length = len(record.input_text)
+        record.word_count = len(record.input_text.split())
+    return record
+
+
+def log_detections(records, sync=False):
+    """
+    ثبت چند رکورد تاریخچه
+
+    با sync=True یا غیرفعال بودن write-behind رکوردها همان لحظه با bulk_create
+    نوشته می‌شوند و شناسه دارند؛ در غیر این صورت در صف قرار می‌گیرند.
+    """
+    records = list(records)
+    if not records:
+        return records
+    if sync or not get_config()['ENABLED']:
+        DetectionHistory.objects.bulk_create(records)
+        update_rollups(records)
+        return records
+    writer.submit(records)
+    return records
+
+
+def log_detection(sync=False, **fields):
+    """ثبت یک تشخیص؛ در حالت همگام رکورد ذخیره شده (دارای id) برگردانده می‌شود"""
+    record = build_detection(**fields)
+    if sync or not get_config()['ENABLED']:
+        record.save()
+        update_rollups([record])
+    else:
+        writer.submit([record])
+    return record
+
+
+async def alog_detection(**fields):
+    """
+    نسخه async ثبت یک تشخیص برای viewهای async
+
+    در حالت write-behind قرار دادن در صف بدون دسترسی به پایگاه‌داده و بدون انتظار
+    انجام می‌شود؛ در غیر این صورت (یا با سیاست‌های block و sync) ثبت در یک thread
+    همگام انجام می‌شود.
+    """
+    config = get_config()
+    if config['ENABLED'] and config['OVERFLOW_POLICY'] in ('drop_oldest', 'drop_newest'):
+        record = build_detection(**fields)
+        writer.submit([record])
+        return record
+    return await sync_to_async(log_detection)(**fields)
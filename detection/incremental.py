@@ -0,0 +1,69 @@
+"""
+به‌روزرسانی افزایشی مدل از روی بازخورد کاربران
+
+بازخوردهای «نادرست» که زبان صحیح برایشان مشخص شده است به ترتیب شناسه خوانده
+می‌شوند و متن ورودی تشخیص با زبان صحیح به شمارش‌های Naive Bayes اضافه می‌شود.
+شناسه آخرین بازخورد اعمال شده (watermark) در هدر فایل مدل ذخیره می‌شود؛ بنابراین
+هر بازخورد فقط یک بار اعمال می‌شود و پس از آموزش کامل دوباره از ابتدا اعمال می‌شود.
+"""
+import time
+
+from .models import UserFeedback
+from .registry import get_detector, registry
+from .result_cache import result_cache
+
+
+WATERMARK_KEY = 'feedback_watermark'
+
+
+def pending_feedback(after_id=0, limit=None):
+    """بازخوردهای اعمال نشده: (شناسه، متن، کد زبان صحیح) به ترتیب شناسه"""
+    queryset = (
+        UserFeedback.objects
+        .filter(id__gt=after_id, feedback='incorrect', correct_language__isnull=False)
+        .order_by('id')
+        .values_list('id', 'detection_history__input_text', 'correct_language__code')
+    )
+    return queryset[:limit] if limit else queryset
+
+
+def update_from_feedback(detector=None, min_samples=1, limit=None, publish=True):
+    """
+    اعمال بازخوردهای جدید روی مدل فعال
+
+    با publish مدل جدید به صورت اتمیک در فایل مدل نوشته و جایگزین نمونه مشترک
+    این پروسس می‌شود. اگر کمتر از min_samples بازخورد جدید باشد None برگردانده
+    می‌شود؛ در غیر این صورت دیکشنری خلاصه به‌روزرسانی.
+    """
+    detector = detector or get_detector()
+    watermark = detector.metadata.get(WATERMARK_KEY, 0)
+    rows = list(pending_feedback(watermark, limit))
+    if not rows or len(rows) < min_samples:
+        return None
+
+    start = time.perf_counter()
+    updated = detector.incremental_update(
+        [text for _, text, _ in rows],
+        [code for _, _, code in rows],
+        metadata={
+            WATERMARK_KEY: rows[-1][0],
+            'feedback_samples': detector.metadata.get('feedback_samples', 0) + len(rows),
+            'incremental_updates': detector.metadata.get('incremental_updates', 0) + 1,
+        },
+    )
+    update_time = time.perf_counter() - start
+
+    if publish:
+        if not updated.save_model():
+            raise Exception('ذخیره مدل به‌روزرسانی شده ناموفق بود')
+        registry.swap(updated)
+        result_cache.clear()
+
+    return {
+        'samples': len(rows),
+        'watermark': rows[-1][0],
+        'previous_version': detector.model_version,
+        'version': updated.model_version,
+        'update_time': update_time,
+        'detector': updated,
+    }
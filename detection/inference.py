@@ -0,0 +1,99 @@
+import numpy as np
+from scipy import sparse
+
+
+class NaiveBayesScorer:
+    """
+    امتیازدهی Multinomial Naive Bayes فقط با وزن‌های صادرشده
+
+    وزن‌ها می‌توانند آرایه‌های memory-mapped باشند تا همه workerها از یک نسخه
+    مشترک در page cache استفاده کنند. رابط آن با بخش مورد نیاز MultinomialNB
+    (classes_ و predict_log_proba) سازگار است.
+    """
+
+    def __init__(self, classes, class_log_prior, feature_log_prob_t,
+                 feature_count_t=None, class_count=None, alpha=1.0):
+        self.classes_ = np.asarray(classes)
+        self.class_log_prior_ = class_log_prior
+        # ماتریس (n_features, n_classes) با چیدمان سطری برای ضرب sparse بدون کپی
+        self.feature_log_prob_t = feature_log_prob_t
+        # شمارش‌های خام آموزش (برای به‌روزرسانی افزایشی)؛ در مدل‌های قدیمی وجود ندارند
+        self.feature_count_t = feature_count_t
+        self.class_count = class_count
+        self.alpha = alpha
+
+    @classmethod
+    def from_estimator(cls, model):
+        """ساخت از یک MultinomialNB آموزش‌دیده"""
+        return cls(
+            model.classes_,
+            np.ascontiguousarray(model.class_log_prior_),
+            np.ascontiguousarray(model.feature_log_prob_.T),
+            feature_count_t=np.ascontiguousarray(model.feature_count_.T),
+            class_count=np.ascontiguousarray(model.class_count_),
+            alpha=float(model.alpha),
+        )
+
+    @classmethod
+    def from_counts(cls, classes, feature_count_t, class_count, alpha=1.0):
+        """محاسبه وزن‌ها از شمارش‌ها (همان فرمول MultinomialNB با fit_prior)"""
+        smoothed = feature_count_t + alpha
+        feature_log_prob_t = np.log(smoothed) - np.log(smoothed.sum(axis=0))
+        class_log_prior = np.log(class_count) - np.log(class_count.sum())
+        return cls(classes, class_log_prior, np.ascontiguousarray(feature_log_prob_t),
+                   feature_count_t=feature_count_t, class_count=class_count, alpha=alpha)
+
+    @property
+    def supports_partial_fit(self):
+        return self.feature_count_t is not None and self.class_count is not None
+
+    def partial_fit(self, X, y):
+        """
+        به‌روزرسانی افزایشی با نمونه‌های جدید (معادل MultinomialNB.partial_fit)
+
+        شمارش‌های ویژگی و کلاس با X و برچسب‌های y جمع می‌شوند و وزن‌ها از روی آن‌ها
+        دوباره محاسبه می‌شوند؛ برچسب‌های جدید به عنوان کلاس جدید اضافه می‌شوند.
+        آرایه‌های فعلی (که ممکن است memory-mapped و فقط‌خواندنی باشند) تغییر نمی‌کنند
+        و خروجی یک NaiveBayesScorer جدید است.
+        """
+        if not self.supports_partial_fit:
+            raise ValueError('شمارش‌های آموزش در این مدل موجود نیست؛ ابتدا مدل را کامل آموزش دهید')
+
+        classes = [str(label) for label in self.classes_]
+        index = {label: i for i, label in enumerate(classes)}
+        for label in y:
+            if str(label) not in index:
+                index[str(label)] = len(classes)
+                classes.append(str(label))
+        n_new = len(classes) - len(self.classes_)
+
+        feature_count_t = np.pad(np.asarray(self.feature_count_t, dtype=np.float64), ((0, 0), (0, n_new)))
+        class_count = np.pad(np.asarray(self.class_count, dtype=np.float64), (0, n_new))
+
+        rows = np.array([index[str(label)] for label in y], dtype=np.int64)
+        # ماتریس one-hot (n_samples, n_classes)؛ X.T @ Y جمع ویژگی‌های هر کلاس است
+        Y = sparse.csr_matrix((np.ones(len(rows)), (np.arange(len(rows)), rows)), shape=(len(rows), len(classes)))
+        feature_count_t += np.asarray((sparse.csr_matrix(X).T @ Y).todense())
+        class_count += np.bincount(rows, minlength=len(classes))
+
+        return type(self).from_counts(np.array(classes), feature_count_t, class_count, self.alpha)
+
+    @property
+    def n_features(self):
+        return self.feature_log_prob_t.shape[0]
+
+    def joint_log_likelihood(self, X):
+        return np.asarray(X @ self.feature_log_prob_t) + self.class_log_prior_
+
+    def predict_log_proba(self, X):
+        jll = self.joint_log_likelihood(X)
+        # نرمال‌سازی با logsumexp پایدار عددی
+        max_jll = jll.max(axis=1, keepdims=True)
+        log_norm = max_jll + np.log(np.exp(jll - max_jll).sum(axis=1, keepdims=True))
+        return jll - log_norm
+
+    def predict_proba(self, X):
+        return np.exp(self.predict_log_proba(X))
+
+    def predict(self, X):
+        return self.classes_[self.joint_log_likelihood(X).argmax(axis=1)]
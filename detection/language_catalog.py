@@ -0,0 +1,106 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from .models import Language
+
+
+# کلید نسخه فهرست زبان‌ها در cache مشترک؛ تغییر آن همه پروسس‌ها را وادار به بارگذاری مجدد می‌کند
+VERSION_CACHE_KEY = 'detection:language_catalog:version'
+
+
+class LanguageCatalog:
+    """
+    نگهداری جدول Language در حافظه پروسس به صورت دیکشنری کد -> رکورد
+
+    جدول زبان‌ها کوچک است و به ندرت تغییر می‌کند، پس به جای یک یا دو کوئری در هر
+    درخواست، کل جدول یک بار خوانده می‌شود. با ذخیره یا حذف هر Language (سیگنال‌های
+    post_save و post_delete) نسخه موجود در cache جنگو عوض می‌شود و پروسس‌های دیگر
+    حداکثر پس از VERSION_CHECK_INTERVAL ثانیه فهرست را دوباره بارگذاری می‌کنند.
+    این باطل‌سازی فقط با یک cache مشترک بین پروسس‌ها در CACHES کار می‌کند (پیش‌فرض
+    پروژه DatabaseCache است)؛ با LocMemCache هر پروسس فقط تغییرات خودش را می‌بیند.
+    """
+
+    def __init__(self, version_check_interval=None):
+        self._version_check_interval = version_check_interval
+        self._by_code = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version_check_interval(self):
+        if self._version_check_interval is not None:
+            return self._version_check_interval
+        return getattr(settings, 'DETECTION_LANGUAGE_CATALOG_VERSION_CHECK_INTERVAL', 1.0)
+
+    def _load(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        by_code = {language.code: language for language in Language.objects.all()}
+        with self._lock:
+            self._by_code = by_code
+            self._version = version
+            self._checked_at = time.monotonic()
+        return by_code
+
+    def _languages(self):
+        by_code = self._by_code
+        if by_code is None:
+            return self._load()
+
+        now = time.monotonic()
+        if now - self._checked_at >= self.version_check_interval:
+            self._checked_at = now
+            if cache.get(VERSION_CACHE_KEY) != self._version:
+                return self._load()
+        return by_code
+
+    def warm(self):
+        """بارگذاری فهرست هنگام راه‌اندازی worker"""
+        try:
+            self._load()
+        except DatabaseError:
+            # پیش از اجرای migrate جدول وجود ندارد؛ در اولین درخواست بارگذاری می‌شود
+            self.clear()
+
+    def get(self, code):
+        """رکورد زبان با کد داده شده یا None"""
+        return self._languages().get(code)
+
+    def get_or_create(self, code):
+        """معادل Language.objects.get_or_create برای کد پیش‌بینی شده توسط مدل"""
+        language = self.get(code)
+        if language is None:
+            language, created = Language.objects.get_or_create(
+                code=code,
+                defaults={'name': code.title(), 'native_name': code.title()}
+            )
+        return language
+
+    def active(self):
+        """زبان‌های فعال به ترتیب نام"""
+        return sorted(
+            (language for language in self._languages().values() if language.is_active),
+            key=lambda language: language.name
+        )
+
+    def active_count(self):
+        return sum(1 for language in self._languages().values() if language.is_active)
+
+    def clear(self):
+        """حذف فهرست این پروسس؛ دسترسی بعدی آن را از پایگاه‌داده می‌خواند"""
+        with self._lock:
+            self._by_code = None
+            self._version = None
+
+    def invalidate(self):
+        """باطل کردن فهرست در همه پروسس‌ها"""
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        self.clear()
+
+
+language_catalog = LanguageCatalog()
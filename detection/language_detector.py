@@ -1,23 +1,61 @@
 # Language Detection System
+import hashlib
+import logging
 import numpy as np
 import pickle
 import os
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
-import re
 from django.conf import settings
+from django.db import DatabaseError
+
+from .features import CharNgramHashingVectorizer, VocabularyFeatures, normalize_text
+from .inference import NaiveBayesScorer
+from .corpus import Corpus
+from .model_store import ModelFormatError, load_artifact, save_artifact
+from .models import ModelTrainingLog
+from . import model_versions
+from .metrics import stage
+from .result_cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+
+def logged_versions():
+    """نسخه‌هایی که ModelTrainingLog به آن‌ها اشاره می‌کند و در rollback ادمین ارائه می‌شوند"""
+    return set(ModelTrainingLog.objects.exclude(version='').values_list('version', flat=True))
+
+# scikit-learn فقط در آموزش لازم است و در train_model به صورت تنبل import می‌شود؛
+# سرویس‌دهی فقط با NumPy/SciPy و وزن‌های ذخیره شده در language_model.ldm انجام می‌شود.
 
 class LanguageDetector:
     """
     سیستم تشخیص زبان با استفاده از Naive Bayes
+    
+    feature_backend نوع ویژگی‌ها را در آموزش تعیین می‌کند:
+    - 'bow': کیسه کلمات (unigram و bigram) با CountVectorizer
+    - 'hashing': n-gram کاراکتری با فضای ویژگی درهم‌سازی‌شده و بدون واژگان
+    در بارگذاری، نوع بردارساز از فایل ذخیره شده تشخیص داده می‌شود.
     """
     
-    def __init__(self):
+    FEATURE_BACKENDS = ('bow', 'hashing')
+    
+    def __init__(self, feature_backend=None):
+        if feature_backend is None:
+            feature_backend = getattr(settings, 'DETECTION_FEATURE_BACKEND', 'bow')
+        if feature_backend not in self.FEATURE_BACKENDS:
+            raise ValueError(f"نوع ویژگی نامعتبر: {feature_backend}")
+        self.feature_backend = feature_backend
         self.model = None
         self.vectorizer = None
+        self.features = None
         self.languages = []
+        # شناسه وزن‌های مدل (بخشی از checksum فایل مدل)؛ کلید cache نتایج به آن وابسته است
+        self.model_version = None
+        # نام نسخه ذخیره شده مدل روی دیسک (پوشه versions/<نام>)؛ همان ModelTrainingLog.version
+        self.artifact_version = None
+        # اطلاعات ذخیره شده همراه مدل (مثلاً آخرین بازخورد اعمال شده در به‌روزرسانی افزایشی)
+        self.metadata = {}
+        # تعداد نمونه‌های آموزشی آخرین آموزش کامل
+        self.training_samples = 0
         self.model_path = os.path.join(settings.BASE_DIR, 'detection', 'models')
         self.ensure_model_dir()
     
@@ -28,577 +66,277 @@ class LanguageDetector:
     
     def preprocess_text(self, text):
         """پیش پردازش متن"""
-        # حذف کاراکترهای خاص و اعداد
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\d+', '', text)
-        # تبدیل به حروف کوچک
-        text = text.lower().strip()
-        # حذف فاصله های اضافی
-        text = re.sub(r'\s+', ' ', text)
-        return text
+        # حذف کاراکترهای خاص و اعداد، تبدیل به حروف کوچک و حذف فاصله های اضافی
+        return normalize_text(text)
     
-    def prepare_training_data(self):
-        """آماده سازی داده های آموزشی برای زبان های مختلف"""
-        
-        # داده های آموزشی برای زبان های مختلف
-        training_data = {
-            'english': [
-                "Hello how are you today",
-                "This is a beautiful day",
-                "I love programming and technology",
-                "The weather is nice today",
-                "Python is a great programming language",
-                "Machine learning is fascinating",
-                "I enjoy reading books",
-                "The sun is shining brightly",
-                "Coffee tastes really good",
-                "Music makes me happy",
-                "Travel broadens the mind",
-                "Education is very important",
-                "Health is wealth indeed",
-                "Time flies so fast",
-                "Dreams can come true",
-                "She went to the market to buy some fruits",
-                "He is studying computer science at university",
-                "They are planning a trip to the mountains",
-                "My favorite color is blue",
-                "The cat is sleeping on the sofa",
-                "I have a meeting at 10 o'clock",
-                "We watched a movie last night",
-                "The children are playing in the park",
-                "Please close the window",
-                "I need to charge my phone",
-                "She likes to paint landscapes",
-                "He plays the guitar very well",
-                "The train leaves at 7 am",
-                "I am learning a new language",
-                "Breakfast is the most important meal of the day",
-                "The book was very interesting",
-                "Can you help me with this problem?",
-                "The flowers are blooming in the garden",
-                "He is a very talented musician",
-                "I forgot my umbrella at home",
-                "The restaurant serves delicious food",
-                "She is writing a letter to her friend",
-                "The dog barked loudly at the stranger",
-                "We are going to the beach this weekend",
-                "He bought a new car yesterday",
-                "The teacher explained the lesson clearly",
-                "I enjoy listening to classical music",
-                "The city is crowded during rush hour",
-                "She wore a beautiful red dress",
-                "He is reading the newspaper",
-                "The cake tastes sweet and soft",
-                "I will call you in the evening",
-                "The river flows through the valley",
-                "She is afraid of spiders",
-                "He likes to play chess with his brother"
-            ],
-            'persian': [
-                "سلام چطور هستید امروز",
-                "امروز روز زیبایی است",
-                "من عاشق برنامه نویسی هستم",
-                "هوا امروز خیلی خوب است",
-                "پایتون زبان برنامه نویسی عالی است",
-                "یادگیری ماشین جذاب است",
-                "من از خواندن کتاب لذت می برم",
-                "خورشید به زیبایی می درخشد",
-                "قهوه طعم فوق العاده ای دارد",
-                "موسیقی مرا شاد می کند",
-                "سفر ذهن را گسترش می دهد",
-                "آموزش بسیار مهم است",
-                "سلامتی گنج است",
-                "زمان خیلی سریع می گذرد",
-                "رویاها می توانند محقق شوند",
-                "او به بازار رفت تا میوه بخرد",
-                "او در دانشگاه علوم کامپیوتر می‌خواند",
-                "آنها برنامه‌ریزی سفر به کوه دارند",
-                "رنگ مورد علاقه من آبی است",
-                "گربه روی مبل خوابیده است",
-                "من ساعت ۱۰ جلسه دارم",
-                "دیشب فیلم تماشا کردیم",
-                "بچه‌ها در پارک بازی می‌کنند",
-                "لطفاً پنجره را ببند",
-                "باید گوشی‌ام را شارژ کنم",
-                "او دوست دارد منظره نقاشی کند",
-                "او گیتار را خیلی خوب می‌نوازد",
-                "قطار ساعت ۷ صبح حرکت می‌کند",
-                "در حال یادگیری زبان جدید هستم",
-                "صبحانه مهم‌ترین وعده غذایی است",
-                "کتاب بسیار جالب بود",
-                "می‌توانی در این مسئله به من کمک کنی؟",
-                "گل‌ها در باغ شکوفه داده‌اند",
-                "او موسیقیدان بسیار با استعدادی است",
-                "چترم را در خانه جا گذاشتم",
-                "رستوران غذای خوشمزه‌ای سرو می‌کند",
-                "او در حال نوشتن نامه به دوستش است",
-                "سگ به غریبه با صدای بلند پارس کرد",
-                "این آخر هفته به ساحل می‌رویم",
-                "او دیروز ماشین جدید خرید",
-                "معلم درس را به وضوح توضیح داد",
-                "من از گوش دادن به موسیقی کلاسیک لذت می‌برم",
-                "شهر در ساعت شلوغی پرجمعیت است",
-                "او لباس قرمز زیبایی پوشیده بود",
-                "او روزنامه می‌خواند",
-                "کیک طعم شیرین و نرمی دارد",
-                "عصر با تو تماس می‌گیرم",
-                "رودخانه از دره عبور می‌کند",
-                "او از عنکبوت می‌ترسد",
-                "او دوست دارد با برادرش شطرنج بازی کند"
-            ],
-            'arabic': [
-                "مرحبا كيف حالك اليوم",
-                "هذا يوم جميل جداً",
-                "أحب البرمجة والتكنولوجيا",
-                "الطقس جميل اليوم",
-                "بايثون لغة برمجة رائعة",
-                "تعلم الآلة مذهل",
-                "أستمتع بقراءة الكتب",
-                "الشمس تشرق بجمال",
-                "القهوة لذيذة جداً",
-                "الموسيقى تسعدني كثيراً",
-                "السفر يوسع العقل",
-                "التعليم مهم جداً",
-                "الصحة كنز ثمين",
-                "الوقت يمر بسرعة",
-                "الأحلام يمكن أن تتحقق",
-                "ذهبت إلى السوق لشراء بعض الفواكه",
-                "يدرس علوم الحاسوب في الجامعة",
-                "يخططون لرحلة إلى الجبال",
-                "لوني المفضل هو الأزرق",
-                "القطة نائمة على الأريكة",
-                "لدي اجتماع في الساعة العاشرة",
-                "شاهدنا فيلماً الليلة الماضية",
-                "الأطفال يلعبون في الحديقة",
-                "من فضلك أغلق النافذة",
-                "أحتاج إلى شحن هاتفي",
-                "تحب رسم المناظر الطبيعية",
-                "يعزف الجيتار بشكل جيد جداً",
-                "يغادر القطار الساعة السابعة صباحاً",
-                "أتعلم لغة جديدة",
-                "الإفطار هو أهم وجبة في اليوم",
-                "كان الكتاب ممتعاً جداً",
-                "هل يمكنك مساعدتي في هذه المشكلة؟",
-                "الأزهار تتفتح في الحديقة",
-                "هو موسيقي موهوب جداً",
-                "نسيت مظلتي في المنزل",
-                "يقدم المطعم طعاماً لذيذاً",
-                "تكتب رسالة إلى صديقتها",
-                "نبح الكلب بصوت عالٍ على الغريب",
-                "سنذهب إلى الشاطئ هذا الأسبوع",
-                "اشترى سيارة جديدة أمس",
-                "شرح المعلم الدرس بوضوح",
-                "أستمتع بالاستماع إلى الموسيقى الكلاسيكية",
-                "المدينة مزدحمة خلال ساعة الذروة",
-                "ارتدت فستاناً أحمر جميلاً",
-                "يقرأ الجريدة",
-                "طعم الكعكة حلو وناعم",
-                "سأتصل بك في المساء",
-                "النهر يجري عبر الوادي",
-                "هي تخاف من العناكب",
-                "يحب لعب الشطرنج مع أخيه"
-            ],
-            'french': [
-                "Bonjour comment allez vous aujourd'hui",
-                "C'est une belle journée",
-                "J'aime la programmation et la technologie",
-                "Le temps est agréable aujourd'hui",
-                "Python est un excellent langage de programmation",
-                "L'apprentissage automatique est fascinant",
-                "J'aime lire des livres",
-                "Le soleil brille magnifiquement",
-                "Le café a vraiment bon goût",
-                "La musique me rend heureux",
-                "Voyager élargit l'esprit",
-                "L'éducation est très importante",
-                "La santé c'est la richesse",
-                "Le temps passe si vite",
-                "Les rêves peuvent devenir réalité",
-                "Elle est allée au marché acheter des fruits",
-                "Il étudie l'informatique à l'université",
-                "Ils prévoient un voyage à la montagne",
-                "Ma couleur préférée est le bleu",
-                "Le chat dort sur le canapé",
-                "J'ai une réunion à dix heures",
-                "Nous avons regardé un film hier soir",
-                "Les enfants jouent dans le parc",
-                "Veuillez fermer la fenêtre",
-                "Je dois charger mon téléphone",
-                "Elle aime peindre des paysages",
-                "Il joue très bien de la guitare",
-                "Le train part à sept heures du matin",
-                "J'apprends une nouvelle langue",
-                "Le petit-déjeuner est le repas le plus important de la journée",
-                "Le livre était très intéressant",
-                "Peux-tu m'aider avec ce problème ?",
-                "Les fleurs fleurissent dans le jardin",
-                "Il est un musicien très talentueux",
-                "J'ai oublié mon parapluie à la maison",
-                "Le restaurant sert de la nourriture délicieuse",
-                "Elle écrit une lettre à son amie",
-                "Le chien a aboyé fort sur l'étranger",
-                "Nous allons à la plage ce week-end",
-                "Il a acheté une nouvelle voiture hier",
-                "Le professeur a expliqué la leçon clairement",
-                "J'aime écouter de la musique classique",
-                "La ville est bondée pendant l'heure de pointe",
-                "Elle portait une belle robe rouge",
-                "Il lit le journal",
-                "Le gâteau a un goût sucré et doux",
-                "Je t'appellerai ce soir",
-                "La rivière traverse la vallée",
-                "Elle a peur des araignées",
-                "Il aime jouer aux échecs avec son frère"
-            ],
-            'german': [
-                "Hallo wie geht es dir heute",
-                "Das ist ein schöner Tag",
-                "Ich liebe Programmierung und Technologie",
-                "Das Wetter ist heute schön",
-                "Python ist eine großartige Programmiersprache",
-                "Maschinelles Lernen ist faszinierend",
-                "Ich lese gerne Bücher",
-                "Die Sonne scheint hell",
-                "Kaffee schmeckt wirklich gut",
-                "Musik macht mich glücklich",
-                "Reisen erweitert den Horizont",
-                "Bildung ist sehr wichtig",
-                "Gesundheit ist Reichtum",
-                "Die Zeit vergeht so schnell",
-                "Träume können wahr werden",
-                "Sie ging zum Markt, um Obst zu kaufen",
-                "Er studiert Informatik an der Universität",
-                "Sie planen eine Reise in die Berge",
-                "Meine Lieblingsfarbe ist Blau",
-                "Die Katze schläft auf dem Sofa",
-                "Ich habe um zehn Uhr ein Meeting",
-                "Wir haben gestern Abend einen Film gesehen",
-                "Die Kinder spielen im Park",
-                "Bitte schließe das Fenster",
-                "Ich muss mein Handy aufladen",
-                "Sie malt gerne Landschaften",
-                "Er spielt sehr gut Gitarre",
-                "Der Zug fährt um sieben Uhr morgens ab",
-                "Ich lerne eine neue Sprache",
-                "Frühstück ist die wichtigste Mahlzeit des Tages",
-                "Das Buch war sehr interessant",
-                "Kannst du mir bei diesem Problem helfen?",
-                "Die Blumen blühen im Garten",
-                "Er ist ein sehr talentierter Musiker",
-                "Ich habe meinen Regenschirm zu Hause vergessen",
-                "Das Restaurant serviert leckeres Essen",
-                "Sie schreibt einen Brief an ihre Freundin",
-                "Der Hund bellte laut den Fremden an",
-                "Wir gehen dieses Wochenende an den Strand",
-                "Er hat gestern ein neues Auto gekauft",
-                "Der Lehrer hat die Lektion klar erklärt",
-                "Ich höre gerne klassische Musik",
-                "Die Stadt ist während der Hauptverkehrszeit überfüllt",
-                "Sie trug ein schönes rotes Kleid",
-                "Er liest die Zeitung",
-                "Der Kuchen schmeckt süß und weich",
-                "Ich rufe dich am Abend an",
-                "Der Fluss fließt durch das Tal",
-                "Sie hat Angst vor Spinnen",
-                "Er spielt gerne Schach mit seinem Bruder"
-            ],
-            'spanish': [
-                "Hola como estas hoy",
-                "Este es un hermoso día",
-                "Me encanta la programación y la tecnología",
-                "El clima está agradable hoy",
-                "Python es un excelente lenguaje de programación",
-                "El aprendizaje automático es fascinante",
-                "Disfruto leyendo libros",
-                "El sol brilla magníficamente",
-                "El café sabe realmente bien",
-                "La música me hace feliz",
-                "Viajar amplía la mente",
-                "La educación es muy importante",
-                "La salud es riqueza",
-                "El tiempo pasa muy rápido",
-                "Los sueños pueden hacerse realidad",
-                "Ella fue al mercado a comprar frutas",
-                "Él estudia informática en la universidad",
-                "Están planeando un viaje a las montañas",
-                "Mi color favorito es el azul",
-                "El gato está durmiendo en el sofá",
-                "Tengo una reunión a las diez",
-                "Vimos una película anoche",
-                "Los niños juegan en el parque",
-                "Por favor, cierra la ventana",
-                "Necesito cargar mi teléfono",
-                "A ella le gusta pintar paisajes",
-                "Él toca muy bien la guitarra",
-                "El tren sale a las siete de la mañana",
-                "Estoy aprendiendo un nuevo idioma",
-                "El desayuno es la comida más importante del día",
-                "El libro fue muy interesante",
-                "¿Puedes ayudarme con este problema?",
-                "Las flores están floreciendo en el jardín",
-                "Él es un músico muy talentoso",
-                "Olvidé mi paraguas en casa",
-                "El restaurante sirve comida deliciosa",
-                "Ella está escribiendo una carta a su amiga",
-                "El perro ladró fuerte al extraño",
-                "Vamos a la playa este fin de semana",
-                "Él compró un coche nuevo ayer",
-                "El profesor explicó la lección claramente",
-                "Me gusta escuchar música clásica",
-                "La ciudad está llena durante la hora punta",
-                "Ella llevaba un hermoso vestido rojo",
-                "Él está leyendo el periódico",
-                "El pastel sabe dulce y suave",
-                "Te llamaré por la tarde",
-                "El río fluye por el valle",
-                "Ella tiene miedo de las arañas",
-                "Le gusta jugar al ajedrez con su hermano"
-            ],
-            'italian': [
-                "Ciao, come stai oggi?",
-                "Questa è una bellissima giornata",
-                "Amo programmare e la tecnologia",
-                "Il tempo è bello oggi",
-                "Python è un ottimo linguaggio di programmazione",
-                "L'apprendimento automatico è affascinante",
-                "Mi piace leggere libri",
-                "Il sole splende luminoso",
-                "Il caffè ha un sapore davvero buono",
-                "La musica mi rende felice",
-                "Viaggiare allarga la mente",
-                "L'istruzione è molto importante",
-                "La salute è davvero una ricchezza",
-                "Il tempo vola così in fretta",
-                "I sogni possono diventare realtà",
-                "Lei è andata al mercato a comprare della frutta",
-                "Lui studia informatica all'università",
-                "Stanno pianificando un viaggio in montagna",
-                "Il mio colore preferito è il blu",
-                "Il gatto dorme sul divano",
-                "Ho una riunione alle dieci",
-                "Abbiamo guardato un film ieri sera",
-                "I bambini giocano nel parco",
-                "Per favore, chiudi la finestra",
-                "Devo caricare il mio telefono",
-                "Le piace dipingere paesaggi",
-                "Lui suona molto bene la chitarra",
-                "Il treno parte alle sette del mattino",
-                "Sto imparando una nuova lingua",
-                "La colazione è il pasto più importante della giornata"
-            ],
-            'russian': [
-                "Привет, как дела сегодня?",
-                "Сегодня прекрасный день",
-                "Я люблю программирование и технологии",
-                "Погода сегодня хорошая",
-                "Python — отличный язык программирования",
-                "Машинное обучение — это увлекательно",
-                "Мне нравится читать книги",
-                "Солнце ярко светит",
-                "Кофе действительно вкусный",
-                "Музыка делает меня счастливым",
-                "Путешествия расширяют кругозор",
-                "Образование очень важно",
-                "Здоровье — это богатство",
-                "Время летит так быстро",
-                "Мечты могут сбываться",
-                "Она пошла на рынок за фруктами",
-                "Он изучает информатику в университете",
-                "Они планируют поездку в горы",
-                "Мой любимый цвет — синий",
-                "Кот спит на диване",
-                "У меня встреча в десять часов",
-                "Мы смотрели фильм прошлой ночью",
-                "Дети играют в парке",
-                "Пожалуйста, закрой окно",
-                "Мне нужно зарядить телефон",
-                "Ей нравится рисовать пейзажи",
-                "Он очень хорошо играет на гитаре",
-                "Поезд отправляется в семь утра",
-                "Я учу новый язык",
-                "Завтрак — самый важный прием пищи за день"
-            ],
-            'turkish': [
-                "Merhaba, bugün nasılsın?",
-                "Bugün çok güzel bir gün",
-                "Programlamayı ve teknolojiyi seviyorum",
-                "Bugün hava güzel",
-                "Python harika bir programlama dili",
-                "Makine öğrenimi büyüleyici",
-                "Kitap okumayı seviyorum",
-                "Güneş parlak bir şekilde parlıyor",
-                "Kahve gerçekten çok lezzetli",
-                "Müzik beni mutlu ediyor",
-                "Seyahat etmek zihni genişletir",
-                "Eğitim çok önemlidir",
-                "Sağlık gerçekten zenginliktir",
-                "Zaman çok hızlı geçiyor",
-                "Hayaller gerçek olabilir",
-                "O, meyve almak için pazara gitti",
-                "Üniversitede bilgisayar bilimi okuyor",
-                "Dağlara bir gezi planlıyorlar",
-                "En sevdiğim renk mavi",
-                "Kedi kanepede uyuyor",
-                "Saat onda bir toplantım var",
-                "Dün gece bir film izledik",
-                "Çocuklar parkta oynuyor",
-                "Lütfen pencereyi kapat",
-                "Telefonumu şarj etmem gerekiyor",
-                "Manzara çizmeyi seviyor",
-                "Kardeşiyle satranç oynamayı seviyor",
-                "Tren sabah yedide kalkıyor",
-                "Yeni bir dil öğreniyorum",
-                "Kahvaltı günün en önemli öğünüdür"
-            ],
-            'chinese': [
-                "你好，今天怎么样？",
-                "今天天气很好",
-                "我喜欢编程和技术",
-                "今天是美好的一天",
-                "Python是一门很棒的编程语言",
-                "机器学习很有趣",
-                "我喜欢读书",
-                "太阳明亮地照耀着",
-                "咖啡真的很好喝",
-                "音乐让我开心",
-                "旅行开阔视野",
-                "教育非常重要",
-                "健康就是财富",
-                "时间过得真快",
-                "梦想可以成真",
-                "她去市场买水果",
-                "他在大学学习计算机科学",
-                "他们计划去山里旅行",
-                "我最喜欢的颜色是蓝色",
-                "猫在沙发上睡觉",
-                "我十点有个会议",
-                "我们昨晚看了一部电影",
-                "孩子们在公园玩耍",
-                "请关上窗户",
-                "我需要给手机充电",
-                "她喜欢画风景画",
-                "他吉他弹得很好",
-                "火车早上七点出发",
-                "我正在学习一门新语言",
-                "早餐是一天中最重要的一餐"
-            ],
-            'japanese': [
-                "こんにちは、今日はどうですか？",
-                "今日は素晴らしい日です",
-                "私はプログラミングと技術が大好きです",
-                "今日は天気がいいです",
-                "Pythonは素晴らしいプログラミング言語です",
-                "機械学習は魅力的です",
-                "本を読むのが好きです",
-                "太陽が明るく輝いています",
-                "コーヒーは本当に美味しいです",
-                "音楽は私を幸せにします",
-                "旅行は心を広げます",
-                "教育はとても重要です",
-                "健康は本当に財産です",
-                "時間がとても早く過ぎます",
-                "夢は叶うことができます",
-                "彼女は果物を買いに市場へ行きました",
-                "彼は大学でコンピュータサイエンスを勉強しています",
-                "彼らは山への旅行を計画しています",
-                "私の好きな色は青です",
-                "猫はソファで寝ています",
-                "10時に会議があります",
-                "昨夜映画を見ました",
-                "子供たちは公園で遊んでいます",
-                "窓を閉めてください",
-                "携帯電話を充電する必要があります",
-                "彼女は風景画を描くのが好きです",
-                "彼はギターをとても上手に弾きます",
-                "列車は朝7時に出発します",
-                "新しい言語を学んでいます",
-                "朝食は一日の中で最も重要な食事です"
-            ],
-            'hindi': [
-                "नमस्ते, आज आप कैसे हैं?",
-                "आज बहुत सुंदर दिन है",
-                "मुझे प्रोग्रामिंग और तकनीक पसंद है",
-                "आज मौसम अच्छा है",
-                "Python एक बेहतरीन प्रोग्रामिंग भाषा है",
-                "मशीन लर्निंग बहुत रोचक है",
-                "मुझे किताबें पढ़ना पसंद है",
-                "सूरज तेज़ी से चमक रहा है",
-                "कॉफी वाकई में बहुत अच्छी है",
-                "संगीत मुझे खुश करता है",
-                "यात्रा मन को विस्तृत करती है",
-                "शिक्षा बहुत महत्वपूर्ण है",
-                "स्वास्थ्य ही धन है",
-                "समय बहुत तेज़ी से बीतता है",
-                "सपने सच हो सकते हैं",
-                "वह फल खरीदने के लिए बाज़ार गई",
-                "वह विश्वविद्यालय में कंप्यूटर विज्ञान पढ़ रहा है",
-                "वे पहाड़ों की यात्रा की योजना बना रहे हैं",
-                "मेरा पसंदीदा रंग नीला है",
-                "बिल्ली सोफे पर सो रही है",
-                "मेरी दस बजे मीटिंग है",
-                "हमने कल रात एक फिल्म देखी",
-                "बच्चे पार्क में खेल रहे हैं",
-                "कृपया खिड़की बंद करें",
-                "मुझे अपना फोन चार्ज करना है",
-                "उसे परिदृश्य चित्र बनाना पसंद है",
-                "वह बहुत अच्छा गिटार बजाता है",
-                "ट्रेन सुबह सात बजे निकलती है",
-                "मैं एक नई भाषा सीख रहा हूँ",
-                "नाश्ता दिन का सबसे महत्वपूर्ण भोजन है"
-            ]
+    def _create_vectorizer(self):
+        """ساخت بردارساز بر اساس feature_backend"""
+        if self.feature_backend == 'hashing':
+            return CharNgramHashingVectorizer(
+                n_features=getattr(settings, 'DETECTION_HASHING_N_FEATURES', 2 ** 16),
+                ngram_range=(1, 3)
+            )
+        from sklearn.feature_extraction.text import CountVectorizer
+        return CountVectorizer(
+            max_features=5000,  # حداکثر تعداد کلمات
+            ngram_range=(1, 2),  # استفاده از unigrams و bigrams
+            min_df=1,  # حداقل تکرار کلمه
+            max_df=0.8  # حداکثر تکرار کلمه
+        )
+    
+    def _set_vectorizer(self, vectorizer):
+        """تنظیم بردارساز و مسیر سریع بردارسازی متناظر با آن"""
+        self.feature_backend = 'hashing' if isinstance(vectorizer, CharNgramHashingVectorizer) else 'bow'
+        if hasattr(vectorizer, 'featurize'):
+            self.features = vectorizer
+        else:
+            self.features = VocabularyFeatures.from_vectorizer(vectorizer)
+        self.vectorizer = vectorizer
+    
+    def _set_model(self, model):
+        """تنظیم مدل؛ مدل‌های scikit-learn به NaiveBayesScorer تبدیل می‌شوند"""
+        if not isinstance(model, NaiveBayesScorer):
+            model = NaiveBayesScorer.from_estimator(model)
+        self.model = model
+    
+    def training_parameters(self):
+        """پارامترهای مدل فعلی برای ثبت در ModelTrainingLog"""
+        parameters = {
+            'algorithm': 'MultinomialNB',
+            'vectorizer': type(self.vectorizer).__name__,
+            'feature_backend': self.feature_backend,
         }
+        if self.feature_backend == 'hashing':
+            parameters.update(self.vectorizer.get_params())
+        else:
+            parameters['max_features'] = self.vectorizer.max_features
+        return parameters
+    
+    def _weights_version(self):
+        """شناسه مدل بر اساس وزن‌ها، برای مدلی که از فایل .ldm بارگذاری نشده است"""
+        digest = hashlib.sha256()
+        digest.update('\0'.join(str(label) for label in self.model.classes_).encode('utf-8'))
+        digest.update(np.ascontiguousarray(self.model.class_log_prior_).tobytes())
+        digest.update(np.ascontiguousarray(self.model.feature_log_prob_t).tobytes())
+        return digest.hexdigest()[:16]
+    
+    def featurize(self, texts):
+        """
+        پیش پردازش و بردارسازی متن ها
+        
+        خروجی: فهرست متن های پیش پردازش شده و ماتریس ویژگی. در صورت سازگار بودن
+        بردارساز، پیش پردازش و توکن سازی در یک مسیر انجام می شود.
+        """
+        if self.features is not None:
+            return self.features.featurize(texts)
+        processed_texts = [self.preprocess_text(text) for text in texts]
+        return processed_texts, self.vectorize(processed_texts)
+    
+    def vectorize(self, processed_texts):
+        """بردارسازی متن های پیش پردازش شده"""
+        if self.features is not None:
+            return self.features.transform(processed_texts)
+        return self.vectorizer.transform(processed_texts)
+    
+    def prepare_training_data(self, corpus_path=None):
+        """
+        بارگذاری کامل داده های آموزشی از corpus در حافظه (برای corpusهای کوچک)
         
-        # تبدیل به فرمت مناسب برای آموزش
+        پیش‌فرض corpus همراه پروژه در detection/training_data است (DETECTION_CORPUS_PATH).
+        """
         texts = []
         labels = []
         
-        for language, sentences in training_data.items():
-            for sentence in sentences:
-                texts.append(self.preprocess_text(sentence))
-                labels.append(language)
+        for text, language in Corpus(corpus_path).iter_samples():
+            texts.append(self.preprocess_text(text))
+            labels.append(language)
         
         return np.array(texts), np.array(labels)
     
-    def train_model(self, test_size=0.2, random_state=42):
-        """آموزش مدل تشخیص زبان"""
+    def train_model(self, test_size=0.2, random_state=42, corpus_path=None, chunk_size=None, progress=None,
+                    activate=True):
+        """
+        آموزش مدل تشخیص زبان
+        
+        corpus_path پوشه corpus (پیش‌فرض DETECTION_CORPUS_PATH) است. با بردارساز hashing
+        corpus به صورت جریانی در قطعه‌های chunk_size تایی با partial_fit آموزش داده
+        می‌شود و حافظه به اندازه corpus بستگی ندارد؛ بردارساز bow به واژگان کل داده
+        نیاز دارد و corpus را کامل در حافظه بارگذاری می‌کند.
+        progress در صورت تعیین با (کسر انجام شده بین 0 و 1، توضیح مرحله) فراخوانی می‌شود.
+        با activate=False نسخه جدید ذخیره ولی فعال نمی‌شود (activate_saved).
+        """
+        from sklearn.metrics import accuracy_score, classification_report
+        
+        report = progress or (lambda fraction, stage: None)
+        corpus = Corpus(corpus_path)
+        if self.feature_backend == 'hashing':
+            y_test, y_pred = self._fit_streaming(corpus, test_size, random_state, chunk_size, report)
+        else:
+            y_test, y_pred = self._fit_in_memory(corpus, test_size, random_state, report)
+        
+        # ذخیره لیست زبان ها
+        self.languages = [str(label) for label in self.model.classes_]
+        
+        accuracy = accuracy_score(y_test, y_pred)
+        
+        print(f"دقت مدل: {accuracy:.2%} ({self.training_samples} نمونه آموزشی، {len(y_test)} نمونه آزمون)")
+        print("\nگزارش تفصیلی:")
+        print(classification_report(y_test, y_pred))
+        
+        # مدل کامل از داده‌های آموزشی ساخته شده است؛ بازخوردها باید دوباره اعمال شوند
+        self.metadata = {}
+        
+        # ذخیره مدل
+        report(0.95, 'ذخیره مدل')
+        if not self.save_model(activate=activate):
+            self.model_version = self._weights_version()
+        
+        # نتایج مدل قبلی با نسخه جدید دیگر خوانده نمی‌شوند؛ حافظه آن‌ها آزاد می‌شود
+        result_cache.clear()
+        
+        return accuracy
+    
+    def _fit_in_memory(self, corpus, test_size, random_state, report):
+        """آموزش با بارگذاری کامل corpus؛ خروجی: (برچسب‌های آزمون، پیش‌بینی‌ها)"""
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.model_selection import train_test_split
+        
         print("در حال آماده سازی داده های آموزشی...")
-        texts, labels = self.prepare_training_data()
+        report(0.05, 'خواندن داده آموزشی')
+        texts, labels = self.prepare_training_data(corpus.path)
         
         print("در حال تقسیم داده ها...")
         X_train, X_test, y_train, y_test = train_test_split(
             texts, labels, test_size=test_size, random_state=random_state, stratify=labels
         )
         
-        print("در حال ایجاد bag of words...")
-        self.vectorizer = CountVectorizer(
-            max_features=5000,  # حداکثر تعداد کلمات
-            ngram_range=(1, 2),  # استفاده از unigrams و bigrams
-            min_df=1,  # حداقل تکرار کلمه
-            max_df=0.8  # حداکثر تکرار کلمه
-        )
+        print("در حال ایجاد ویژگی ها...")
+        report(0.3, 'ایجاد ویژگی‌ها')
+        vectorizer = self._create_vectorizer()
         
-        X_train_vectors = self.vectorizer.fit_transform(X_train)
-        X_test_vectors = self.vectorizer.transform(X_test)
+        X_train_vectors = vectorizer.fit_transform(X_train)
+        X_test_vectors = vectorizer.transform(X_test)
+        self._set_vectorizer(vectorizer)
         
         print("در حال آموزش مدل...")
-        self.model = MultinomialNB(alpha=1.0)
-        self.model.fit(X_train_vectors, y_train)
+        report(0.6, 'آموزش مدل')
+        model = MultinomialNB(alpha=1.0)
+        model.fit(X_train_vectors, y_train)
+        self._set_model(model)
+        self.training_samples = len(y_train)
         
-        # ذخیره لیست زبان ها
-        self.languages = list(set(labels))
+        print("در حال ارزیابی مدل...")
+        report(0.85, 'ارزیابی مدل')
+        return y_test, model.predict(X_test_vectors)
+    
+    def _fit_streaming(self, corpus, test_size, random_state, chunk_size=None, report=None):
+        """
+        آموزش جریانی با partial_fit روی قطعه‌های corpus؛ خروجی: (برچسب‌های آزمون، پیش‌بینی‌ها)
+        
+        هر نمونه با احتمال test_size برای ارزیابی کنار گذاشته می‌شود؛ تعداد نمونه‌های
+        آزمون نگهداری شده در حافظه حداکثر DETECTION_TRAINING_MAX_TEST_SAMPLES است.
+        """
+        from sklearn.naive_bayes import MultinomialNB
+        
+        if chunk_size is None:
+            chunk_size = getattr(settings, 'DETECTION_TRAINING_CHUNK_SIZE', 10000)
+        max_test_samples = getattr(settings, 'DETECTION_TRAINING_MAX_TEST_SAMPLES', 20000)
+        
+        vectorizer = self._create_vectorizer()
+        classes = np.array(corpus.languages)
+        model = MultinomialNB(alpha=1.0)
+        rng = np.random.default_rng(random_state)
+        test_texts = []
+        test_labels = []
+        self.training_samples = 0
+        # پیشرفت بر اساس حجم خوانده شده از فایل‌های corpus تخمین زده می‌شود
+        total_bytes = corpus.size_bytes() or 1
+        read_bytes = 0
+        
+        print(f"در حال آموزش جریانی مدل از {corpus.path}...")
+        for texts, labels in corpus.iter_chunks(chunk_size):
+            read_bytes += sum(len(text.encode('utf-8')) + 1 for text in texts)
+            processed_texts = [self.preprocess_text(text) for text in texts]
+            held_out = rng.random(len(processed_texts)) < test_size
+            train_texts = []
+            train_labels = []
+            for text, label, test in zip(processed_texts, labels, held_out):
+                if test and len(test_texts) < max_test_samples:
+                    test_texts.append(text)
+                    test_labels.append(label)
+                else:
+                    train_texts.append(text)
+                    train_labels.append(label)
+            if train_texts:
+                model.partial_fit(vectorizer.transform(train_texts), train_labels, classes=classes)
+                self.training_samples += len(train_texts)
+            if report is not None:
+                report(0.05 + 0.8 * min(read_bytes / total_bytes, 1.0), f'آموزش: {self.training_samples} نمونه')
+        
+        if not self.training_samples or not test_texts:
+            raise Exception("نمونه کافی برای آموزش و ارزیابی در corpus وجود ندارد.")
+        self._set_vectorizer(vectorizer)
+        self._set_model(model)
         
         print("در حال ارزیابی مدل...")
-        y_pred = self.model.predict(X_test_vectors)
-        accuracy = accuracy_score(y_test, y_pred)
+        if report is not None:
+            report(0.85, 'ارزیابی مدل')
+        return np.array(test_labels), model.predict(vectorizer.transform(test_texts))
+    
+    def incremental_update(self, texts, labels, metadata=None):
+        """
+        به‌روزرسانی افزایشی مدل با نمونه‌های جدید بدون آموزش کامل
         
-        print(f"دقت مدل: {accuracy:.2%}")
-        print("\nگزارش تفصیلی:")
-        print(classification_report(y_test, y_pred))
+        شمارش‌های Naive Bayes با نمونه‌های جدید جمع می‌شوند (بردارساز و واژگان ثابت
+        می‌مانند). خروجی یک نمونه جدید LanguageDetector است و نمونه فعلی که ممکن
+        است در حال سرویس‌دهی باشد تغییر نمی‌کند.
+        """
+        if self.model is None or self.vectorizer is None:
+            if not self.load_model():
+                raise Exception("مدل آموزش داده نشده است.")
         
-        # ذخیره مدل
-        self.save_model()
+        model = self.model.partial_fit(self.vectorize([self.preprocess_text(text) for text in texts]), labels)
         
-        return accuracy
+        detector = LanguageDetector(self.feature_backend)
+        detector.model_path = self.model_path
+        detector._set_vectorizer(self.vectorizer)
+        detector._set_model(model)
+        detector.languages = [str(label) for label in model.classes_]
+        detector.metadata = {**self.metadata, **(metadata or {})}
+        detector.model_version = detector._weights_version()
+        return detector
+    
+    def score_vectors(self, text_vectors, top_k=None):
+        """
+        محاسبه یک‌باره ماتریس لگاریتم احتمال و استخراج زبان برنده، اطمینان و توزیع احتمال
+        
+        خروجی برای هر سطر یک سه‌تایی (زبان، اطمینان، دیکشنری احتمالات) است.
+        با top_k فقط k زبان محتمل‌تر در دیکشنری احتمالات قرار می‌گیرند.
+        """
+        # predict و predict_proba هر کدام likelihood را جداگانه محاسبه می‌کنند؛ اینجا فقط یک بار
+        log_probabilities = self.model.predict_log_proba(text_vectors)
+        best = log_probabilities.argmax(axis=1)
+        classes = self.model.classes_
+        n_classes = len(classes)
+        
+        if top_k is None or top_k >= n_classes:
+            probabilities = np.exp(log_probabilities)
+            labels = classes.tolist()
+            return [
+                (labels[best_index], float(row[best_index]), dict(zip(labels, row.tolist())))
+                for row, best_index in zip(probabilities, best)
+            ]
+        
+        scored = []
+        for row, best_index in zip(log_probabilities, best):
+            if top_k <= 1:
+                indices = [best_index]
+            else:
+                # مرتب‌سازی پایدار تا در صورت تساوی، زبان برنده اول بیاید
+                indices = np.argsort(-row, kind='stable')[:top_k]
+            prob_dict = {str(classes[i]): float(np.exp(row[i])) for i in indices}
+            scored.append((str(classes[best_index]), float(np.exp(row[best_index])), prob_dict))
+        return scored
     
     def predict_language(self, text):
         """تشخیص زبان متن ورودی"""
@@ -606,84 +344,208 @@ class LanguageDetector:
             if not self.load_model():
                 raise Exception("مدل آموزش داده نشده است. ابتدا مدل را آموزش دهید.")
         
-        # پیش پردازش متن
-        processed_text = self.preprocess_text(text)
+        # پیش پردازش متن و تبدیل به vector
+        processed_texts, text_vector = self.featurize([text])
         
-        if not processed_text.strip():
+        if not processed_texts[0].strip():
             return None, 0.0
         
-        # تبدیل به vector
-        text_vector = self.vectorizer.transform([processed_text])
-        
-        # پیش بینی
-        prediction = self.model.predict(text_vector)[0]
-        
-        # احتمال پیش بینی
-        probabilities = self.model.predict_proba(text_vector)[0]
-        max_prob = max(probabilities)
+        # پیش بینی و احتمال آن با یک بار محاسبه
+        prediction, max_prob, _ = self.score_vectors(text_vector, top_k=1)[0]
         
         return prediction, max_prob
     
-    def predict_with_confidence(self, text):
+    def predict_with_confidence(self, text, top_k=None):
         """تشخیص زبان با جزئیات بیشتر"""
+        return self.predict_many([text], top_k=top_k)[0]
+    
+    def predict_many(self, texts, top_k=None):
+        """
+        تشخیص زبان چند متن مستقل با استفاده از cache نتایج
+        
+        متن‌های تکراری (پس از پیش پردازش) از cache پاسخ داده می‌شوند و بقیه با یک بار
+        بردارسازی و یک بار محاسبه احتمال امتیازدهی می‌شوند؛ خروجی هر متن همانند
+        predict_with_confidence است.
+        """
         if self.model is None or self.vectorizer is None:
             if not self.load_model():
                 raise Exception("مدل آموزش داده نشده است.")
         
-        processed_text = self.preprocess_text(text)
+        with stage('preprocess'):
+            processed_texts = [self.preprocess_text(text) for text in texts]
+        scored = [None] * len(texts)
+        cache_keys = [None] * len(texts)
         
-        if not processed_text.strip():
-            return {
-                'predicted_language': None,
-                'confidence': 0.0,
-                'all_probabilities': {},
-                'text_length': 0
-            }
+        # متن‌های تکراری (پس از پیش پردازش) از cache نتایج پاسخ داده می‌شوند
+        use_cache = result_cache.enabled
+        misses = []
+        with stage('cache_lookup'):
+            for i, processed_text in enumerate(processed_texts):
+                if not processed_text.strip():
+                    continue
+                if use_cache:
+                    cache_keys[i] = result_cache.make_key(self.model_version, processed_text, top_k)
+                    scored[i] = result_cache.get(cache_keys[i])
+                if scored[i] is None:
+                    misses.append(i)
         
-        text_vector = self.vectorizer.transform([processed_text])
+        if misses:
+            # پیش بینی
+            with stage('vectorize'):
+                vectors = self.vectorize([processed_texts[i] for i in misses])
+            with stage('score'):
+                for i, result in zip(misses, self.score_vectors(vectors, top_k=top_k)):
+                    scored[i] = result
+                    if cache_keys[i] is not None:
+                        result_cache.set(cache_keys[i], result)
         
-        # پیش بینی
-        prediction = self.model.predict(text_vector)[0]
-        probabilities = self.model.predict_proba(text_vector)[0]
+        results = []
+        for text, processed_text, result in zip(texts, processed_texts, scored):
+            if result is None:
+                results.append({
+                    'predicted_language': None,
+                    'confidence': 0.0,
+                    'all_probabilities': {},
+                    'text_length': 0
+                })
+                continue
+            prediction, confidence, prob_dict = result
+            results.append({
+                'predicted_language': prediction,
+                'confidence': confidence,
+                'all_probabilities': dict(prob_dict),
+                'text_length': len(text),
+                'processed_text_length': len(processed_text)
+            })
+        return results
+    
+    def predict_batch(self, texts, top_k=None):
+        """تشخیص زبان دسته‌ای از متن‌ها با یک بار بردارسازی و یک بار محاسبه احتمال"""
+        if self.model is None or self.vectorizer is None:
+            if not self.load_model():
+                raise Exception("مدل آموزش داده نشده است.")
         
-        # ایجاد دیکشنری احتمالات
-        prob_dict = {}
-        for i, lang in enumerate(self.model.classes_):
-            prob_dict[lang] = float(probabilities[i])
+        # پیش پردازش و بردارسازی در یک مسیر انجام می‌شوند و یک مرحله حساب می‌شوند
+        with stage('featurize'):
+            processed_texts, text_vectors = self.featurize(texts)
         
-        return {
-            'predicted_language': prediction,
-            'confidence': float(max(probabilities)),
-            'all_probabilities': prob_dict,
-            'text_length': len(text),
-            'processed_text_length': len(processed_text)
-        }
+        # فقط متن‌های غیرخالی امتیازدهی می‌شوند؛ ترتیب خروجی با ورودی یکسان است
+        positions = [i for i, processed in enumerate(processed_texts) if processed.strip()]
+        results = [{
+            'predicted_language': None,
+            'confidence': 0.0,
+            'all_probabilities': {},
+            'text_length': 0
+        } for _ in texts]
+        
+        if not positions:
+            return results
+        
+        with stage('score'):
+            scored = self.score_vectors(text_vectors[positions], top_k=top_k)
+        
+        for i, (prediction, confidence, prob_dict) in zip(positions, scored):
+            results[i] = {
+                'predicted_language': prediction,
+                'confidence': confidence,
+                'all_probabilities': prob_dict,
+                'text_length': len(texts[i]),
+                'processed_text_length': len(processed_texts[i])
+            }
+        
+        return results
     
-    def save_model(self):
-        """ذخیره مدل آموزش داده شده"""
+    def save_model(self, version=None, activate=True):
+        """
+        ذخیره مدل آموزش داده شده به عنوان یک نسخه جدید
+        
+        فایل مدل در پوشه versions/<version> نوشته می‌شود و با activate اشاره‌گر نسخه
+        فعال به صورت اتمیک به آن منتقل می‌شود؛ نسخه‌های قبلی برای rollback باقی
+        می‌مانند (حداکثر DETECTION_MODEL_KEEP_VERSIONS نسخه).
+        """
         try:
-            model_file = os.path.join(self.model_path, 'language_model.pkl')
-            vectorizer_file = os.path.join(self.model_path, 'vectorizer.pkl')
-            languages_file = os.path.join(self.model_path, 'languages.pkl')
-            
-            with open(model_file, 'wb') as f:
-                pickle.dump(self.model, f)
-            
-            with open(vectorizer_file, 'wb') as f:
-                pickle.dump(self.vectorizer, f)
+            # قالب memory-mapped بدون pickle؛ بارگذاری آن به scikit-learn نیازی ندارد
+            if self.features is None:
+                raise Exception("بردارساز فعلی با قالب فایل مدل سازگار نیست")
+            version = version or model_versions.new_version(self.model_path)
+            os.makedirs(model_versions.version_dir(self.model_path, version), exist_ok=True)
+            header = save_artifact(model_versions.artifact_path(self.model_path, version), self.model,
+                                   self.features, metadata=self.metadata)
+            self.model_version = header['checksum']['digest'][:16]
+            self.artifact_version = version
+            if activate:
+                self.activate_saved()
             
-            with open(languages_file, 'wb') as f:
-                pickle.dump(self.languages, f)
-            
-            print(f"مدل با موفقیت در {self.model_path} ذخیره شد")
+            print(f"مدل با موفقیت در {self.model_path} ذخیره شد (نسخه {version})")
             return True
         
         except Exception as e:
             print(f"خطا در ذخیره مدل: {e}")
             return False
     
-    def load_model(self):
-        """بارگذاری مدل ذخیره شده"""
+    def activate_saved(self):
+        """فعال‌سازی نسخه ذخیره شده این نمونه و حذف نسخه‌های قدیمی"""
+        model_versions.set_active_version(self.model_path, self.artifact_version)
+        self._prune_versions()
+    
+    def _prune_versions(self):
+        """حذف نسخه‌های قدیمی به جز نسخه‌هایی که ModelTrainingLog (گزینه‌های rollback) به آن‌ها اشاره می‌کند"""
+        try:
+            protected = logged_versions()
+        except DatabaseError:
+            # بدون فهرست نسخه‌های ثبت شده هیچ نسخه‌ای حذف نمی‌شود
+            logger.exception('خطا در خواندن نسخه‌های ثبت شده مدل؛ نسخه‌های قدیمی حذف نشدند')
+            return
+        model_versions.prune_versions(
+            self.model_path, getattr(settings, 'DETECTION_MODEL_KEEP_VERSIONS', 20), protected=protected
+        )
+    
+    def load_model(self, version=None):
+        """
+        بارگذاری مدل ذخیره شده (نسخه فعال یا نسخه تعیین شده)
+
+        اگر اشاره‌گر ACTIVE یا فایل .ldm وجود داشته باشد ولی بارگذاری آن (مثلاً به دلیل
+        checksum نادرست) ناموفق باشد ModelFormatError ایجاد می‌شود؛ فایل‌های pickle
+        قدیمی فقط در نبود هر دو خوانده می‌شوند.
+        """
+        explicit = version is not None
+        try:
+            if version is None:
+                version = model_versions.get_active_version(self.model_path)
+            artifact_file = (
+                model_versions.artifact_path(self.model_path, version) if version
+                else model_versions.active_artifact_path(self.model_path)
+            )
+        except model_versions.ModelVersionError as e:
+            logger.error('اشاره‌گر نسخه فعال مدل نامعتبر است: %s', e)
+            raise ModelFormatError(str(e)) from e
+        if not os.path.exists(artifact_file):
+            if explicit:
+                return False
+            if version is not None:
+                logger.error('فایل مدل نسخه فعال %s یافت نشد: %s', version, artifact_file)
+                raise ModelFormatError(f'فایل مدل نسخه فعال {version} یافت نشد')
+            return self._load_pickles()
+        try:
+            verify = getattr(settings, 'DETECTION_MODEL_VERIFY_CHECKSUM', True)
+            scorer, features, header = load_artifact(artifact_file, verify=verify)
+        except Exception as e:
+            # فایل خراب هرگز با فایل‌های pickle قدیمی جایگزین نمی‌شود
+            logger.error('خطا در بارگذاری فایل مدل %s: %s', artifact_file, e)
+            if isinstance(e, ModelFormatError):
+                raise
+            raise ModelFormatError(f'فایل مدل {artifact_file} قابل بارگذاری نیست: {e}') from e
+        self._set_vectorizer(features)
+        self.languages = list(header['classes'])
+        self._set_model(scorer)
+        self.model_version = header['checksum']['digest'][:16]
+        self.artifact_version = version
+        self.metadata = header.get('metadata', {})
+        print("مدل با موفقیت بارگذاری شد")
+        return True
+    
+    def _load_pickles(self):
+        """بارگذاری فایل‌های pickle قدیمی (unpickle کردن آن‌ها scikit-learn را import می‌کند)"""
         try:
             model_file = os.path.join(self.model_path, 'language_model.pkl')
             vectorizer_file = os.path.join(self.model_path, 'vectorizer.pkl')
@@ -693,13 +555,19 @@ class LanguageDetector:
                 return False
             
             with open(model_file, 'rb') as f:
-                self.model = pickle.load(f)
+                model = pickle.load(f)
             
             with open(vectorizer_file, 'rb') as f:
-                self.vectorizer = pickle.load(f)
+                vectorizer = pickle.load(f)
             
             with open(languages_file, 'rb') as f:
-                self.languages = pickle.load(f)
+                languages = pickle.load(f)
+            
+            # تخصیص پس از بارگذاری کامل تا نمونه مشترک هرگز نیمه‌کاره دیده نشود
+            self._set_vectorizer(vectorizer)
+            self.languages = languages
+            self._set_model(model)
+            self.model_version = self._weights_version()
             
             print("مدل با موفقیت بارگذاری شد")
             return True
@@ -0,0 +1,338 @@
+import contextlib
+import io
+import json
+import os
+import pickle
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.batching import MicroBatcher, get_config as get_batching_config
+from detection.features import VocabularyFeatures
+from detection.language_detector import LanguageDetector
+from detection.model_store import ARTIFACT_NAME, load_artifact
+from detection.model_versions import active_artifact_path
+from detection.registry import get_detector
+from detection.result_cache import result_cache
+
+
+# اسکریپت اجرای worker در پروسس جدا برای سنجش زمان راه‌اندازی و حافظه
+STARTUP_SCRIPT = """
+import json, os, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+if sys.argv[1] == 'sklearn':
+    # importهای سطح ماژول نسخه قبلی language_detector
+    import sklearn.naive_bayes, sklearn.feature_extraction.text, sklearn.model_selection, sklearn.metrics
+from detection.registry import get_detector
+detector = get_detector()
+detector.predict_with_confidence('warm up')
+print(json.dumps({
+    'seconds': time.perf_counter() - start,
+    'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'sklearn_loaded': 'sklearn' in sys.modules,
+}))
+"""
+
+
+# نمونه متن‌های کوتاه با خط‌های مختلف برای سنجش کارایی
+SAMPLE_TEXTS = [
+    "Hello how are you today?",
+    "The weather is nice today, let's go to the park at 10 o'clock.",
+    "سلام حال شما چطور است؟",
+    "امروز ساعت ۱۰ جلسه داریم و باید گزارش را آماده کنم.",
+    "مرحبا كيف حالك اليوم؟",
+    "أنا أحب القراءة في المساء مع فنجان من القهوة.",
+    "Bonjour comment allez-vous?",
+    "Hallo wie geht es dir?",
+    "Hola como estas hoy?",
+    "Ciao come stai oggi?",
+    "Привет, как дела сегодня?",
+    "Merhaba bugün nasılsın?",
+    "你好，今天天气很好。",
+    "こんにちは、今日はいい天気ですね。",
+    "नमस्ते आप कैसे हैं?",
+]
+
+
+class Command(BaseCommand):
+    help = 'سنجش کارایی مسیرهای تشخیص زبان'
+
+    SUITES = ['batch', 'scoring', 'preprocess', 'features', 'load', 'startup', 'cache', 'microbatch', 'incremental']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suite', choices=self.SUITES, default='batch')
+        parser.add_argument('-n', '--num-texts', type=int, default=1000,
+                            help='تعداد متن‌ها در هر دور سنجش')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='تعداد تکرار هر سنجش (بهترین زمان گزارش می‌شود)')
+        parser.add_argument('--threads', type=int, default=32,
+                            help='تعداد فراخوانی‌کنندگان همزمان در سنجش microbatch')
+
+    def handle(self, *args, **options):
+        self.repeat = max(1, options['repeat'])
+        self.threads = max(1, options['threads'])
+        texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(options['num_texts'])]
+        getattr(self, f"bench_{options['suite']}")(texts)
+
+    def timeit(self, func):
+        """بهترین زمان اجرای func در چند تکرار (ثانیه)"""
+        best = float('inf')
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def report(self, label, seconds, count):
+        self.stdout.write(
+            f"{label:<32} {seconds * 1000:10.2f} ms  "
+            f"{seconds / count * 1e6:10.2f} us/text  {count / seconds:12.0f} texts/s"
+        )
+
+    def get_trained_detector(self):
+        detector = get_detector()
+        if detector.model is None and not detector.load_model():
+            raise CommandError('مدل آموزش داده نشده است. ابتدا مدل را آموزش دهید.')
+        return detector
+
+    @contextlib.contextmanager
+    def result_cache_disabled(self):
+        """غیرفعال کردن موقت cache نتایج تا هزینه واقعی تشخیص سنجیده شود"""
+        max_size = result_cache.max_size
+        result_cache.max_size = 0
+        try:
+            yield
+        finally:
+            result_cache.max_size = max_size
+
+    def bench_batch(self, texts):
+        """مقایسه N فراخوانی تکی با یک فراخوانی دسته‌ای"""
+        detector = self.get_trained_detector()
+        with self.result_cache_disabled():
+            single = self.timeit(lambda: [detector.predict_with_confidence(text) for text in texts])
+        batch = self.timeit(lambda: detector.predict_batch(texts))
+        self.report('predict_with_confidence x N', single, len(texts))
+        self.report('predict_batch', batch, len(texts))
+        self.stdout.write(self.style.SUCCESS(f'speedup: {single / batch:.1f}x'))
+
+    def bench_scoring(self, texts):
+        """مقایسه predict + predict_proba با محاسبه یک‌باره لگاریتم احتمال"""
+        detector = self.get_trained_detector()
+        model = detector.model
+        vectors = [detector.featurize([text])[1] for text in texts]
+
+        def predict_twice():
+            for vector in vectors:
+                prediction = model.predict(vector)[0]
+                probabilities = model.predict_proba(vector)[0]
+                dict(zip(model.classes_, probabilities))
+
+        twice = self.timeit(predict_twice)
+        single = self.timeit(lambda: [detector.score_vectors(vector) for vector in vectors])
+        top1 = self.timeit(lambda: [detector.score_vectors(vector, top_k=1) for vector in vectors])
+        self.report('predict + predict_proba', twice, len(texts))
+        self.report('score_vectors', single, len(texts))
+        self.report('score_vectors(top_k=1)', top1, len(texts))
+        self.stdout.write(self.style.SUCCESS(f'speedup: {twice / single:.1f}x (top_k=1: {twice / top1:.1f}x)'))
+
+    def bench_preprocess(self, texts):
+        """سنجش پیش‌پردازش و بردارسازی روی متن‌های چندخطی (فارسی، عربی، CJK، لاتین)"""
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        detector = self.get_trained_detector()
+        features = detector.features
+        if not isinstance(features, VocabularyFeatures):
+            raise CommandError('این سنجش فقط برای بردارساز کیسه کلمات (bow) است.')
+        # CountVectorizer با همان واژگان، معادل مسیر قبلی بردارسازی
+        vectorizer = CountVectorizer(ngram_range=features.ngram_range, vocabulary=features.vocabulary)
+
+        def legacy_preprocess(text):
+            # پیاده‌سازی قبلی preprocess_text برای مقایسه
+            text = re.sub(r'[^\w\s]', ' ', text)
+            text = re.sub(r'\d+', '', text)
+            text = text.lower().strip()
+            return re.sub(r'\s+', ' ', text)
+
+        legacy_pre = self.timeit(lambda: [legacy_preprocess(text) for text in texts])
+        fused_pre = self.timeit(lambda: [detector.preprocess_text(text) for text in texts])
+        legacy = self.timeit(lambda: [vectorizer.transform([legacy_preprocess(text)]) for text in texts])
+        fused = self.timeit(lambda: [detector.featurize([text]) for text in texts])
+        legacy_batch = self.timeit(lambda: vectorizer.transform([legacy_preprocess(text) for text in texts]))
+        fused_batch = self.timeit(lambda: detector.featurize(texts))
+        self.report('legacy preprocess_text', legacy_pre, len(texts))
+        self.report('compiled preprocess_text', fused_pre, len(texts))
+        self.report('legacy preprocess+transform', legacy, len(texts))
+        self.report('fused featurize', fused, len(texts))
+        self.report('legacy (batch)', legacy_batch, len(texts))
+        self.report('fused featurize (batch)', fused_batch, len(texts))
+        self.stdout.write(self.style.SUCCESS(
+            f'speedup: per-text {legacy / fused:.1f}x, batch {legacy_batch / fused_batch:.1f}x'
+        ))
+
+    def bench_features(self, texts):
+        """مقایسه دقت و تأخیر بردارساز کیسه کلمات با n-gram کاراکتری درهم‌سازی‌شده"""
+        seeds = [42, 7, 2024]
+        for backend in LanguageDetector.FEATURE_BACKENDS:
+            with tempfile.TemporaryDirectory() as model_dir:
+                accuracies = []
+                for seed in seeds:
+                    detector = LanguageDetector(feature_backend=backend)
+                    detector.model_path = model_dir
+                    # گزارش‌های آموزش در خروجی سنجش چاپ نمی‌شوند
+                    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+                        warnings.simplefilter('ignore')
+                        accuracies.append(detector.train_model(random_state=seed))
+                artifact = active_artifact_path(model_dir)
+                artifact_size = os.path.getsize(artifact)
+                load_time = self.timeit(lambda: load_artifact(artifact, verify=False))
+
+            single = self.timeit(lambda: [detector.predict_with_confidence(text) for text in texts])
+            batch = self.timeit(lambda: detector.predict_batch(texts))
+            self.stdout.write(self.style.MIGRATE_HEADING(f'[{backend}]'))
+            self.stdout.write(
+                f'accuracy (mean of {len(seeds)} splits): {sum(accuracies) / len(accuracies):.2%}  '
+                f'{ARTIFACT_NAME}: {artifact_size / 1024:.1f} KiB, load {load_time * 1000:.2f} ms'
+            )
+            self.report('predict_with_confidence x N', single, len(texts))
+            self.report('predict_batch', batch, len(texts))
+
+    def bench_load(self, texts):
+        """مقایسه زمان بارگذاری فایل‌های pickle با نگاشت فایل مدل memory-mapped"""
+        model_path = LanguageDetector().model_path
+        artifact = active_artifact_path(model_path)
+        if not os.path.exists(artifact):
+            raise CommandError('فایل مدل memory-mapped یافت نشد؛ ابتدا convert_model را اجرا کنید.')
+
+        def load_pickles():
+            for name in ('language_model.pkl', 'vectorizer.pkl', 'languages.pkl'):
+                with open(os.path.join(model_path, name), 'rb') as f:
+                    pickle.load(f)
+
+        if all(os.path.exists(os.path.join(model_path, name)) for name in ('language_model.pkl', 'vectorizer.pkl', 'languages.pkl')):
+            pickles = self.timeit(load_pickles)
+            self.stdout.write(f"{'pickle (3 files)':<32} {pickles * 1000:10.2f} ms")
+        verified = self.timeit(lambda: load_artifact(artifact, verify=True))
+        mapped = self.timeit(lambda: load_artifact(artifact, verify=False))
+        self.stdout.write(f"{'mmap artifact + sha256':<32} {verified * 1000:10.2f} ms")
+        self.stdout.write(f"{'mmap artifact':<32} {mapped * 1000:10.2f} ms")
+
+    def bench_startup(self, texts):
+        """زمان راه‌اندازی و حداکثر RSS یک worker با و بدون import کردن scikit-learn"""
+        self.get_trained_detector()
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'language_detection.settings'))
+        for mode in ('sklearn', 'numpy'):
+            runs = []
+            for _ in range(self.repeat):
+                completed = subprocess.run(
+                    [sys.executable, '-c', STARTUP_SCRIPT, mode],
+                    cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True
+                )
+                runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            seconds = min(run['seconds'] for run in runs)
+            rss = min(run['max_rss_kib'] for run in runs)
+            self.stdout.write(
+                f"{mode + ' worker':<32} startup {seconds * 1000:8.1f} ms  max RSS {rss / 1024:7.1f} MiB  "
+                f"sklearn imported: {runs[0]['sklearn_loaded']}"
+            )
+
+    def bench_cache(self, texts):
+        """مقایسه predict_with_confidence بدون cache و با cache نتایج گرم (متن‌های تکراری)"""
+        detector = self.get_trained_detector()
+        with self.result_cache_disabled():
+            uncached = self.timeit(lambda: [detector.predict_with_confidence(text) for text in texts])
+        result_cache.clear()
+        cached = self.timeit(lambda: [detector.predict_with_confidence(text) for text in texts])
+        self.report('without result cache', uncached, len(texts))
+        self.report('with result cache', cached, len(texts))
+        self.stdout.write(f'cache stats: {result_cache.stats()}')
+        self.stdout.write(self.style.SUCCESS(f'speedup: {uncached / cached:.1f}x'))
+
+    def bench_microbatch(self, texts):
+        """مقایسه فراخوانی‌های تکی همزمان مستقیم با micro-batching (هر متن یک فراخوانی)"""
+        detector = self.get_trained_detector()
+        config = get_batching_config()
+        batcher = MicroBatcher(max_batch_size=config['MAX_BATCH_SIZE'], max_wait=config['MAX_WAIT_MS'] / 1000,
+                               max_queue_size=len(texts), detector_getter=lambda: detector)
+
+        def concurrent(predict):
+            latencies = []
+
+            def call(text):
+                start = time.perf_counter()
+                predict(text)
+                latencies.append(time.perf_counter() - start)
+
+            with ThreadPoolExecutor(self.threads) as pool:
+                list(pool.map(call, texts))
+            return sorted(latencies)
+
+        with self.result_cache_disabled():
+            # درخواست‌های پشت سر هم (بدون همزمانی) نباید هزینه صف را بپردازند
+            sequential_direct = self.timeit(lambda: [detector.predict_with_confidence(text) for text in texts])
+            sequential_batched = self.timeit(lambda: [batcher.predict(text) for text in texts])
+            direct = self.timeit(lambda: concurrent(detector.predict_with_confidence))
+            batched = self.timeit(lambda: concurrent(batcher.predict))
+            latencies = concurrent(batcher.predict)
+        self.report('direct, sequential', sequential_direct, len(texts))
+        self.report('micro-batched, sequential', sequential_batched, len(texts))
+        self.report(f'direct, {self.threads} threads', direct, len(texts))
+        self.report(f'micro-batched, {self.threads} threads', batched, len(texts))
+        self.stdout.write(
+            f'micro-batched latency: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms  '
+            f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms'
+        )
+        stats = batcher.stats()
+        self.stdout.write(
+            f"batches: {stats['batches']}  direct: {stats['direct']}  avg size: {stats['avg_batch_size']:.1f}  "
+            f"avg wait: {stats['avg_wait_ms']:.2f} ms  sizes: {stats['batch_size_distribution']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f'speedup: {direct / batched:.1f}x'))
+
+    def bench_incremental(self, texts):
+        """
+        مقایسه به‌روزرسانی افزایشی با آموزش کامل با افزایش حجم بازخورد انباشته
+
+        در هر اجرای دوره‌ای n/100 بازخورد جدید می‌رسد: آموزش کامل باید داده آموزشی و
+        کل بازخوردهای انباشته (n/100، n/10 و n) را دوباره پردازش کند ولی به‌روزرسانی
+        افزایشی فقط بازخوردهای جدید را. نمونه‌ها از داده آموزشی با برچسب درست انتخاب
+        می‌شوند و هیچ فایلی نوشته نمی‌شود.
+        """
+        from sklearn.naive_bayes import MultinomialNB
+
+        base = LanguageDetector()
+        corpus, labels = base.prepare_training_data()
+
+        def full_fit(extra_texts, extra_labels):
+            vectorizer = base._create_vectorizer()
+            processed = [base.preprocess_text(text) for text in extra_texts]
+            vectors = vectorizer.fit_transform(np.concatenate([corpus, processed]))
+            return vectorizer, MultinomialNB(alpha=1.0).fit(vectors, np.concatenate([labels, extra_labels]))
+
+        vectorizer, model = full_fit([], [])
+        base._set_vectorizer(vectorizer)
+        base._set_model(model)
+
+        rng = np.random.default_rng(0)
+        delta = max(1, len(texts) // 100)
+        indices = rng.integers(0, len(corpus), delta)
+        new_texts, new_labels = corpus[indices].tolist(), labels[indices].tolist()
+        incremental = self.timeit(lambda: base.incremental_update(new_texts, new_labels))
+
+        for size in sorted({delta, max(1, len(texts) // 10), len(texts)}):
+            indices = rng.integers(0, len(corpus), size)
+            feedback_texts, feedback_labels = corpus[indices].tolist(), labels[indices].tolist()
+            full = self.timeit(lambda: full_fit(feedback_texts, feedback_labels))
+            self.report(f'full retrain, {size} accumulated', full, len(corpus) + size)
+            self.report(f'incremental, {delta} new', incremental, delta)
+            self.stdout.write(self.style.SUCCESS(f'speedup: {full / incremental:.1f}x'))
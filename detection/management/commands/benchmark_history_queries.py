@@ -0,0 +1,148 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Avg, Count
+from django.utils import timezone
+from django.core.management.base import BaseCommand
+
+from detection.models import DetectionHistory, Language
+
+
+class Command(BaseCommand):
+    help = (
+        'سنجش کوئری‌های صفحات history و statistics روی N رکورد ساختگی، با و بدون '
+        'ایندکس‌های DetectionHistory (همه تغییرات در پایان rollback می‌شوند)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--rows', type=int, default=100000,
+                            help='تعداد رکوردهای ساختگی تاریخچه')
+        parser.add_argument('--users', type=int, default=100,
+                            help='تعداد کاربران ساختگی')
+        parser.add_argument('--days', type=int, default=90,
+                            help='بازه زمانی پخش رکوردها (روز)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='تعداد تکرار هر کوئری (بهترین زمان گزارش می‌شود)')
+        parser.add_argument('--explain', action='store_true',
+                            help='نمایش query plan هر کوئری')
+
+    def handle(self, *args, **options):
+        self.repeat = max(1, options['repeat'])
+        self.explain = options['explain']
+
+        with transaction.atomic():
+            self.seed(options['rows'], options['users'], options['days'])
+            queries = self.get_queries()
+
+            self.stdout.write(self.style.MIGRATE_HEADING('با ایندکس‌ها'))
+            after = self.run_queries(queries)
+
+            self.drop_indexes()
+            self.stdout.write(self.style.MIGRATE_HEADING('بدون ایندکس‌ها'))
+            before = self.run_queries(queries)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('نتیجه'))
+            for label in queries:
+                self.stdout.write(
+                    f'{label:<36} {before[label] * 1000:10.2f} ms -> {after[label] * 1000:10.2f} ms'
+                    f'  ({before[label] / after[label]:.1f}x)'
+                )
+
+            # داده‌های ساختگی و حذف ایندکس‌ها ذخیره نمی‌شوند
+            transaction.set_rollback(True)
+
+    def seed(self, rows, users, days):
+        start = time.perf_counter()
+        now = timezone.now()
+        languages = list(Language.objects.all())
+        for code in ['english', 'persian', 'arabic', 'french', 'german', 'spanish']:
+            if not any(language.code == code for language in languages):
+                languages.append(Language.objects.create(code=code, name=f'bench-{code}', native_name=code))
+        bench_users = [
+            User.objects.create(username=f'bench-history-{i}') for i in range(max(1, users))
+        ]
+        self.user = bench_users[0]
+
+        rng = random.Random(42)
+        span = days * 86400
+        batch = []
+        for i in range(rows):
+            batch.append(DetectionHistory(
+                user=rng.choice(bench_users) if rng.random() < 0.7 else None,
+                input_text='benchmark text',
+                detected_language=rng.choice(languages),
+                confidence_score=rng.random(),
+                processing_time=rng.random() / 100,
+                created_at=now - timedelta(seconds=rng.randrange(span)),
+                text_length=14,
+                word_count=2,
+            ))
+            if len(batch) >= 5000:
+                DetectionHistory.objects.bulk_create(batch)
+                batch = []
+        DetectionHistory.objects.bulk_create(batch)
+
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(f'{rows} رکورد در {time.perf_counter() - start:.1f} ثانیه ساخته شد')
+
+    def get_queries(self):
+        """همان کوئری‌هایی که صفحات history و statistics اجرا می‌کنند"""
+        seven_days_ago = timezone.now() - timedelta(days=7)
+        user_history = DetectionHistory.objects.filter(user=self.user).order_by('-created_at', '-id')
+        recent = DetectionHistory.objects.filter(created_at__gte=seven_days_ago)
+        # برچسب -> (queryset، نحوه اجرا)
+        queries = {
+            'history: first page': (user_history[:10], 'list'),
+            'history: page 50 (offset)': (user_history[490:500], 'list'),
+            'history: count': (user_history, 'count'),
+            'statistics: daily (7 days)': (recent.extra(
+                select={'day': 'date(created_at)'}
+            ).values('day').annotate(count=Count('id')).order_by('day'), 'list'),
+            'statistics: languages (7 days)': (recent.values('detected_language').annotate(
+                count=Count('id'), avg_confidence=Avg('confidence_score')
+            ), 'list'),
+            'statistics: count (7 days)': (recent, 'count'),
+        }
+        # همان صفحه با keyset (شرط cursor صفحه تاریخچه روی آخرین رکورد صفحه ۴۹)
+        boundary = user_history[489:490].first()
+        if boundary is not None:
+            queries['history: page 50 (keyset)'] = (user_history.filter(
+                created_at__lte=boundary.created_at
+            ).exclude(created_at=boundary.created_at, id__gte=boundary.pk)[:10], 'list')
+        return queries
+
+    def run_queries(self, queries):
+        timings = {}
+        for label, (queryset, method) in queries.items():
+            if method == 'count':
+                func = queryset.count
+            else:
+                def func(queryset=queryset):
+                    # all() یک queryset تازه و بدون نتیجه cache شده می‌سازد
+                    return list(queryset.all())
+            timings[label] = self.timeit(func)
+            self.stdout.write(f'{label:<36} {timings[label] * 1000:10.2f} ms')
+            if self.explain:
+                self.stdout.write(self.style.HTTP_INFO(queryset.explain()))
+        return timings
+
+    def drop_indexes(self):
+        # schema_editor روی SQLite داخل تراکنش قابل استفاده نیست؛ فقط قالب SQL آن استفاده می‌شود
+        editor = connection.schema_editor()
+        table = editor.quote_name(DetectionHistory._meta.db_table)
+        with connection.cursor() as cursor:
+            for index in DetectionHistory._meta.indexes:
+                cursor.execute(editor.sql_delete_index % {'table': table, 'name': editor.quote_name(index.name)})
+
+    def timeit(self, func):
+        best = float('inf')
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
@@ -0,0 +1,59 @@
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detection import model_versions
+from detection.model_store import ModelFormatError, convert_pickles, load_artifact
+
+
+class Command(BaseCommand):
+    help = (
+        'تبدیل فایل‌های pickle مدل به قالب memory-mapped بدون pickle؛ '
+        'خروجی به عنوان یک نسخه جدید ذخیره و فعال می‌شود'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-path', default=os.path.join(settings.BASE_DIR, 'detection', 'models'),
+                            help='پوشه حاوی language_model.pkl و vectorizer.pkl')
+        parser.add_argument('--name', metavar='VERSION', help='نام نسخه جدید (پیش‌فرض: بر اساس زمان)')
+        parser.add_argument('--no-activate', action='store_true',
+                            help='نسخه جدید ذخیره شود ولی اشاره‌گر ACTIVE تغییر نکند')
+        parser.add_argument('--output', help='نوشتن در یک مسیر دلخواه به جای پوشه نسخه‌ها (بدون فعال‌سازی)')
+
+    def handle(self, *args, **options):
+        model_path = options['model_path']
+
+        for name in ('language_model.pkl', 'vectorizer.pkl'):
+            if not os.path.exists(os.path.join(model_path, name)):
+                raise CommandError(f'فایل {name} در {model_path} یافت نشد')
+
+        version = None
+        try:
+            if options['output']:
+                output = options['output']
+            else:
+                version = options['name'] or model_versions.new_version(model_path)
+                if os.path.exists(model_versions.version_dir(model_path, version)):
+                    raise CommandError(f'نسخه {version} از قبل وجود دارد')
+                os.makedirs(model_versions.version_dir(model_path, version))
+                output = model_versions.artifact_path(model_path, version)
+            header = convert_pickles(model_path, output)
+            # بررسی فایل نوشته شده پیش از فعال‌سازی
+            load_artifact(output, verify=True)
+            if version is not None and not options['no_activate']:
+                model_versions.set_active_version(model_path, version)
+        except (ModelFormatError, model_versions.ModelVersionError) as e:
+            if version is not None and model_versions.get_active_version(model_path) != version:
+                # پوشه نسخه ناقص باقی نمی‌ماند
+                shutil.rmtree(model_versions.version_dir(model_path, version), ignore_errors=True)
+            raise CommandError(str(e))
+
+        status = ''
+        if version is not None:
+            status = f" (نسخه {version}{'' if options['no_activate'] else '، فعال'})"
+        self.stdout.write(self.style.SUCCESS(
+            f"{output}{status}: {len(header['classes'])} زبان، بردارساز {header['vectorizer']['type']}، "
+            f"{os.path.getsize(output) / 1024:.1f} KiB"
+        ))
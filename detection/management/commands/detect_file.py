@@ -0,0 +1,219 @@
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from detection.language_detector import LanguageDetector
+from detection.streaming import parse_line
+
+
+# نمونه تشخیص‌دهنده هر پروسس worker (یک بار در initializer بارگذاری می‌شود)
+_worker_detector = None
+
+
+def _init_worker():
+    global _worker_detector
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        # روش spawn: پروسس جدید باید جنگو را دوباره راه‌اندازی کند
+        django.setup()
+    detector = LanguageDetector()
+    # پیام‌های بارگذاری نباید با خروجی JSONL روی stdout مخلوط شوند
+    with contextlib.redirect_stdout(sys.stderr):
+        loaded = detector.load_model()
+    if not loaded:
+        raise RuntimeError('مدل آموزش داده نشده است.')
+    _worker_detector = detector
+
+
+def _parse_record(fmt, payload, field, id_field):
+    """تبدیل رکورد خام به (شناسه، متن)؛ برای رکورد نامعتبر ValueError"""
+    if fmt == 'jsonl':
+        text, record_id = parse_line(payload, field, id_field)
+        return record_id, text
+    if fmt == 'csv':
+        return payload
+    return None, payload
+
+
+def _detect_chunk(chunk, fmt, field, id_field, top_k):
+    """
+    تجزیه، تشخیص زبان و تبدیل به JSONL یک قطعه از ورودی در worker
+
+    chunk فهرست (شماره رکورد، رکورد خام) است؛ تجزیه و ساخت خروجی در worker انجام
+    می‌شود تا پروسس اصلی فقط خواندن و نوشتن فایل را انجام دهد.
+    خروجی: (متن JSONL، تعداد رکورد، pid، زمان پردازش)
+    """
+    start = time.perf_counter()
+    parsed = []
+    for number, payload in chunk:
+        try:
+            record_id, text = _parse_record(fmt, payload, field, id_field)
+            parsed.append((number, record_id, text, None))
+        except ValueError as e:
+            parsed.append((number, None, None, str(e)))
+
+    texts = [text for _, _, text, error in parsed if error is None]
+    results = iter(_worker_detector.predict_batch(texts, top_k=top_k) if texts else [])
+
+    lines = []
+    for number, record_id, text, error in parsed:
+        output = {'record': number}
+        if record_id is not None:
+            output['id'] = record_id
+        if error is not None:
+            output['error'] = error
+        else:
+            result = next(results)
+            output.update({
+                'language_code': result['predicted_language'],
+                'confidence': result['confidence'],
+                'all_probabilities': result['all_probabilities'],
+                'text_length': result['text_length'],
+            })
+        lines.append(json.dumps(output, ensure_ascii=False) + '\n')
+    return ''.join(lines), len(lines), os.getpid(), time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        'تشخیص زبان دسته‌ای یک فایل (txt، csv یا jsonl) با چند پروسس و نوشتن نتایج به '
+        'صورت JSONL به ترتیب ورودی'
+    )
+
+    FORMATS = ['auto', 'txt', 'csv', 'jsonl']
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='فایل ورودی')
+        parser.add_argument('-o', '--output', required=True,
+                            help='فایل خروجی JSONL (- برای stdout)')
+        parser.add_argument('--format', choices=self.FORMATS, default='auto',
+                            help='قالب ورودی (پیش‌فرض: بر اساس پسوند فایل)')
+        parser.add_argument('--field', default='text',
+                            help='نام ستون CSV یا کلید JSONL حاوی متن')
+        parser.add_argument('--id-field', default='id',
+                            help='نام ستون CSV یا کلید JSONL شناسه (در خروجی تکرار می‌شود)')
+        parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                            help='تعداد پروسس‌ها (1: اجرا در همین پروسس)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='تعداد رکورد در هر قطعه ارسالی به worker')
+        parser.add_argument('--top-k', type=int,
+                            help='تعداد زبان‌های محتمل در خروجی')
+
+    def handle(self, *args, **options):
+        path = options['input']
+        if not os.path.exists(path):
+            raise CommandError(f'فایل {path} یافت نشد')
+        fmt = options['format']
+        if fmt == 'auto':
+            fmt = self.detect_format(path)
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size و --workers باید مثبت باشند')
+        if options['top_k'] is not None and options['top_k'] < 1:
+            raise CommandError('--top-k باید عدد صحیح مثبت باشد')
+
+        records = self.read_records(path, fmt, options['field'], options['id_field'])
+        chunks = self.chunked(records, options['chunk_size'])
+        task_args = (fmt, options['field'], options['id_field'], options['top_k'])
+
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8')
+        start = time.perf_counter()
+        try:
+            workers = self.run(chunks, task_args, output, options['workers'])
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - start
+
+        self.report(workers, elapsed)
+
+    def detect_format(self, path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.csv':
+            return 'csv'
+        if extension in ('.jsonl', '.ndjson'):
+            return 'jsonl'
+        return 'txt'
+
+    def read_records(self, path, fmt, field, id_field):
+        """
+        خواندن جریانی ورودی؛ خروجی: (شماره رکورد، رکورد خام)
+
+        رکورد خام برای jsonl و txt متن خط و برای csv تاپل (شناسه، متن) است.
+        """
+        with open(path, encoding='utf-8', newline='' if fmt == 'csv' else None) as f:
+            if fmt == 'csv':
+                reader = csv.DictReader(f)
+                if field not in (reader.fieldnames or []):
+                    raise CommandError(f'ستون "{field}" در فایل CSV وجود ندارد')
+                for number, row in enumerate(reader, 1):
+                    yield number, (row.get(id_field), row[field] or '')
+            else:
+                number = 0
+                for line in f:
+                    if not line.strip():
+                        continue
+                    number += 1
+                    yield number, line if fmt == 'jsonl' else line.rstrip('\n')
+
+    def chunked(self, records, size):
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, chunks, task_args, output, n_workers):
+        """پردازش قطعه‌ها و نوشتن نتایج به ترتیب ورودی؛ خروجی: آمار هر worker"""
+        workers = {}
+
+        def write(result):
+            text, count, pid, seconds = result
+            stats = workers.setdefault(pid, {'records': 0, 'chunks': 0, 'seconds': 0.0})
+            stats['records'] += count
+            stats['chunks'] += 1
+            stats['seconds'] += seconds
+            output.write(text)
+
+        if n_workers == 1:
+            _init_worker()
+            for chunk in chunks:
+                write(_detect_chunk(chunk, *task_args))
+            return workers
+
+        # اتصال‌های پایگاه‌داده نباید بین پروسس‌های fork شده مشترک باشند
+        connections.close_all()
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+        with context.Pool(n_workers, initializer=_init_worker) as pool:
+            # تعداد قطعه‌های در جریان محدود است تا کل فایل در حافظه خوانده نشود
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(pool.apply_async(_detect_chunk, (chunk, *task_args)))
+                if len(in_flight) >= n_workers * 2:
+                    write(in_flight.popleft().get())
+            while in_flight:
+                write(in_flight.popleft().get())
+        return workers
+
+    def report(self, workers, elapsed):
+        total = sum(stats['records'] for stats in workers.values())
+        self.stderr.write(self.style.SUCCESS(
+            f'{total} رکورد در {elapsed:.2f} ثانیه ({total / elapsed if elapsed else 0:.0f} docs/sec)'
+        ))
+        for pid, stats in sorted(workers.items()):
+            rate = stats['records'] / stats['seconds'] if stats['seconds'] else 0
+            self.stderr.write(
+                f"  worker {pid}: {stats['records']} رکورد، {stats['chunks']} قطعه، "
+                f"{stats['seconds']:.2f} ثانیه پردازش ({rate:.0f} docs/sec)"
+            )
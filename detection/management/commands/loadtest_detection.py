@@ -0,0 +1,170 @@
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# مسیر تشخیص برای هر نوع سرور: view همگام برای WSGI و view async برای ASGI
+PATHS = {
+    'wsgi': '/detection/api/detect/',
+    'asgi': '/detection/api/detect/async/',
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def _request(host, port, path, body, slow):
+    """یک درخواست HTTP/1.1؛ کلاینت کند سرآیندها را می‌فرستد و پس از slow ثانیه بدنه را"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write((
+            f'POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n'
+        ).encode('ascii'))
+        await writer.drain()
+        if slow:
+            await asyncio.sleep(slow)
+        writer.write(body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def _run_load(url, total, concurrency, slow, body, timeout):
+    parts = urlsplit(url)
+    host, port, path = parts.hostname, parts.port or 80, parts.path or '/'
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = Counter()
+
+    async def worker():
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(_request(host, port, path, body, slow), timeout)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError) as e:
+                statuses[type(e).__name__] += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(total)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+class Command(BaseCommand):
+    help = (
+        'آزمون بار endpoint تشخیص زبان با اتصال‌های همزمان (و کلاینت‌های کند) و مقایسه '
+        'سرور WSGI با ASGI'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='آدرس کامل endpoint (در صورت اجرای سرور به صورت جداگانه)')
+        parser.add_argument('--serve', choices=['wsgi', 'asgi', 'compare'],
+                            help='اجرای سرور محلی: wsgi (gunicorn یا runserver)، asgi (uvicorn) یا هر دو')
+        parser.add_argument('-n', '--requests', type=int, default=2000, help='تعداد کل درخواست‌ها')
+        parser.add_argument('-c', '--concurrency', type=int, default=200, help='تعداد اتصال‌های همزمان')
+        parser.add_argument('--slow-ms', type=int, default=0,
+                            help='تأخیر کلاینت بین ارسال سرآیند و بدنه (شبیه‌سازی کلاینت کند)')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='تعداد thread سرور WSGI (gunicorn)')
+        parser.add_argument('--timeout', type=float, default=30.0, help='مهلت هر درخواست (ثانیه)')
+        parser.add_argument('--text', default='Hello, how are you doing today?')
+
+    def handle(self, *args, **options):
+        if not options['url'] and not options['serve']:
+            raise CommandError('یکی از --url یا --serve لازم است')
+        body = json.dumps({'text': options['text']}).encode('utf-8')
+
+        if options['url']:
+            self.report(options['url'], self.load(options['url'], body, options))
+            return
+
+        kinds = ['wsgi', 'asgi'] if options['serve'] == 'compare' else [options['serve']]
+        results = {}
+        for kind in kinds:
+            port = _free_port()
+            server = self.start_server(kind, port, options['threads'])
+            try:
+                url = f'http://127.0.0.1:{port}{PATHS[kind]}'
+                self.wait_until_ready(url, server)
+                # یک دور گرم کردن تا بارگذاری مدل در نتیجه اثر نگذارد
+                asyncio.run(_run_load(url, 20, 4, 0, body, options['timeout']))
+                results[kind] = self.load(url, body, options)
+                self.report(f'{kind}: {url}', results[kind])
+            finally:
+                server.terminate()
+                server.wait(10)
+
+        if len(results) == 2:
+            wsgi_rps = options['requests'] / results['wsgi'][0]
+            asgi_rps = options['requests'] / results['asgi'][0]
+            self.stdout.write(self.style.SUCCESS(f'ASGI/WSGI throughput: {asgi_rps / wsgi_rps:.2f}x'))
+
+    def load(self, url, body, options):
+        return asyncio.run(_run_load(
+            url, options['requests'], options['concurrency'], options['slow_ms'] / 1000, body, options['timeout']
+        ))
+
+    def start_server(self, kind, port, threads):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'language_detection.settings'))
+        if kind == 'asgi':
+            if importlib.util.find_spec('uvicorn') is None:
+                raise CommandError('برای سرور ASGI بسته uvicorn لازم است (pip install uvicorn)')
+            command = [sys.executable, '-m', 'uvicorn', 'language_detection.asgi:application',
+                       '--host', '127.0.0.1', '--port', str(port), '--workers', '1',
+                       '--log-level', 'warning', '--no-access-log', '--backlog', '4096']
+        elif importlib.util.find_spec('gunicorn') is not None:
+            command = [sys.executable, '-m', 'gunicorn', 'language_detection.wsgi:application',
+                       '--bind', f'127.0.0.1:{port}', '--workers', '1', '--threads', str(threads),
+                       '--log-level', 'warning', '--backlog', '4096']
+        else:
+            self.stderr.write('gunicorn نصب نیست؛ از runserver (یک thread برای هر اتصال) استفاده می‌شود')
+            command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def wait_until_ready(self, url, server, timeout=30):
+        parts = urlsplit(url)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('اجرای سرور با خطا متوقف شد')
+            try:
+                with socket.create_connection((parts.hostname, parts.port), 1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError('سرور در زمان مقرر آماده نشد')
+
+    def report(self, label, result):
+        elapsed, latencies, statuses = result
+        count = sum(statuses.values())
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(f'  {count} درخواست در {elapsed:.2f} ثانیه ({count / elapsed:.0f} req/s)')
+        self.stdout.write(f"  وضعیت‌ها: {', '.join(f'{key}: {value}' for key, value in sorted(statuses.items(), key=str))}")
+        if latencies:
+            latencies.sort()
+            quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            self.stdout.write(
+                f'  تأخیر: p50 {quantiles[49] * 1000:.1f} ms، p95 {quantiles[94] * 1000:.1f} ms، '
+                f'p99 {quantiles[98] * 1000:.1f} ms، max {latencies[-1] * 1000:.1f} ms'
+            )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.language_detector import LanguageDetector, logged_versions
+from detection.model_versions import ModelVersionError, get_active_version, list_versions, prune_versions
+from detection.models import ModelTrainingLog
+from detection.training_jobs import activate_version
+
+
+class Command(BaseCommand):
+    help = 'نمایش نسخه‌های ذخیره شده مدل، فعال‌سازی یک نسخه (rollback) یا حذف نسخه‌های قدیمی'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--activate', metavar='VERSION', help='فعال‌سازی نسخه مشخص شده')
+        parser.add_argument('--prune', type=int, metavar='KEEP',
+                            help='حذف نسخه‌های قدیمی به جز KEEP نسخه آخر (نسخه فعال و نسخه‌های دارای لاگ آموزش حذف نمی‌شوند)')
+
+    def handle(self, *args, **options):
+        model_path = LanguageDetector().model_path
+
+        if options['activate']:
+            try:
+                detector = activate_version(options['activate'])
+            except ModelVersionError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f"نسخه {options['activate']} ({detector.model_version}) فعال شد"
+            ))
+            return
+
+        if options['prune'] is not None:
+            if options['prune'] < 1:
+                raise CommandError('--prune باید مثبت باشد')
+            removed = prune_versions(model_path, options['prune'], protected=logged_versions())
+            self.stdout.write(f"{len(removed)} نسخه حذف شد{': ' + ', '.join(removed) if removed else ''}")
+            return
+
+        active = get_active_version(model_path)
+        versions = list_versions(model_path)
+        logs = {log.version: log for log in ModelTrainingLog.objects.filter(version__in=versions)}
+        for version in reversed(versions):
+            log = logs.get(version)
+            details = f'دقت {log.accuracy:.2%}، {log.training_samples} نمونه' if log else 'بدون لاگ آموزش'
+            marker = '*' if version == active else ' '
+            self.stdout.write(f'{marker} {version}  {details}')
+        if active is None:
+            self.stdout.write('هیچ نسخه‌ای فعال نیست (قالب قدیمی بدون پوشه versions)')
@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from detection import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'بازسازی آمار تجمیعی (rollup) از روی تاریخچه تشخیص‌ها و استفاده‌های API و حذف rollupهای ساعتی قدیمی؛ '
+        'برای اجرای دوره‌ای (مثلاً cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1,
+                            help='بازسازی روزهای اخیر (پیش‌فرض: امروز و دیروز)')
+        parser.add_argument('--all', action='store_true',
+                            help='بازسازی کامل از ابتدای تاریخچه')
+        parser.add_argument('--retention-days', type=int,
+                            help='دوره نگهداری rollupهای ساعتی (پیش‌فرض: DETECTION_ROLLUP_HOURLY_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days نمی‌تواند منفی باشد')
+
+        since = None if options['all'] else timezone.now() - timedelta(days=options['days'])
+        start = time.perf_counter()
+        processed = rollups.rebuild(since=since)
+        usage_processed = rollups.rebuild_usage(since=since)
+        pruned = rollups.prune_hourly(options['retention_days'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{processed} رکورد تاریخچه و {usage_processed} رکورد استفاده از API '
+            f'در {time.perf_counter() - start:.2f} ثانیه تجمیع شد؛ '
+            f'{pruned} rollup ساعتی قدیمی حذف شد'
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from detection.training_jobs import run_pending, worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        'اجرای کارهای آموزش مدل ثبت شده در صف (TrainingJob) در یک پروسس جداگانه؛ '
+        'برای DETECTION_TRAINING_WORKER = "external"'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='اجرای کارهای فعلی صف و خروج')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='فاصله بررسی صف در زمان بیکاری (ثانیه)')
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        self.stdout.write(f'worker آموزش {worker} شروع شد')
+        while True:
+            count = run_pending(worker)
+            if count:
+                self.stdout.write(self.style.SUCCESS(f'{count} کار آموزش اجرا شد'))
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,57 @@
+import contextlib
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.corpus import Corpus, CorpusError
+from detection.language_detector import LanguageDetector
+from detection.registry import registry
+from detection.training_jobs import record_training
+
+
+class Command(BaseCommand):
+    help = (
+        'آموزش کامل مدل از یک corpus روی دیسک (یک فایل txt/jsonl یا پوشه shardها برای هر زبان)؛ '
+        'با بردارساز hashing آموزش جریانی و مستقل از اندازه corpus است'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help='پوشه corpus (پیش‌فرض: DETECTION_CORPUS_PATH)')
+        parser.add_argument('--backend', choices=LanguageDetector.FEATURE_BACKENDS,
+                            help='نوع ویژگی‌ها (پیش‌فرض: DETECTION_FEATURE_BACKEND)')
+        parser.add_argument('--chunk-size', type=int,
+                            help='تعداد نمونه در هر قطعه آموزش جریانی (پیش‌فرض: DETECTION_TRAINING_CHUNK_SIZE)')
+        parser.add_argument('--test-size', type=float, default=0.2,
+                            help='سهم نمونه‌های کنار گذاشته شده برای ارزیابی')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] is not None and options['chunk_size'] < 1:
+            raise CommandError('--chunk-size باید مثبت باشد')
+        if not 0 < options['test_size'] < 1:
+            raise CommandError('--test-size باید بین 0 و 1 باشد')
+        try:
+            corpus = Corpus(options['corpus'])
+        except CorpusError as e:
+            raise CommandError(str(e))
+        self.stderr.write(f"corpus {corpus.path}: {len(corpus.languages)} زبان ({', '.join(corpus.languages)})")
+
+        detector = LanguageDetector(feature_backend=options['backend'])
+        start = time.perf_counter()
+        # گزارش آموزش روی stderr تا خروجی خلاصه جدا بماند
+        with contextlib.redirect_stdout(sys.stderr):
+            accuracy = detector.train_model(test_size=options['test_size'], corpus_path=corpus.path,
+                                            chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - start
+        try:
+            record_training(detector, accuracy, elapsed)
+        except Exception as e:
+            raise CommandError(str(e))
+        registry.swap(detector)
+
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'دقت {accuracy:.2%} با {detector.training_samples} نمونه آموزشی ({detector.feature_backend}) در '
+            f'{elapsed:.1f} ثانیه؛ نسخه {detector.artifact_version} ({detector.model_version})، حداکثر حافظه {max_rss:.0f} MiB'
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.incremental import WATERMARK_KEY, pending_feedback, update_from_feedback
+from detection.registry import get_detector
+
+
+class Command(BaseCommand):
+    help = (
+        'به‌روزرسانی افزایشی مدل با بازخوردهای جدید کاربران (تشخیص نادرست و زبان صحیح) بدون '
+        'آموزش کامل؛ برای اجرای دوره‌ای (مثلاً cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-samples', type=int, default=1,
+                            help='حداقل تعداد بازخورد جدید برای انجام به‌روزرسانی')
+        parser.add_argument('--limit', type=int,
+                            help='حداکثر تعداد بازخورد اعمال شده در این اجرا')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='فقط نمایش تعداد بازخوردهای اعمال نشده')
+
+    def handle(self, *args, **options):
+        if options['min_samples'] < 1 or (options['limit'] is not None and options['limit'] < 1):
+            raise CommandError('--min-samples و --limit باید مثبت باشند')
+
+        detector = get_detector()
+        if detector.model is None:
+            raise CommandError('مدل آموزش داده نشده است. ابتدا مدل را آموزش دهید.')
+        if not detector.model.supports_partial_fit:
+            raise CommandError('فایل مدل فعلی شمارش‌های آموزش را ندارد؛ یک بار مدل را کامل آموزش دهید.')
+
+        watermark = detector.metadata.get(WATERMARK_KEY, 0)
+        if options['dry_run']:
+            count = pending_feedback(watermark).count()
+            self.stdout.write(f'{count} بازخورد اعمال نشده (پس از بازخورد شماره {watermark})')
+            return
+
+        try:
+            result = update_from_feedback(detector, options['min_samples'], options['limit'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if result is None:
+            self.stdout.write(f"کمتر از {options['min_samples']} بازخورد جدید؛ مدل تغییر نکرد")
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['samples']} بازخورد در {result['update_time'] * 1000:.1f} ms اعمال شد "
+            f"(تا شماره {result['watermark']})؛ نسخه مدل {result['previous_version']} ← {result['version']}"
+        ))
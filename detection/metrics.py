@@ -0,0 +1,359 @@
+"""
+اندازه‌گیری تأخیر مراحل پردازش تشخیص و خروجی Prometheus
+
+زمان هر مرحله (parse، preprocess، vectorize، score، db_lookup، db_write، serialize و ...)
+با time.perf_counter_ns اندازه‌گیری و در هیستوگرام‌های درون پروسس برای هر endpoint
+جمع می‌شود. هیستوگرام‌ها log-linear (مانند HDR Histogram) هستند: هر توان دو به
+SUB_BUCKETS بازه مساوی تقسیم می‌شود، بنابراین خطای نسبی صدک‌ها حداکثر 1/SUB_BUCKETS
+است و حافظه هر هیستوگرام فقط به تعداد بازه‌های استفاده شده بستگی دارد.
+
+endpoint با MetricsMiddleware از نام view درخواست تعیین می‌شود (contextvar) و
+مراحلی که خارج از درخواست اجرا می‌شوند (دسته‌های micro-batching و نوشتن
+write-behind تاریخچه) endpoint جداگانه دارند. مقادیر برای هر پروسس جداگانه‌اند؛
+Prometheus باید هر worker را جداگانه scrape کند یا از یک worker استفاده شود.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    # IPهای مجاز برای دریافت /metrics؛ خالی یعنی بدون محدودیت
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'QUANTILES': (0.5, 0.9, 0.99, 0.999),
+}
+
+# تعداد بازه‌های هر توان دو (2 ** SUB_BUCKET_BITS)
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+_endpoint = contextvars.ContextVar('detection_metrics_endpoint', default='other')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DETECTION_METRICS', {}))
+    return config
+
+
+def _bucket_index(value):
+    shift = max(0, value.bit_length() - SUB_BUCKET_BITS - 1)
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def _bucket_upper(index):
+    """بزرگ‌ترین مقدار بازه index"""
+    shift = max(0, (index >> SUB_BUCKET_BITS) - 1)
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """هیستوگرام log-linear مقادیر صحیح نامنفی (نانوثانیه)"""
+
+    __slots__ = ('_lock', '_counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        # همان _bucket_index به صورت درون‌خطی؛ این تابع در مسیر هر درخواست چند بار اجرا می‌شود
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        index = (shift << SUB_BUCKET_BITS) + (value >> shift) if shift > 0 else value
+        with self._lock:
+            counts = self._counts
+            counts[index] = counts.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts), self.count, self.total, self.max
+
+    def quantiles(self, quantiles):
+        """صدک‌ها (مرز بالای بازه، حداکثر برابر max)؛ برای هیستوگرام خالی NaN"""
+        counts, count, _, maximum = self.snapshot()
+        if not count:
+            return {q: math.nan for q in quantiles}
+        result = {}
+        ordered = sorted(counts.items())
+        for q in quantiles:
+            rank = max(1, math.ceil(q * count))
+            seen = 0
+            for index, bucket_count in ordered:
+                seen += bucket_count
+                if seen >= rank:
+                    result[q] = min(_bucket_upper(index), maximum)
+                    break
+        return result
+
+
+class MetricsRegistry:
+    """هیستوگرام‌های تأخیر مراحل و درخواست‌ها و شمارنده درخواست‌ها برای هر endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._requests = {}
+        self._responses = {}
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(key, Histogram())
+        return histogram
+
+    def record_stage(self, stage, duration_ns, endpoint=None):
+        key = (endpoint or _endpoint.get(), stage)
+        histogram = self._stages.get(key)
+        if histogram is None:
+            histogram = self._histogram(self._stages, key)
+        histogram.record(duration_ns)
+
+    def record_request(self, endpoint, status, duration_ns):
+        self._histogram(self._requests, endpoint).record(duration_ns)
+        key = (endpoint, str(status))
+        with self._lock:
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def stage_histograms(self):
+        return sorted(self._stages.items())
+
+    def request_histograms(self):
+        return sorted(self._requests.items())
+
+    def responses(self):
+        with self._lock:
+            return sorted(self._responses.items())
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+            self._requests = {}
+            self._responses = {}
+
+
+metrics = MetricsRegistry()
+
+
+def current_endpoint():
+    return _endpoint.get()
+
+
+@contextmanager
+def endpoint(name):
+    """تعیین endpoint برای مراحلی که خارج از درخواست HTTP اجرا می‌شوند"""
+    token = _endpoint.set(name)
+    try:
+        yield
+    finally:
+        _endpoint.reset(token)
+
+
+def bind_endpoint(iterable):
+    """
+    اجرای هر گام iterable با endpoint فعلی
+
+    بدنه پاسخ‌های جریانی پس از پایان middleware (و بازگشت endpoint) تولید می‌شود.
+    """
+    return _iter_with_endpoint(iter(iterable), current_endpoint())
+
+
+def _iter_with_endpoint(iterator, name):
+    while True:
+        with endpoint(name):
+            item = next(iterator, _END)
+        if item is _END:
+            return
+        yield item
+
+
+_END = object()
+
+
+class stage:
+    """
+    اندازه‌گیری زمان یک مرحله پردازش (context manager)
+
+    کلاس به جای contextlib.contextmanager تا سربار هر مرحله در مسیر درخواست کم بماند.
+    """
+
+    __slots__ = ('name', 'endpoint', 'start')
+
+    def __init__(self, name, endpoint=None):
+        self.name = name
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        metrics.record_stage(self.name, time.perf_counter_ns() - self.start, self.endpoint)
+        return False
+
+
+def _endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+class MetricsMiddleware:
+    """
+    اندازه‌گیری زمان کل هر درخواست و تعیین endpoint برای مراحل داخل view
+
+    برای viewهای همگام و async قابل استفاده است.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_config()['ENABLED']
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        # thread سرور WSGI بین درخواست‌ها مشترک است؛ endpoint پس از درخواست بازگردانده می‌شود
+        token = _endpoint.set('other')
+        start = time.perf_counter_ns()
+        try:
+            response = self.get_response(request)
+            self._record(request, response, start)
+        finally:
+            _endpoint.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        token = _endpoint.set('other')
+        start = time.perf_counter_ns()
+        try:
+            response = await self.get_response(request)
+            self._record(request, response, start)
+        finally:
+            _endpoint.reset(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.enabled:
+            # پس از resolve شدن URL؛ مراحل داخل view با نام همین endpoint ثبت می‌شوند
+            _endpoint.set(_endpoint_name(request))
+        return None
+
+    def _record(self, request, response, start):
+        # پاسخ‌های جریانی فقط تا ارسال سرآیندها اندازه‌گیری می‌شوند
+        metrics.record_request(_endpoint_name(request), response.status_code, time.perf_counter_ns() - start)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_summary(lines, name, labels, histogram, quantiles):
+    values = histogram.quantiles(quantiles)
+    _, count, total, _ = histogram.snapshot()
+    for q in quantiles:
+        lines.append(f'{name}{_labels(**labels, quantile=q)} {values[q] / 1e9:.9g}')
+    lines.append(f'{name}_sum{_labels(**labels)} {total / 1e9:.9g}')
+    lines.append(f'{name}_count{_labels(**labels)} {count}')
+
+
+def _runtime_gauges():
+    """وضعیت صف‌ها و cache همین پروسس"""
+    from .batching import micro_batcher
+    from .history_writer import writer
+    from .result_cache import result_cache
+    from .usage import usage_writer
+
+    batching = micro_batcher.stats()
+    history = writer.stats()
+    cache = result_cache.stats()
+    usage = usage_writer.stats()
+    return [
+        ('detection_micro_batch_queue_depth', 'gauge', 'درخواست‌های منتظر micro-batching', batching['queue_depth']),
+        ('detection_micro_batches_total', 'counter', 'دسته‌های پردازش شده micro-batching', batching['batches']),
+        ('detection_micro_batch_items_total', 'counter', 'درخواست‌های پردازش شده micro-batching', batching['items']),
+        ('detection_micro_batch_direct_total', 'counter', 'درخواست‌های تکی پاسخ داده شده بدون صف', batching['direct']),
+        ('detection_micro_batch_rejected_total', 'counter', 'درخواست‌های رد شده به علت پر بودن صف', batching['rejected']),
+        ('detection_micro_batch_timeouts_total', 'counter', 'درخواست‌هایی که پس از timeout مستقیماً تشخیص داده شدند', batching['timeouts']),
+        ('detection_history_pending', 'gauge', 'رکوردهای تاریخچه منتظر نوشتن', history['pending']),
+        ('detection_history_written_total', 'counter', 'رکوردهای تاریخچه نوشته شده', history['written']),
+        ('detection_history_dropped_total', 'counter', 'رکوردهای تاریخچه حذف شده', history['dropped']),
+        ('detection_result_cache_hits_total', 'counter', 'hitهای cache نتایج', cache['hits']),
+        ('detection_result_cache_misses_total', 'counter', 'missهای cache نتایج', cache['misses']),
+        ('detection_api_usage_pending', 'gauge', 'رکوردهای APIUsage منتظر نوشتن', usage['pending']),
+        ('detection_api_usage_dropped_total', 'counter', 'رکوردهای APIUsage حذف شده', usage['dropped']),
+    ]
+
+
+def render_prometheus(registry=None):
+    """خروجی متنی (text exposition format 0.0.4) همه معیارها"""
+    registry = registry or metrics
+    quantiles = tuple(get_config()['QUANTILES'])
+    lines = [
+        '# HELP detection_request_duration_seconds تأخیر کل درخواست برای هر endpoint',
+        '# TYPE detection_request_duration_seconds summary',
+    ]
+    for endpoint_name, histogram in registry.request_histograms():
+        _format_summary(lines, 'detection_request_duration_seconds', {'endpoint': endpoint_name}, histogram, quantiles)
+
+    lines += [
+        '# HELP detection_requests_total تعداد پاسخ‌ها برای هر endpoint و کد وضعیت',
+        '# TYPE detection_requests_total counter',
+    ]
+    for (endpoint_name, status), count in registry.responses():
+        lines.append(f'detection_requests_total{_labels(endpoint=endpoint_name, status=status)} {count}')
+
+    lines += [
+        '# HELP detection_stage_duration_seconds تأخیر مراحل پردازش تشخیص برای هر endpoint',
+        '# TYPE detection_stage_duration_seconds summary',
+    ]
+    for (endpoint_name, stage_name), histogram in registry.stage_histograms():
+        _format_summary(
+            lines, 'detection_stage_duration_seconds', {'endpoint': endpoint_name, 'stage': stage_name},
+            histogram, quantiles,
+        )
+
+    for name, kind, help_text, value in _runtime_gauges():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    endpoint /metrics برای Prometheus
+
+    فقط برای IPهای ALLOWED_IPS (پیش‌فرض: خود سرور) در دسترس است؛ با فهرست خالی
+    endpoint وجود ندارد (404).
+    """
+    config = get_config()
+    allowed = config['ALLOWED_IPS']
+    if not config['ENABLED'] or not allowed:
+        return HttpResponse(status=404)
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
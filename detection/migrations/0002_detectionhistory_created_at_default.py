@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detectionhistory',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='تاریخ تشخیص'),
+        ),
+    ]
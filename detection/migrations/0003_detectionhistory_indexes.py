@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0002_detectionhistory_created_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detectionhistory',
+            index=models.Index(fields=['user', '-created_at'], name='dethist_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detectionhistory',
+            index=models.Index(fields=['created_at'], name='dethist_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detectionhistory',
+            index=models.Index(fields=['detected_language', 'created_at'], name='dethist_lang_created_idx'),
+        ),
+    ]
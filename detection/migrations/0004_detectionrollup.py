@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0003_detectionhistory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'ساعتی'), ('day', 'روزانه')], max_length=4, verbose_name='بازه')),
+                ('bucket_start', models.DateTimeField(verbose_name='شروع بازه')),
+                ('count', models.BigIntegerField(default=0, verbose_name='تعداد تشخیص')),
+                ('confidence_sum', models.FloatField(default=0, verbose_name='مجموع اطمینان')),
+                ('processing_time_sum', models.FloatField(default=0, verbose_name='مجموع زمان پردازش')),
+                ('processing_time_count', models.BigIntegerField(default=0, verbose_name='تعداد زمان\u200cهای پردازش')),
+                ('users_sketch', models.BinaryField(default=bytes, verbose_name='sketch کاربران')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین به\u200cروزرسانی')),
+                ('language', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='detection.language', verbose_name='زبان')),
+            ],
+            options={
+                'verbose_name': 'آمار تجمیعی تشخیص',
+                'verbose_name_plural': 'آمار تجمیعی تشخیص\u200cها',
+                'ordering': ['-bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket_start', 'language'), name='detrollup_bucket_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0004_detectionrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'در صف'), ('running', 'در حال اجرا'), ('succeeded', 'موفق'), ('failed', 'ناموفق')], default='queued', max_length=10, verbose_name='وضعیت')),
+                ('progress', models.FloatField(default=0.0, verbose_name='پیشرفت')),
+                ('stage', models.CharField(blank=True, max_length=200, verbose_name='مرحله')),
+                ('parameters', models.JSONField(default=dict, verbose_name='پارامترهای آموزش')),
+                ('error', models.TextField(blank=True, verbose_name='خطا')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='worker')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان ثبت')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان شروع')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان پایان')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='درخواست دهنده')),
+                ('training_log', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='detection.modeltraininglog', verbose_name='لاگ آموزش')),
+            ],
+            options={
+                'verbose_name': 'کار آموزش مدل',
+                'verbose_name_plural': 'کارهای آموزش مدل',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='trainjob_status_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0005_trainingjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apiusage',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='زمان درخواست'),
+        ),
+        migrations.AddIndex(
+            model_name='apiusage',
+            index=models.Index(fields=['created_at', 'endpoint'], name='apiusage_created_endpoint_idx'),
+        ),
+    ]
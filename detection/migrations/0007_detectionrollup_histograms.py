@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0006_apiusage_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detectionrollup',
+            name='confidence_histogram',
+            field=models.BinaryField(default=bytes, verbose_name='هیستوگرام اطمینان'),
+        ),
+        migrations.AddField(
+            model_name='detectionrollup',
+            name='processing_time_histogram',
+            field=models.BinaryField(default=bytes, verbose_name='هیستوگرام زمان پردازش'),
+        ),
+        migrations.AddField(
+            model_name='detectionrollup',
+            name='text_length_histogram',
+            field=models.BinaryField(default=bytes, verbose_name='هیستوگرام طول متن'),
+        ),
+    ]
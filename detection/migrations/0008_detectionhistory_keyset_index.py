@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0007_detectionrollup_histograms'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='detectionhistory',
+            name='dethist_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='detectionhistory',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='dethist_user_created_id_idx'),
+        ),
+    ]
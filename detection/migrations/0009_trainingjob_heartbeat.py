@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0008_detectionhistory_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد تلاش\u200cها'),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='آخرین heartbeat'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0009_trainingjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(verbose_name='شروع ساعت')),
+                ('endpoint', models.CharField(max_length=100, verbose_name='نقطه پایانی')),
+                ('count', models.BigIntegerField(default=0, verbose_name='تعداد نمونه\u200cها')),
+                ('error_count', models.BigIntegerField(default=0, verbose_name='تعداد خطاهای 5xx')),
+                ('response_time_sum', models.FloatField(default=0, verbose_name='مجموع زمان پاسخ (میلی\u200cثانیه)')),
+                ('response_time_max', models.FloatField(default=0, verbose_name='بیشینه زمان پاسخ (میلی\u200cثانیه)')),
+                ('response_time_histogram', models.BinaryField(default=bytes, verbose_name='هیستوگرام زمان پاسخ')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین به\u200cروزرسانی')),
+            ],
+            options={
+                'verbose_name': 'آمار تجمیعی استفاده از API',
+                'verbose_name_plural': 'آمار تجمیعی استفاده\u200cهای API',
+                'ordering': ['-bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('bucket_start', 'endpoint'), name='apiusagerollup_bucket_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,206 @@
+"""
+قالب فشرده و بدون pickle برای ذخیره مدل تشخیص زبان
+
+ساختار فایل:
+    [magic: 8 بایت][نسخه قالب: uint32][طول هدر: uint32][هدر JSON][payload]
+
+هدر شامل نوع بردارساز، برچسب زبان‌ها، محل و نوع هر آرایه در payload و checksum
+(sha256) کل payload است. آرایه‌ها به صورت خام NumPy با تراز ۶۴ بایتی ذخیره می‌شوند و
+با np.memmap فقط‌خواندنی نگاشت می‌شوند؛ بنابراین همه workerها از همان صفحات
+page cache استفاده می‌کنند و بارگذاری فقط نگاشت فایل است.
+"""
+import hashlib
+import json
+import os
+import pickle
+import struct
+import tempfile
+
+import numpy as np
+
+from .features import CharNgramHashingVectorizer, VocabularyFeatures
+from .inference import NaiveBayesScorer
+
+
+MAGIC = b'LDMODEL\x00'
+FORMAT_VERSION = 1
+ARTIFACT_NAME = 'language_model.ldm'
+
+_PREAMBLE = struct.Struct('<8sII')
+_ALIGNMENT = 64
+
+
+class ModelFormatError(Exception):
+    """فایل مدل نامعتبر است (magic یا نسخه ناسازگار، فایل ناقص یا checksum نادرست)"""
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _encode_vocabulary(vocabulary):
+    """تبدیل دیکشنری واژگان به یک بافر UTF-8 و آرایه offsetها به ترتیب اندیس ویژگی"""
+    terms = sorted(vocabulary, key=vocabulary.get)
+    encoded = [term.encode('utf-8') for term in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(term) for term in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_vocabulary(data, offsets):
+    buffer = data.tobytes()
+    bounds = offsets.tolist()
+    return {
+        buffer[bounds[i]:bounds[i + 1]].decode('utf-8'): i
+        for i in range(len(bounds) - 1)
+    }
+
+
+def save_artifact(path, scorer, features, metadata=None):
+    """
+    ذخیره مدل در قالب memory-mapped
+
+    scorer یک NaiveBayesScorer و features یکی از VocabularyFeatures یا
+    CharNgramHashingVectorizer است. نوشتن در فایل موقت و سپس os.replace انجام
+    می‌شود تا خواننده‌ها هرگز فایل نیمه‌کاره نبینند.
+    """
+    arrays = {
+        'class_log_prior': np.asarray(scorer.class_log_prior_, dtype=np.float64),
+        'feature_log_prob_t': np.asarray(scorer.feature_log_prob_t, dtype=np.float64),
+    }
+    if scorer.supports_partial_fit:
+        # شمارش‌های خام برای به‌روزرسانی افزایشی بدون آموزش کامل
+        arrays['feature_count_t'] = np.asarray(scorer.feature_count_t, dtype=np.float64)
+        arrays['class_count'] = np.asarray(scorer.class_count, dtype=np.float64)
+    if isinstance(features, CharNgramHashingVectorizer):
+        vectorizer = {'type': 'hashing', **features.get_params()}
+    else:
+        arrays['vocabulary_data'], arrays['vocabulary_offsets'] = _encode_vocabulary(features.vocabulary)
+        vectorizer = {'type': 'vocabulary', 'ngram_range': list(features.ngram_range)}
+
+    layout = {}
+    chunks = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        start = _align(offset)
+        chunks.append(b'\0' * (start - offset))
+        chunks.append(array.tobytes())
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': start}
+        offset = start + array.nbytes
+    payload = b''.join(chunks)
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'vectorizer': vectorizer,
+        'classes': [str(label) for label in scorer.classes_],
+        'alpha': scorer.alpha,
+        'arrays': layout,
+        'payload_size': len(payload),
+        'checksum': {'algorithm': 'sha256', 'digest': hashlib.sha256(payload).hexdigest()},
+        'metadata': metadata or {},
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_end = _PREAMBLE.size + len(header_bytes)
+    padding = b' ' * (_align(header_end) - header_end)
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.ldm')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes) + len(padding)))
+            f.write(header_bytes + padding)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp فایل را با دسترسی 0600 می‌سازد؛ workerهای دیگر باید بتوانند آن را بخوانند
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return header
+
+
+def read_header(path):
+    """خواندن و اعتبارسنجی هدر؛ خروجی: (هدر، offset شروع payload)"""
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) != _PREAMBLE.size:
+            raise ModelFormatError('فایل مدل ناقص است')
+        magic, version, header_length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ModelFormatError('فایل مدل معتبر نیست')
+        if version != FORMAT_VERSION:
+            raise ModelFormatError(f'نسخه قالب مدل پشتیبانی نمی‌شود: {version}')
+        header = json.loads(f.read(header_length).decode('utf-8'))
+
+    payload_start = _PREAMBLE.size + header_length
+    if os.path.getsize(path) != payload_start + header['payload_size']:
+        raise ModelFormatError('اندازه فایل مدل با هدر آن مطابقت ندارد')
+    return header, payload_start
+
+
+def load_artifact(path, verify=True):
+    """
+    نگاشت فایل مدل به حافظه
+
+    خروجی: (NaiveBayesScorer، بردارساز سریع، هدر)
+    """
+    header, payload_start = read_header(path)
+
+    if verify and header['payload_size']:
+        payload = np.memmap(path, dtype=np.uint8, mode='r', offset=payload_start,
+                            shape=(header['payload_size'],))
+        digest = hashlib.sha256(payload).hexdigest()
+        del payload
+        if digest != header['checksum']['digest']:
+            raise ModelFormatError('checksum فایل مدل نادرست است')
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple(spec['shape'])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+            continue
+        arrays[name] = np.memmap(path, dtype=dtype, mode='r',
+                                 offset=payload_start + spec['offset'], shape=shape)
+
+    scorer = NaiveBayesScorer(
+        header['classes'], arrays['class_log_prior'], arrays['feature_log_prob_t'],
+        feature_count_t=arrays.get('feature_count_t'),
+        class_count=arrays.get('class_count'),
+        alpha=header.get('alpha', 1.0),
+    )
+
+    vectorizer = header['vectorizer']
+    if vectorizer['type'] == 'hashing':
+        features = CharNgramHashingVectorizer(vectorizer['n_features'], vectorizer['ngram_range'])
+    elif vectorizer['type'] == 'vocabulary':
+        vocabulary = _decode_vocabulary(arrays['vocabulary_data'], arrays['vocabulary_offsets'])
+        features = VocabularyFeatures(vocabulary, vectorizer['ngram_range'])
+    else:
+        raise ModelFormatError(f"نوع بردارساز ناشناخته: {vectorizer['type']}")
+
+    return scorer, features, header
+
+
+def convert_pickles(model_path, output_path=None):
+    """تبدیل فایل‌های pickle قدیمی (language_model.pkl و vectorizer.pkl) به قالب جدید"""
+    with open(os.path.join(model_path, 'language_model.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    with open(os.path.join(model_path, 'vectorizer.pkl'), 'rb') as f:
+        vectorizer = pickle.load(f)
+
+    if isinstance(vectorizer, CharNgramHashingVectorizer):
+        features = vectorizer
+    else:
+        features = VocabularyFeatures.from_vectorizer(vectorizer)
+        if features is None:
+            raise ModelFormatError('تنظیمات بردارساز با قالب جدید سازگار نیست')
+
+    output_path = output_path or os.path.join(model_path, ARTIFACT_NAME)
+    return save_artifact(output_path, NaiveBayesScorer.from_estimator(model), features,
+                         metadata={'converted_from': 'pickle'})
@@ -0,0 +1,142 @@
+"""
+نسخه‌های ذخیره شده مدل روی دیسک و اشاره‌گر نسخه فعال
+
+ساختار پوشه مدل:
+    <model_path>/versions/<version>/language_model.ldm   هر نسخه در پوشه جداگانه
+    <model_path>/ACTIVE                                  نام نسخه فعال
+
+فایل هر نسخه پس از نوشتن تغییر نمی‌کند. فعال‌سازی یک نسخه (پس از آموزش یا برای
+rollback) فقط نوشتن فایل ACTIVE در فایل موقت و os.replace است؛ بنابراین خواننده‌ها
+همیشه یا نسخه قبلی را می‌بینند یا نسخه جدید را. پوشه‌های بدون ACTIVE (قالب قدیمی با
+language_model.ldm در خود model_path) همچنان بارگذاری می‌شوند.
+"""
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from .model_store import ARTIFACT_NAME
+
+
+VERSIONS_DIR = 'versions'
+ACTIVE_POINTER = 'ACTIVE'
+
+_VERSION_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,19}$')
+
+
+class ModelVersionError(Exception):
+    """نام نسخه نامعتبر است یا فایل مدل آن وجود ندارد"""
+
+
+def _check_name(version):
+    # نام نسخه در مسیر فایل و ModelTrainingLog.version (حداکثر ۲۰ نویسه) استفاده می‌شود
+    if not isinstance(version, str) or not _VERSION_RE.match(version):
+        raise ModelVersionError(f'نام نسخه نامعتبر: {version!r}')
+    return version
+
+
+def version_dir(model_path, version):
+    return os.path.join(model_path, VERSIONS_DIR, _check_name(version))
+
+
+def artifact_path(model_path, version):
+    return os.path.join(version_dir(model_path, version), ARTIFACT_NAME)
+
+
+def list_versions(model_path):
+    """نسخه‌های دارای فایل مدل، از قدیمی به جدید"""
+    root = os.path.join(model_path, VERSIONS_DIR)
+    if not os.path.isdir(root):
+        return []
+    entries = [
+        entry for entry in os.scandir(root)
+        if entry.is_dir() and _VERSION_RE.match(entry.name)
+        and os.path.exists(os.path.join(entry.path, ARTIFACT_NAME))
+    ]
+    entries.sort(key=lambda entry: (entry.stat().st_mtime_ns, entry.name))
+    return [entry.name for entry in entries]
+
+
+def new_version(model_path):
+    """نام نسخه جدید بر اساس زمان (v20250101_120000) که هنوز استفاده نشده است"""
+    base = time.strftime('v%Y%m%d_%H%M%S')
+    version = base
+    suffix = 1
+    while os.path.exists(os.path.join(model_path, VERSIONS_DIR, version)):
+        suffix += 1
+        version = f'{base}_{suffix}'
+    return version
+
+
+def get_active_version(model_path):
+    """نام نسخه فعال یا None اگر اشاره‌گری وجود نداشته باشد"""
+    try:
+        with open(os.path.join(model_path, ACTIVE_POINTER), encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return _check_name(version)
+
+
+def set_active_version(model_path, version):
+    """جابه‌جایی اتمیک اشاره‌گر نسخه فعال"""
+    if not os.path.exists(artifact_path(model_path, version)):
+        raise ModelVersionError(f'فایل مدل نسخه {version} یافت نشد')
+    fd, tmp_path = tempfile.mkstemp(dir=model_path, prefix='.tmp-', suffix='.active')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(version + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(model_path, ACTIVE_POINTER))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def active_artifact_path(model_path):
+    """مسیر فایل مدل فعال (نسخه اشاره شده یا فایل قالب قدیمی)"""
+    version = get_active_version(model_path)
+    if version is None:
+        return os.path.join(model_path, ARTIFACT_NAME)
+    return artifact_path(model_path, version)
+
+
+def active_stamp(model_path):
+    """
+    شناسه ارزان تغییر مدل فعال (inode و زمان تغییر) با یک stat
+
+    اشاره‌گر ACTIVE با os.replace نوشته می‌شود؛ بنابراین هر فعال‌سازی inode آن را عوض
+    می‌کند. بدون اشاره‌گر، فایل مدل قالب قدیمی بررسی می‌شود.
+    """
+    for name in (ACTIVE_POINTER, ARTIFACT_NAME):
+        try:
+            stat = os.stat(os.path.join(model_path, name))
+        except OSError:
+            continue
+        return name, stat.st_ino, stat.st_mtime_ns, stat.st_size
+    return None
+
+
+def prune_versions(model_path, keep, protected=()):
+    """
+    حذف قدیمی‌ترین نسخه‌ها به جز keep نسخه آخر، نسخه فعال و نسخه‌های protected
+
+    protected نسخه‌هایی است که هنوز برای rollback ارائه می‌شوند (مثلاً نسخه‌های دارای
+    ModelTrainingLog)؛ خروجی: نسخه‌های حذف شده
+    """
+    if not keep or keep < 1:
+        return []
+    active = get_active_version(model_path)
+    protected = set(protected)
+    versions = list_versions(model_path)
+    removed = []
+    for version in versions[:-keep]:
+        if version == active or version in protected:
+            continue
+        shutil.rmtree(version_dir(model_path, version), ignore_errors=True)
+        removed.append(version)
+    return removed
@@ -42,7 +42,8 @@ class DetectionHistory(models.Model):
     processing_time = models.FloatField(verbose_name="زمان پردازش (ثانیه)", null=True, blank=True)
     ip_address = models.GenericIPAddressField(verbose_name="آدرس IP", null=True, blank=True)
     user_agent = models.TextField(verbose_name="User Agent", blank=True)
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ تشخیص")
+    # زمان در لحظه ساخت رکورد تعیین می‌شود (نه هنگام نوشتن با تأخیر write-behind)
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="تاریخ تشخیص")
     
     # اطلاعات اضافی برای تحلیل
     text_length = models.IntegerField(verbose_name="طول متن", default=0)
@@ -52,6 +53,14 @@ class DetectionHistory(models.Model):
         verbose_name = "تاریخچه تشخیص"
         verbose_name_plural = "تاریخچه تشخیص‌ها"
         ordering = ['-created_at']
+        indexes = [
+            # تاریخچه هر کاربر به ترتیب زمان؛ id برای صفحه‌بندی keyset روی (created_at، id)
+            models.Index(fields=['user', '-created_at', '-id'], name='dethist_user_created_id_idx'),
+            # فیلتر بازه زمانی (صفحه آمار)
+            models.Index(fields=['created_at'], name='dethist_created_idx'),
+            # گروه‌بندی بر اساس زبان در یک بازه زمانی
+            models.Index(fields=['detected_language', 'created_at'], name='dethist_lang_created_idx'),
+        ]
     
     def __str__(self):
         text_preview = self.input_text[:50] + "..." if len(self.input_text) > 50 else self.input_text
@@ -65,6 +74,50 @@ class DetectionHistory(models.Model):
         super().save(*args, **kwargs)
 
 
+class DetectionRollup(models.Model):
+    """آمار تجمیعی تشخیص‌ها برای هر زبان در هر ساعت یا روز (به جای پیمایش DetectionHistory)"""
+    
+    PERIOD_HOUR = 'hour'
+    PERIOD_DAY = 'day'
+    PERIOD_CHOICES = [
+        (PERIOD_HOUR, 'ساعتی'),
+        (PERIOD_DAY, 'روزانه'),
+    ]
+    
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES, verbose_name="بازه")
+    bucket_start = models.DateTimeField(verbose_name="شروع بازه")
+    language = models.ForeignKey(
+        Language,
+        on_delete=models.CASCADE,
+        verbose_name="زبان",
+        null=True,
+        blank=True
+    )
+    count = models.BigIntegerField(default=0, verbose_name="تعداد تشخیص")
+    confidence_sum = models.FloatField(default=0, verbose_name="مجموع اطمینان")
+    processing_time_sum = models.FloatField(default=0, verbose_name="مجموع زمان پردازش")
+    # تعداد رکوردهای دارای processing_time (این فیلد در تاریخچه اختیاری است)
+    processing_time_count = models.BigIntegerField(default=0, verbose_name="تعداد زمان‌های پردازش")
+    # HyperLogLog شناسه کاربران (کاربران مهمان یک مقدار مشترک دارند)
+    users_sketch = models.BinaryField(default=bytes, verbose_name="sketch کاربران")
+    # شمارنده‌های هیستوگرام با مرزهای ثابت detection.rollups (int64 پشت سر هم)
+    confidence_histogram = models.BinaryField(default=bytes, verbose_name="هیستوگرام اطمینان")
+    processing_time_histogram = models.BinaryField(default=bytes, verbose_name="هیستوگرام زمان پردازش")
+    text_length_histogram = models.BinaryField(default=bytes, verbose_name="هیستوگرام طول متن")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخرین به‌روزرسانی")
+    
+    class Meta:
+        verbose_name = "آمار تجمیعی تشخیص"
+        verbose_name_plural = "آمار تجمیعی تشخیص‌ها"
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket_start', 'language'], name='detrollup_bucket_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_period_display()} {self.bucket_start:%Y-%m-%d %H:%M} {self.language}: {self.count}"
+
+
 class ModelTrainingLog(models.Model):
     """مدل برای ذخیره لاگ آموزش مدل"""
     
@@ -98,6 +151,66 @@ class ModelTrainingLog(models.Model):
         super().save(*args, **kwargs)
 
 
+class TrainingJob(models.Model):
+    """
+    کار آموزش مدل در صف پایگاه‌داده
+
+    درخواست آموزش فقط یک رکورد queued می‌سازد؛ worker پس‌زمینه آن را با یک UPDATE
+    شرطی برمی‌دارد (تا هر کار فقط یک بار اجرا شود)، پیشرفت را در همین رکورد ثبت
+    می‌کند و در پایان ModelTrainingLog را می‌نویسد.
+    """
+    
+    STATUS_CHOICES = [
+        ('queued', 'در صف'),
+        ('running', 'در حال اجرا'),
+        ('succeeded', 'موفق'),
+        ('failed', 'ناموفق'),
+    ]
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name="وضعیت")
+    progress = models.FloatField(default=0.0, verbose_name="پیشرفت")
+    stage = models.CharField(max_length=200, blank=True, verbose_name="مرحله")
+    parameters = models.JSONField(default=dict, verbose_name="پارامترهای آموزش")
+    error = models.TextField(blank=True, verbose_name="خطا")
+    worker = models.CharField(max_length=100, blank=True, verbose_name="worker")
+    training_log = models.ForeignKey(
+        ModelTrainingLog,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="لاگ آموزش"
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="درخواست دهنده"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="زمان ثبت")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="زمان شروع")
+    # worker در حال اجرا این زمان را به‌طور دوره‌ای به‌روز می‌کند؛ کار بدون heartbeat رها شده است
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="آخرین heartbeat")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="تعداد تلاش‌ها")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="زمان پایان")
+    
+    class Meta:
+        verbose_name = "کار آموزش مدل"
+        verbose_name_plural = "کارهای آموزش مدل"
+        ordering = ['-created_at']
+        indexes = [
+            # برداشتن قدیمی‌ترین کار در صف
+            models.Index(fields=['status', 'created_at'], name='trainjob_status_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"آموزش #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+
 class UserFeedback(models.Model):
     """مدل برای ذخیره بازخورد کاربران"""
     
@@ -148,12 +261,42 @@ class APIUsage(models.Model):
     status_code = models.IntegerField(verbose_name="کد وضعیت")
     request_size = models.IntegerField(verbose_name="اندازه درخواست (بایت)", default=0)
     response_size = models.IntegerField(verbose_name="اندازه پاسخ (بایت)", default=0)
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="زمان درخواست")
+    # زمان در لحظه پاسخ تعیین می‌شود (نه هنگام نوشتن دسته‌ای با تأخیر)
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="زمان درخواست")
     
     class Meta:
         verbose_name = "استفاده از API"
         verbose_name_plural = "استفاده‌های API"
         ordering = ['-created_at']
+        indexes = [
+            # صدک‌های زمان پاسخ هر endpoint در یک بازه زمانی (analytics)
+            models.Index(fields=['created_at', 'endpoint'], name='apiusage_created_endpoint_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.method} {self.endpoint} - {self.status_code}"
+
+
+class APIUsageRollup(models.Model):
+    """آمار تجمیعی ساعتی زمان پاسخ هر endpoint API (به جای پیمایش APIUsage)"""
+    
+    bucket_start = models.DateTimeField(verbose_name="شروع ساعت")
+    endpoint = models.CharField(max_length=100, verbose_name="نقطه پایانی")
+    count = models.BigIntegerField(default=0, verbose_name="تعداد نمونه‌ها")
+    error_count = models.BigIntegerField(default=0, verbose_name="تعداد خطاهای 5xx")
+    response_time_sum = models.FloatField(default=0, verbose_name="مجموع زمان پاسخ (میلی‌ثانیه)")
+    response_time_max = models.FloatField(default=0, verbose_name="بیشینه زمان پاسخ (میلی‌ثانیه)")
+    # شمارنده‌های هیستوگرام با مرزهای ثابت detection.rollups.RESPONSE_TIME_EDGES
+    response_time_histogram = models.BinaryField(default=bytes, verbose_name="هیستوگرام زمان پاسخ")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخرین به‌روزرسانی")
+    
+    class Meta:
+        verbose_name = "آمار تجمیعی استفاده از API"
+        verbose_name_plural = "آمار تجمیعی استفاده‌های API"
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['bucket_start', 'endpoint'], name='apiusagerollup_bucket_unique'),
+        ]
     
     def __str__(self):
-        return f"{self.method} {self.endpoint} - {self.status_code}"
\ No newline at end of file
+        return f"{self.bucket_start:%Y-%m-%d %H:%M} {self.endpoint}: {self.count}"
\ No newline at end of file
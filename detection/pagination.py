@@ -0,0 +1,113 @@
+"""
+صفحه‌بندی keyset تاریخچه تشخیص‌ها روی (created_at، id)
+
+به جای OFFSET (که هزینه آن با شماره صفحه خطی رشد می‌کند) هر صفحه با شرط «قدیمی‌تر
+از آخرین رکورد صفحه قبل» خوانده می‌شود؛ با ایندکس (user، -created_at، -id) هزینه
+صفحه‌های عمیق با صفحه اول یکسان است. cursor یک رشته مات (base64) شامل created_at و
+id رکورد مرزی و جهت حرکت است.
+
+تعداد کل تشخیص‌های هر کاربر برای نمایش تقریبی است و با TTL در cache جنگو نگه داشته
+می‌شود تا هر بارگذاری صفحه یک COUNT(*) روی همه تاریخچه کاربر اجرا نکند.
+"""
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import DetectionHistory
+
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+HISTORY_COUNT_CACHE_KEY = 'detection:history_count:{user_id}'
+
+
+def encode_cursor(detection, direction=NEXT):
+    value = f'{direction}|{detection.created_at.isoformat()}|{detection.pk}'
+    return base64.urlsafe_b64encode(value.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(جهت، created_at، id)؛ ValueError برای cursor نامعتبر"""
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        direction, created_at, pk = value.split('|')
+        created_at = datetime.fromisoformat(created_at)
+        pk = int(pk)
+    except ValueError:
+        raise ValueError('cursor نامعتبر است')
+    if direction not in (NEXT, PREVIOUS) or timezone.is_naive(created_at):
+        raise ValueError('cursor نامعتبر است')
+    return direction, created_at, pk
+
+
+class KeysetPage:
+    """یک صفحه از رکوردها (جدیدترین اول) به همراه cursor صفحه‌های قبلی و بعدی"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_page(queryset, cursor=None, page_size=10):
+    """
+    خواندن یک صفحه از queryset به ترتیب (-created_at، -id) با یک کوئری
+
+    ValueError برای cursor نامعتبر.
+    """
+    direction = NEXT
+    if cursor:
+        direction, created_at, pk = decode_cursor(cursor)
+        if direction == NEXT:
+            # (created_at، id) < (مقدار cursor)؛ شرط created_at__lte بازه ایندکس را محدود می‌کند
+            queryset = queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=pk)
+        else:
+            queryset = queryset.filter(created_at__gte=created_at).exclude(created_at=created_at, id__lte=pk)
+
+    if direction == NEXT:
+        rows = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        has_next, has_previous = has_more, bool(cursor)
+    else:
+        # صفحه قبل: رکوردهای جدیدتر به ترتیب صعودی و سپس معکوس
+        rows = list(queryset.order_by('created_at', 'id')[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next, has_previous = True, has_more
+
+    if not rows:
+        return KeysetPage(rows)
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], NEXT) if has_next else None,
+        previous_cursor=encode_cursor(rows[0], PREVIOUS) if has_previous else None,
+    )
+
+
+def history_count(user):
+    """تعداد تقریبی تشخیص‌های کاربر (COUNT با TTL در cache)"""
+    key = HISTORY_COUNT_CACHE_KEY.format(user_id=user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = DetectionHistory.objects.filter(user=user).count()
+        cache.set(key, count, getattr(settings, 'DETECTION_HISTORY_COUNT_CACHE_TIMEOUT', 60))
+    return count
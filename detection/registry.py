@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .language_detector import LanguageDetector
+from .model_store import ModelFormatError
+from . import model_versions
+
+
+logger = logging.getLogger(__name__)
+
+
+class DetectorRegistry:
+    """
+    نگهداری یک نمونه مشترک از LanguageDetector در سطح پروسس
+
+    مدل فقط یک بار (هنگام راه‌اندازی worker یا در اولین درخواست) از دیسک
+    بارگذاری می‌شود و همه نقاط ورودی از همان نمونه استفاده می‌کنند.
+    جایگزینی مدل پس از آموزش به صورت اتمیک انجام می‌شود؛ درخواست‌هایی که
+    نمونه قبلی را گرفته‌اند با همان نمونه کار خود را تمام می‌کنند.
+
+    نسخه فعال مدل با جابه‌جایی اتمیک فایل اشاره‌گر ACTIVE عوض می‌شود؛ هر
+    DETECTION_MODEL_RELOAD_CHECK_INTERVAL ثانیه با یک stat بررسی می‌شود که اشاره‌گر
+    عوض شده است یا نه. در این صورت نسخه جدید در یک thread پس‌زمینه بارگذاری و
+    سپس به صورت اتمیک جایگزین می‌شود و تا آن زمان درخواست‌ها با مدل فعلی پاسخ
+    داده می‌شوند. بنابراین مدلی که در پروسس دیگری (مثلاً worker آموزش) ذخیره شده
+    است بدون راه‌اندازی مجدد و بدون تأخیر برای درخواست‌ها در همه پروسس‌ها فعال می‌شود.
+    """
+
+    def __init__(self, factory=LanguageDetector, reload_check_interval=None):
+        self._factory = factory
+        self._reload_check_interval = reload_check_interval
+        self._detector = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    @property
+    def reload_check_interval(self):
+        if self._reload_check_interval is not None:
+            return self._reload_check_interval
+        return getattr(settings, 'DETECTION_MODEL_RELOAD_CHECK_INTERVAL', 2.0)
+
+    def _artifact_stamp(self, detector):
+        """شناسه نسخه فعال مدل روی دیسک (inode و زمان تغییر اشاره‌گر) یا None"""
+        return model_versions.active_stamp(detector.model_path)
+
+    def _load(self):
+        detector = self._factory()
+        # شناسه پیش از بارگذاری خوانده می‌شود تا تغییر همزمان فایل از دست نرود
+        stamp = self._artifact_stamp(detector)
+        detector.load_model()
+        return detector, stamp
+
+    def get(self):
+        """دریافت نمونه مشترک (بارگذاری تنبل در اولین فراخوانی)"""
+        detector = self._detector
+        if detector is None:
+            with self._lock:
+                if self._detector is None:
+                    self._detector, self._stamp = self._load()
+                    self._checked_at = time.monotonic()
+                detector = self._detector
+        elif self.reload_check_interval and time.monotonic() - self._checked_at >= self.reload_check_interval:
+            detector = self._reload_if_changed(detector)
+        return detector
+
+    def _reload_if_changed(self, detector):
+        # فقط یک thread بررسی می‌کند؛ _reload_lock تا پایان بارگذاری پس‌زمینه آزاد نمی‌شود
+        if not self._reload_lock.acquire(blocking=False):
+            return detector
+        try:
+            self._checked_at = time.monotonic()
+            stamp = self._artifact_stamp(detector)
+            if stamp is None or stamp == self._stamp:
+                self._reload_lock.release()
+                return detector
+            threading.Thread(
+                target=self._background_reload, args=(self._stamp,),
+                name='detection-model-reload', daemon=True,
+            ).start()
+        except BaseException:
+            self._reload_lock.release()
+            raise
+        # درخواست جاری منتظر بارگذاری نمی‌ماند
+        return detector
+
+    def _background_reload(self, previous_stamp):
+        """بارگذاری نسخه فعال جدید و جایگزینی اتمیک آن (در thread پس‌زمینه)"""
+        try:
+            loaded, stamp = self._load()
+            if loaded.model is None:
+                # فایل جدید قابل بارگذاری نبود؛ مدل فعلی حفظ و در بررسی بعدی دوباره امتحان می‌شود
+                return
+            with self._lock:
+                if self._stamp != previous_stamp:
+                    # در این فاصله مدل دیگری (swap یا activate) جایگزین شده است
+                    return
+                self._detector = loaded
+                self._stamp = stamp
+        except Exception:
+            logger.exception('خطا در بارگذاری نسخه جدید مدل')
+        finally:
+            self._reload_lock.release()
+
+    def swap(self, detector):
+        """جایگزینی اتمیک نمونه فعال و برگرداندن نمونه قبلی"""
+        stamp = self._artifact_stamp(detector) if detector is not None else None
+        with self._lock:
+            previous = self._detector
+            self._detector = detector
+            self._stamp = stamp
+            self._checked_at = time.monotonic()
+        return previous
+
+    def reload(self):
+        """بارگذاری مجدد مدل از دیسک بدون متوقف کردن درخواست‌های جاری"""
+        # بارگذاری خارج از قفل انجام می‌شود تا درخواست‌ها با مدل قبلی ادامه دهند
+        detector, stamp = self._load()
+        with self._lock:
+            self._detector = detector
+            self._stamp = stamp
+            self._checked_at = time.monotonic()
+        return detector
+
+    def activate(self, version):
+        """
+        فعال‌سازی یک نسخه ذخیره شده (مثلاً rollback) و بارگذاری آن در این پروسس
+
+        ابتدا نسخه بارگذاری و بررسی می‌شود و فقط در صورت موفقیت اشاره‌گر جابه‌جا
+        می‌شود؛ پروسس‌های دیگر تغییر اشاره‌گر را تشخیص می‌دهند.
+        """
+        detector = self._factory()
+        try:
+            loaded = detector.load_model(version=version)
+        except ModelFormatError as e:
+            raise model_versions.ModelVersionError(f'بارگذاری نسخه {version} ناموفق بود: {e}') from e
+        if not loaded or detector.model is None:
+            raise model_versions.ModelVersionError(f'بارگذاری نسخه {version} ناموفق بود')
+        model_versions.set_active_version(detector.model_path, version)
+        self.swap(detector)
+        return detector
+
+    def clear(self):
+        """حذف نمونه فعال؛ فراخوانی بعدی get مدل را دوباره بارگذاری می‌کند"""
+        return self.swap(None)
+
+
+registry = DetectorRegistry()
+
+
+def get_detector():
+    """نمونه مشترک تشخیص‌دهنده زبان برای این پروسس"""
+    return registry.get()
+
+
+def preload_detector():
+    """بارگذاری مدل هنگام راه‌اندازی worker (در صورت فعال بودن در تنظیمات)"""
+    if getattr(settings, 'DETECTION_PRELOAD_MODEL', True):
+        return registry.get()
+    return None
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+    # نام یک cache در CACHES برای اشتراک نتایج بین پروسس‌ها (None: فقط حافظه پروسس)
+    'BACKEND': None,
+    'KEY_PREFIX': 'detection:result',
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DETECTION_RESULT_CACHE', {}))
+    return config
+
+
+class DetectionResultCache:
+    """
+    cache نتیجه تشخیص برای متن‌های تکراری
+
+    کلید هر مدخل hash متن پیش‌پردازش‌شده به همراه نسخه مدل و top_k است؛ بنابراین
+    با آموزش یا بارگذاری مدل جدید، نتایج مدل قبلی دیگر استفاده نمی‌شوند. مدخل‌ها در
+    یک LRU محدود (MAX_SIZE مدخل، TTL ثانیه) درون پروسس نگهداری می‌شوند و در صورت
+    تنظیم BACKEND در cache مشترک جنگو نیز نوشته می‌شوند.
+    """
+
+    def __init__(self, max_size=10000, ttl=300, backend=None, key_prefix='detection:result'):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self.key_prefix = key_prefix
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        config = get_config()
+        return cls(
+            max_size=config['MAX_SIZE'],
+            ttl=config['TTL'],
+            backend=config['BACKEND'],
+            key_prefix=config['KEY_PREFIX'],
+        )
+
+    @property
+    def enabled(self):
+        return get_config()['ENABLED'] and self.max_size > 0
+
+    def make_key(self, model_version, processed_text, top_k=None):
+        digest = hashlib.blake2b(processed_text.encode('utf-8'), digest_size=16).hexdigest()
+        return f'{self.key_prefix}:{model_version}:{top_k or 0}:{digest}'
+
+    def get(self, key):
+        """مقدار ذخیره شده یا None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.backend:
+            value = caches[self.backend].get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.backend:
+            caches[self.backend].set(key, value, self.ttl)
+
+    def _store(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """حذف مدخل‌های این پروسس (مدخل‌های cache مشترک با نسخه مدل از اعتبار می‌افتند)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+result_cache = DetectionResultCache.from_settings()
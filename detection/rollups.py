@@ -0,0 +1,456 @@
+"""
+نگهداری و خواندن آمار تجمیعی (rollup) تشخیص‌ها
+
+هر رکورد DetectionRollup شمارنده‌های یک زبان در یک ساعت یا یک روز است. با هر
+flush تاریخچه، شمارنده‌های بازه‌های مربوط به‌روزرسانی می‌شوند و دستور
+rollup_detections می‌تواند آن‌ها را از روی DetectionHistory بازسازی کند و
+rollupهای ساعتی قدیمی را حذف کند. صفحه آمار و API تحلیل‌ها فقط همین جدول کوچک را
+می‌خوانند.
+
+علاوه بر مجموع‌ها، هر بازه هیستوگرام اطمینان، زمان پردازش و طول متن را با مرزهای
+ثابت زیر نگه می‌دارد تا توزیع‌ها و صدک‌ها بدون پیمایش تاریخچه محاسبه شوند.
+
+زمان پاسخ API هم به همین شکل در APIUsageRollup (ساعتی، برای هر endpoint) تجمیع
+می‌شود تا صدک‌های تأخیر بدون خواندن رکوردهای APIUsage به دست آیند.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import APIUsage, APIUsageRollup, DetectionHistory, DetectionRollup
+from .sketches import BucketHistogram, HyperLogLog
+
+
+PERIODS = (DetectionRollup.PERIOD_HOUR, DetectionRollup.PERIOD_DAY)
+
+# مقدار مشترک کاربران مهمان در sketch (معادل گروه NULL در values('user').distinct())
+ANONYMOUS_USER = 'anonymous'
+
+# بازه‌های ۰٫۰۵ تایی میزان اطمینان
+CONFIDENCE_EDGES = tuple(round(i * 0.05, 2) for i in range(1, 20))
+# زمان پردازش (ثانیه)؛ ۲۰ بازه هندسی در هر دهه از ۱۰ میکروثانیه تا ۱۰۰ ثانیه
+PROCESSING_TIME_EDGES = tuple(10 ** (k / 20) for k in range(-100, 41))
+# طول متن (تعداد نویسه)
+TEXT_LENGTH_EDGES = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# زمان پاسخ API (میلی‌ثانیه)؛ ۲۰ بازه هندسی در هر دهه از ۰٫۰۱ میلی‌ثانیه تا ۱۰۰ ثانیه
+RESPONSE_TIME_EDGES = tuple(10 ** (k / 20) for k in range(-40, 101))
+
+# فاصله اطمینان از تأخیر صف‌های write-behind؛ بازه‌های جدیدتر بازسازی نمی‌شوند
+REBUILD_GRACE = timedelta(minutes=5)
+
+HISTOGRAMS = {
+    'confidence_histogram': CONFIDENCE_EDGES,
+    'processing_time_histogram': PROCESSING_TIME_EDGES,
+    'text_length_histogram': TEXT_LENGTH_EDGES,
+}
+
+
+def load_histogram(rollup_or_data, field):
+    """هیستوگرام ذخیره شده در یک فیلد DetectionRollup (یا مقدار خام آن فیلد)"""
+    data = getattr(rollup_or_data, field) if isinstance(rollup_or_data, DetectionRollup) else rollup_or_data
+    return BucketHistogram.from_bytes(HISTOGRAMS[field], data)
+
+
+def bucket_start(moment, period):
+    """شروع بازه ساعتی یا روزانه (به وقت UTC)"""
+    moment = moment.astimezone(dt_timezone.utc)
+    if period == DetectionRollup.PERIOD_HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class _Bucket:
+    """شمارنده‌های درون حافظه یک بازه پیش از نوشتن در پایگاه‌داده"""
+
+    __slots__ = ('count', 'confidence_sum', 'processing_time_sum', 'processing_time_count', 'users',
+                 'histograms')
+
+    def __init__(self):
+        self.count = 0
+        self.confidence_sum = 0.0
+        self.processing_time_sum = 0.0
+        self.processing_time_count = 0
+        self.users = HyperLogLog()
+        self.histograms = {field: BucketHistogram(edges) for field, edges in HISTOGRAMS.items()}
+
+    def add(self, language_id, user_id, confidence, processing_time, text_length):
+        self.count += 1
+        self.confidence_sum += confidence
+        self.histograms['confidence_histogram'].add(confidence)
+        if processing_time is not None:
+            self.processing_time_sum += processing_time
+            self.processing_time_count += 1
+            self.histograms['processing_time_histogram'].add(processing_time)
+        self.histograms['text_length_histogram'].add(text_length or 0)
+        self.users.add(user_id if user_id is not None else ANONYMOUS_USER)
+
+
+def aggregate(rows, hourly_since=None):
+    """
+    تجمیع رکوردهای تاریخچه در بازه‌های ساعتی و روزانه
+
+    rows: رکوردهای DetectionHistory یا تاپل‌های
+    (created_at، language_id، user_id، confidence_score، processing_time، text_length)
+    با hourly_since بازه‌های ساعتی پیش از آن زمان ساخته نمی‌شوند.
+    خروجی: دیکشنری (period، bucket_start، language_id) -> _Bucket
+    """
+    buckets = {}
+    for row in rows:
+        if isinstance(row, DetectionHistory):
+            row = (row.created_at, row.detected_language_id, row.user_id,
+                   row.confidence_score, row.processing_time, row.text_length)
+        created_at, language_id, user_id, confidence, processing_time, text_length = row
+        for period in PERIODS:
+            start = bucket_start(created_at, period)
+            if period == DetectionRollup.PERIOD_HOUR and hourly_since is not None and start < hourly_since:
+                continue
+            key = (period, start, language_id)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = _Bucket()
+            bucket.add(language_id, user_id, confidence, processing_time, text_length)
+    return buckets
+
+
+def _existing_rollups(keys):
+    """رکوردهای موجود برای کلیدهای داده شده، با قفل سطری در پایگاه‌داده‌های پشتیبان"""
+    existing = {}
+    periods = {key[0] for key in keys}
+    starts = {key[1] for key in keys}
+    queryset = DetectionRollup.objects.select_for_update().filter(period__in=periods, bucket_start__in=starts)
+    for rollup in queryset:
+        existing[(rollup.period, rollup.bucket_start, rollup.language_id)] = rollup
+    return existing
+
+
+def _merge(buckets):
+    with transaction.atomic():
+        existing = _existing_rollups(buckets.keys())
+        to_update = []
+        to_create = []
+        for key, bucket in buckets.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                period, start, language_id = key
+                to_create.append(DetectionRollup(
+                    period=period,
+                    bucket_start=start,
+                    language_id=language_id,
+                    count=bucket.count,
+                    confidence_sum=bucket.confidence_sum,
+                    processing_time_sum=bucket.processing_time_sum,
+                    processing_time_count=bucket.processing_time_count,
+                    users_sketch=bucket.users.to_bytes(),
+                    **{field: histogram.to_bytes() for field, histogram in bucket.histograms.items()},
+                ))
+                continue
+            rollup.count += bucket.count
+            rollup.confidence_sum += bucket.confidence_sum
+            rollup.processing_time_sum += bucket.processing_time_sum
+            rollup.processing_time_count += bucket.processing_time_count
+            rollup.users_sketch = HyperLogLog.from_bytes(rollup.users_sketch).merge(bucket.users).to_bytes()
+            for field, histogram in bucket.histograms.items():
+                setattr(rollup, field, load_histogram(rollup, field).merge(histogram).to_bytes())
+            rollup.updated_at = timezone.now()
+            to_update.append(rollup)
+
+        if to_update:
+            DetectionRollup.objects.bulk_update(to_update, [
+                'count', 'confidence_sum', 'processing_time_sum', 'processing_time_count',
+                'users_sketch', *HISTOGRAMS, 'updated_at',
+            ])
+        if to_create:
+            DetectionRollup.objects.bulk_create(to_create)
+
+
+def apply(records):
+    """افزودن رکوردهای تازه ثبت‌شده تاریخچه به rollupها"""
+    buckets = aggregate(records)
+    if not buckets:
+        return
+    try:
+        _merge(buckets)
+    except IntegrityError:
+        # پروسس دیگری همزمان همان بازه را ساخته است؛ این بار رکورد موجود به‌روزرسانی می‌شود
+        _merge(buckets)
+
+
+def closed_cutoff():
+    """
+    شروع قدیمی‌ترین بازه ساعتی که هنوز ممکن است رکورد تازه بگیرد
+
+    رکوردهای تاریخچه با تأخیر صف write-behind نوشته می‌شوند؛ ساعت جاری (و ساعتی که
+    کمتر از REBUILD_GRACE از پایانش گذشته) باز در نظر گرفته می‌شود.
+    """
+    return bucket_start(timezone.now() - REBUILD_GRACE, DetectionRollup.PERIOD_HOUR)
+
+
+def rebuild(since=None, chunk_size=5000):
+    """
+    بازسازی rollupهای بازه‌های بسته از DetectionHistory
+
+    با since فقط بازه‌های روزانه از آن زمان به بعد (و ساعت‌های متناظر) بازسازی می‌شوند.
+    بازه‌های باز (ساعت‌های از closed_cutoff به بعد و روز شامل آن) دست نمی‌خورند؛ thread
+    نوشتن تاریخچه همزمان آن‌ها را به‌روزرسانی می‌کند و بازسازی آن‌ها رکوردهای نوشته شده
+    بین خواندن تاریخچه و حذف rollupها را گم یا دوبار شمارش می‌کرد.
+    خروجی: تعداد رکوردهای پردازش‌شده تاریخچه
+    """
+    closed_hour = closed_cutoff()
+    closed_day = bucket_start(closed_hour, DetectionRollup.PERIOD_DAY)
+    history = DetectionHistory.objects.filter(created_at__lt=closed_hour)
+    hourly = DetectionRollup.objects.filter(period=DetectionRollup.PERIOD_HOUR, bucket_start__lt=closed_hour)
+    daily = DetectionRollup.objects.filter(period=DetectionRollup.PERIOD_DAY, bucket_start__lt=closed_day)
+    if since is not None:
+        since = bucket_start(since, DetectionRollup.PERIOD_DAY)
+        history = history.filter(created_at__gte=since)
+        hourly = hourly.filter(bucket_start__gte=since)
+        daily = daily.filter(bucket_start__gte=since)
+
+    rows = history.values_list(
+        'created_at', 'detected_language_id', 'user_id', 'confidence_score', 'processing_time', 'text_length'
+    ).order_by().iterator(chunk_size=chunk_size)
+
+    processed = 0
+
+    def counted(rows):
+        nonlocal processed
+        for row in rows:
+            processed += 1
+            yield row
+
+    # rollupهای ساعتی خارج از دوره نگهداری ساخته نمی‌شوند
+    buckets = {
+        key: bucket
+        for key, bucket in aggregate(counted(rows), hourly_since=hourly_cutoff()).items()
+        if key[0] == DetectionRollup.PERIOD_HOUR or key[1] < closed_day
+    }
+    with transaction.atomic():
+        hourly.delete()
+        daily.delete()
+        _merge(buckets)
+    return processed
+
+
+def hourly_cutoff(retention_days=None):
+    """شروع قدیمی‌ترین بازه ساعتی که نگهداری می‌شود"""
+    if retention_days is None:
+        retention_days = getattr(settings, 'DETECTION_ROLLUP_HOURLY_RETENTION_DAYS', 30)
+    return bucket_start(timezone.now() - timedelta(days=retention_days), DetectionRollup.PERIOD_HOUR)
+
+
+def prune_hourly(retention_days=None):
+    """حذف rollupهای ساعتی (تشخیص و API) قدیمی‌تر از دوره نگهداری (rollupهای روزانه باقی می‌مانند)"""
+    cutoff = hourly_cutoff(retention_days)
+    deleted, _ = DetectionRollup.objects.filter(
+        period=DetectionRollup.PERIOD_HOUR, bucket_start__lt=cutoff
+    ).delete()
+    usage_deleted, _ = APIUsageRollup.objects.filter(bucket_start__lt=cutoff).delete()
+    return deleted + usage_deleted
+
+
+def load_response_times(rollup_or_data):
+    """هیستوگرام زمان پاسخ یک APIUsageRollup (یا مقدار خام فیلد آن)"""
+    data = rollup_or_data.response_time_histogram if isinstance(rollup_or_data, APIUsageRollup) else rollup_or_data
+    return BucketHistogram.from_bytes(RESPONSE_TIME_EDGES, data)
+
+
+class _UsageBucket:
+    """شمارنده‌های درون حافظه زمان پاسخ یک endpoint در یک ساعت"""
+
+    __slots__ = ('count', 'error_count', 'response_time_sum', 'response_time_max', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.error_count = 0
+        self.response_time_sum = 0.0
+        self.response_time_max = 0.0
+        self.histogram = BucketHistogram(RESPONSE_TIME_EDGES)
+
+    def add(self, response_time, status_code):
+        self.count += 1
+        if status_code >= 500:
+            self.error_count += 1
+        self.response_time_sum += response_time
+        self.response_time_max = max(self.response_time_max, response_time)
+        self.histogram.add(response_time)
+
+
+def aggregate_usage(rows):
+    """
+    تجمیع رکوردهای استفاده از API در بازه‌های ساعتی
+
+    rows: رکوردهای APIUsage یا تاپل‌های (created_at، endpoint، response_time، status_code)
+    خروجی: دیکشنری (bucket_start، endpoint) -> _UsageBucket
+    """
+    buckets = {}
+    for row in rows:
+        if isinstance(row, APIUsage):
+            row = (row.created_at, row.endpoint, row.response_time, row.status_code)
+        created_at, endpoint, response_time, status_code = row
+        key = (bucket_start(created_at, DetectionRollup.PERIOD_HOUR), endpoint)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _UsageBucket()
+        bucket.add(response_time, status_code)
+    return buckets
+
+
+def _merge_usage(buckets):
+    with transaction.atomic():
+        starts = {key[0] for key in buckets}
+        existing = {
+            (rollup.bucket_start, rollup.endpoint): rollup
+            for rollup in APIUsageRollup.objects.select_for_update().filter(bucket_start__in=starts)
+        }
+        to_update = []
+        to_create = []
+        for key, bucket in buckets.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                start, endpoint = key
+                to_create.append(APIUsageRollup(
+                    bucket_start=start,
+                    endpoint=endpoint,
+                    count=bucket.count,
+                    error_count=bucket.error_count,
+                    response_time_sum=bucket.response_time_sum,
+                    response_time_max=bucket.response_time_max,
+                    response_time_histogram=bucket.histogram.to_bytes(),
+                ))
+                continue
+            rollup.count += bucket.count
+            rollup.error_count += bucket.error_count
+            rollup.response_time_sum += bucket.response_time_sum
+            rollup.response_time_max = max(rollup.response_time_max, bucket.response_time_max)
+            rollup.response_time_histogram = load_response_times(rollup).merge(bucket.histogram).to_bytes()
+            rollup.updated_at = timezone.now()
+            to_update.append(rollup)
+
+        if to_update:
+            APIUsageRollup.objects.bulk_update(to_update, [
+                'count', 'error_count', 'response_time_sum', 'response_time_max',
+                'response_time_histogram', 'updated_at',
+            ])
+        if to_create:
+            APIUsageRollup.objects.bulk_create(to_create)
+
+
+def apply_usage(records):
+    """افزودن رکوردهای تازه ثبت‌شده APIUsage به rollupهای ساعتی"""
+    buckets = aggregate_usage(records)
+    if not buckets:
+        return
+    try:
+        _merge_usage(buckets)
+    except IntegrityError:
+        # پروسس دیگری همزمان همان ساعت را ساخته است
+        _merge_usage(buckets)
+
+
+def rebuild_usage(since=None, chunk_size=5000):
+    """
+    بازسازی rollupهای ساعتی API از APIUsage
+
+    فقط ساعت‌های بسته (پیش از closed_cutoff) درون دوره نگهداری rollupهای ساعتی (و با
+    since فقط از آن زمان به بعد) بازسازی می‌شوند؛ ساعت‌های باز را thread نوشتن
+    استفاده از API به‌روزرسانی می‌کند.
+    خروجی: تعداد رکوردهای پردازش‌شده APIUsage
+    """
+    since = hourly_cutoff() if since is None else max(
+        bucket_start(since, DetectionRollup.PERIOD_HOUR), hourly_cutoff()
+    )
+    until = closed_cutoff()
+    usage = APIUsage.objects.filter(created_at__gte=since, created_at__lt=until)
+    rows = usage.values_list(
+        'created_at', 'endpoint', 'response_time', 'status_code'
+    ).order_by().iterator(chunk_size=chunk_size)
+
+    processed = 0
+
+    def counted(rows):
+        nonlocal processed
+        for row in rows:
+            processed += 1
+            yield row
+
+    buckets = aggregate_usage(counted(rows))
+    with transaction.atomic():
+        APIUsageRollup.objects.filter(bucket_start__gte=since, bucket_start__lt=until).delete()
+        _merge_usage(buckets)
+    return processed
+
+
+def language_totals():
+    """تعداد تشخیص و میانگین اطمینان هر زبان با یک کوئری: language_id -> دیکشنری آمار"""
+    rows = DetectionRollup.objects.filter(period=DetectionRollup.PERIOD_DAY).values('language_id').annotate(
+        total=Sum('count'), confidence=Sum('confidence_sum')
+    ).order_by()
+    return {
+        row['language_id']: {
+            'count': row['total'],
+            'avg_confidence': row['confidence'] / row['total'] if row['total'] else 0,
+        }
+        for row in rows
+    }
+
+
+def language_count_subquery():
+    """زیرکوئری تعداد تشخیص‌های هر زبان برای annotate روی Language"""
+    return Coalesce(Subquery(
+        DetectionRollup.objects.filter(
+            period=DetectionRollup.PERIOD_DAY, language=OuterRef('pk')
+        ).values('language').annotate(total=Sum('count')).values('total')
+    ), 0)
+
+
+def summary(days=7, top_languages=10):
+    """داده‌های صفحه آمار از روی rollupهای روزانه"""
+    daily = DetectionRollup.objects.filter(period=DetectionRollup.PERIOD_DAY)
+
+    totals = daily.aggregate(
+        count=Sum('count'),
+        processing_time_sum=Sum('processing_time_sum'),
+        processing_time_count=Sum('processing_time_count'),
+    )
+
+    sketches = [sketch for sketch in daily.values_list('users_sketch', flat=True) if sketch]
+    users = HyperLogLog()
+    if sketches:
+        users.registers = np.maximum.reduce(
+            [np.frombuffer(bytes(sketch), dtype=np.uint8) for sketch in sketches]
+        ).copy()
+
+    language_stats = []
+    for row in daily.values('language__name', 'language__code').annotate(
+        total=Sum('count'), confidence=Sum('confidence_sum')
+    ).order_by('-total')[:top_languages]:
+        language_stats.append({
+            'detected_language__name': row['language__name'],
+            'detected_language__code': row['language__code'],
+            'count': row['total'],
+            'avg_confidence': row['confidence'] / row['total'] if row['total'] else 0,
+        })
+
+    since = bucket_start(timezone.now() - timedelta(days=days), DetectionRollup.PERIOD_DAY)
+    daily_stats = [
+        {'day': row['bucket_start'].date(), 'count': row['total']}
+        for row in daily.filter(bucket_start__gte=since).values('bucket_start').annotate(
+            total=Sum('count')
+        ).order_by('bucket_start')
+    ]
+
+    processing_time_count = totals['processing_time_count'] or 0
+    return {
+        'total_detections': totals['count'] or 0,
+        'total_users': users.count() if sketches else 0,
+        'language_stats': language_stats,
+        'daily_stats': daily_stats,
+        'avg_processing_time': (
+            totals['processing_time_sum'] / processing_time_count if processing_time_count else 0
+        ),
+    }
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .language_catalog import language_catalog
+from .models import Language
+
+
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+def invalidate_language_catalog(sender, **kwargs):
+    """باطل کردن فهرست زبان‌ها پس از هر تغییر در جدول Language"""
+    language_catalog.invalidate()
+    # پروسس‌های دیگر باید پس از commit دوباره بخوانند تا داده قبلی را cache نکنند
+    transaction.on_commit(language_catalog.invalidate)
@@ -0,0 +1,120 @@
+"""
+تشخیص زبان جریانی برای ورودی‌های NDJSON (هر خط یک رکورد JSON)
+
+ورودی خط به خط خوانده و در دسته‌های کوچک با اندازه ثابت به predict_batch داده
+می‌شود؛ بنابراین حافظه مصرفی مستقل از اندازه ورودی است و هر دسته بلافاصله پس از
+پردازش به صورت NDJSON در خروجی نوشته می‌شود.
+"""
+import json
+
+from django.conf import settings
+
+from .language_catalog import language_catalog
+
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_LINE_BYTES = 1024 * 1024
+
+
+def iter_lines(stream, max_line_bytes=DEFAULT_MAX_LINE_BYTES):
+    """
+    خواندن خط به خط از یک stream باینری بدون بارگذاری کل آن در حافظه
+
+    خروجی: (شماره خط، بایت‌های خط یا None برای خط بلندتر از max_line_bytes)
+    """
+    number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # دور ریختن باقی‌مانده خط بلند
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            yield number, None
+            continue
+        yield number, line
+
+
+def parse_line(line, field='text', id_field='id'):
+    """
+    استخراج متن از یک خط NDJSON
+
+    هر خط می‌تواند یک رشته JSON یا یک شیء با کلید field (و شناسه اختیاری id_field) باشد.
+    خروجی: (متن، شناسه)؛ برای خط نامعتبر ValueError
+    """
+    record = json.loads(line)
+    if isinstance(record, str):
+        return record, None
+    if not isinstance(record, dict):
+        raise ValueError('هر خط باید یک رشته یا شیء JSON باشد')
+    text = record.get(field)
+    if not isinstance(text, str):
+        raise ValueError(f'کلید "{field}" در رکورد وجود ندارد یا رشته نیست')
+    return text, record.get(id_field)
+
+
+def detect_stream(lines, detector, batch_size=None, top_k=None, field='text'):
+    """
+    تشخیص زبان خطوط ورودی در دسته‌های batch_size تایی
+
+    lines خروجی iter_lines است. برای هر دسته فهرستی از دیکشنری‌های نتیجه (یا خطا)
+    برای خطوط غیرخالی، به همان ترتیب ورودی، تولید می‌شود.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'DETECTION_STREAM_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    pending = []
+    for number, line in lines:
+        if line is None:
+            pending.append((number, None, None, 'خط ورودی بیش از حد طولانی است'))
+        elif not line.strip():
+            continue
+        else:
+            try:
+                text, record_id = parse_line(line, field)
+                pending.append((number, record_id, text, None))
+            except ValueError as e:
+                # json.JSONDecodeError نیز زیرکلاس ValueError است
+                pending.append((number, None, None, str(e)))
+
+        if len(pending) >= batch_size:
+            yield _detect_batch(pending, detector, top_k)
+            pending = []
+
+    if pending:
+        yield _detect_batch(pending, detector, top_k)
+
+
+def _detect_batch(pending, detector, top_k):
+    texts = [text for _, _, text, error in pending if error is None]
+    results = iter(detector.predict_batch(texts, top_k=top_k) if texts else [])
+
+    outputs = []
+    for number, record_id, text, error in pending:
+        output = {'line': number}
+        if record_id is not None:
+            output['id'] = record_id
+        outputs.append(output)
+        if error is not None:
+            output['error'] = error
+            continue
+
+        result = next(results)
+        code = result['predicted_language']
+        language = language_catalog.get(code) if code else None
+        output.update({
+            'detected_language': language.name if language else (code.title() if code else None),
+            'language_code': code,
+            'confidence': result['confidence'],
+            'all_probabilities': result['all_probabilities'],
+            'text_length': result['text_length'],
+        })
+    return outputs
+
+
+def to_ndjson(batches):
+    """تبدیل هر دسته نتایج به یک قطعه NDJSON برای StreamingHttpResponse"""
+    for outputs in batches:
+        yield ''.join(json.dumps(output, ensure_ascii=False) + '\n' for output in outputs)
@@ -1,3 +1,542 @@
-from django.test import TestCase
+import base64
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import model_store, model_versions, pagination, rollups, training_jobs, usage
+from .batching import MicroBatcher
+from .executor import InferenceBusy
+from .features import VocabularyFeatures, normalize_text
+from .history_writer import DetectionHistoryWriter, build_detection
+from .inference import NaiveBayesScorer
+from .language_detector import LanguageDetector
+from .language_catalog import language_catalog
+from .models import DetectionHistory, DetectionRollup, Language, ModelTrainingLog, TrainingJob
+from .result_cache import result_cache
+
+
+class LanguageStatsQueryCountTests(TestCase):
+    """تعداد کوئری صفحات آمار زبان‌ها نباید به تعداد زبان‌ها وابسته باشد"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def add_languages(self, count):
+        start = Language.objects.count()
+        for i in range(start, start + count):
+            language = Language.objects.create(code=f'lang{i}', name=f'Language {i}', native_name=f'L{i}')
+            # rollupهای ساعت جاری مانند thread نوشتن تاریخچه به‌روزرسانی می‌شوند (rebuild فقط بازه‌های بسته)
+            rollups.apply(DetectionHistory.objects.bulk_create([
+                DetectionHistory(input_text='sample text', detected_language=language, confidence_score=0.5)
+                for _ in range(3)
+            ]))
+
+    def count_queries(self, url):
+        language_catalog.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_supported_languages_query_count_is_constant(self):
+        url = reverse('detection:supported_languages')
+        self.add_languages(2)
+        few = self.count_queries(url)
+        self.add_languages(10)
+        many = self.count_queries(url)
+        self.assertEqual(few, many)
+
+    def test_supported_languages_stats(self):
+        self.add_languages(2)
+        response = self.client.get(reverse('detection:supported_languages'))
+        stats = response.context['language_stats']
+        self.assertEqual(len(stats), 2)
+        for language in Language.objects.all():
+            self.assertEqual(stats[language.id]['count'], 3)
+            self.assertAlmostEqual(stats[language.id]['avg_confidence'], 0.5)
+
+    def test_language_admin_query_count_is_constant(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin:detection_language_changelist')
+        self.add_languages(2)
+        few = self.count_queries(url)
+        self.add_languages(10)
+        many = self.count_queries(url)
+        self.assertEqual(few, many)
+        self.assertContains(self.client.get(url), '3 تشخیص')
+
+
+# ثبت همگام تاریخچه؛ ثبت استفاده از API خاموش است تا بافر آن پس از پایان تست‌ها در پایگاه‌داده اصلی نوشته نشود
+@override_settings(DETECTION_HISTORY_WRITE_BEHIND={'ENABLED': False}, DETECTION_API_USAGE={'ENABLED': False})
+class DetectAPIHistoryTests(TestCase):
+    """نسخه async مسیر api/detect/ تشخیص را در تاریخچه ثبت می‌کند و نسخه همگام هیچ نوشتنی ندارد"""
+
+    result = {
+        'predicted_language': 'english',
+        'confidence': 0.9,
+        'all_probabilities': {'english': 0.9, 'persian': 0.1},
+        'text_length': 11,
+    }
+
+    def setUp(self):
+        Language.objects.create(code='english', name='English', native_name='English')
+        language_catalog.clear()
+
+    def test_sync_view_does_not_write(self):
+        unknown = dict(self.result, predicted_language='klingon')
+        with mock.patch('api.views.run_detection', side_effect=[(self.result, 0.01), (unknown, 0.01)]):
+            for _ in range(2):
+                response = self.client.post(reverse('api_detect'), {'text': 'hello world'}, content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['detected_language'], 'klingon')
+        self.assertFalse(DetectionHistory.objects.exists())
+        self.assertFalse(Language.objects.filter(code='klingon').exists())
+
+    async def test_async_view_logs_detection(self):
+        with mock.patch('api.views.arun_detection', return_value=(self.result, 0.01)):
+            response = await self.async_client.post(
+                reverse('api_detect_async'), {'text': 'hello world'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await DetectionHistory.objects.filter(detected_language__code='english').acount(), 1)
+
+
+class RollupRebuildTests(TestCase):
+    """بازسازی rollupها فقط بازه‌های بسته را بازنویسی می‌کند"""
+
+    def test_rebuild_keeps_open_buckets(self):
+        language = Language.objects.create(code='english', name='English', native_name='English')
+        now = timezone.now()
+        records = DetectionHistory.objects.bulk_create([
+            DetectionHistory(input_text='old text', detected_language=language, confidence_score=0.5)
+            for _ in range(2)
+        ])
+        DetectionHistory.objects.filter(pk__in=[r.pk for r in records]).update(created_at=now - timedelta(hours=3))
+        rollups.apply(DetectionHistory.objects.all())
+        # رکورد ساعت جاری که thread نوشتن هنوز rollup آن را اعمال نکرده است
+        DetectionHistory.objects.create(input_text='new text', detected_language=language, confidence_score=0.5)
+
+        rollups.rebuild(since=now - timedelta(days=1))
+
+        closed = rollups.bucket_start(now - timedelta(hours=3), DetectionRollup.PERIOD_HOUR)
+        hourly = DetectionRollup.objects.filter(period=DetectionRollup.PERIOD_HOUR)
+        self.assertEqual(hourly.get(bucket_start=closed).count, 2)
+        self.assertFalse(hourly.filter(bucket_start__gte=rollups.closed_cutoff()).exists())
+
+
+class TrainingJobOwnershipTests(TestCase):
+    """worker کند پس از بازگشت کار به صف و برداشتن آن توسط worker دیگر نتیجه‌ای ثبت نمی‌کند"""
+
+    def test_requeued_job_result_is_discarded(self):
+        TrainingJob.objects.create(parameters={})
+        job = training_jobs.claim_next(worker='slow')
+        self.assertEqual(training_jobs.recover_stale(timeout=-1), (1, 0))
+        other = training_jobs.claim_next(worker='fast')
+
+        with mock.patch.object(training_jobs, 'LanguageDetector') as factory, \
+                mock.patch.object(training_jobs.registry, 'swap') as swap:
+            factory.return_value.train_model.return_value = 0.9
+            self.assertFalse(training_jobs.run_job(job))
+
+        other.refresh_from_db()
+        self.assertEqual((other.status, other.worker), ('running', 'fast'))
+        self.assertFalse(ModelTrainingLog.objects.exists())
+        factory.return_value.activate_saved.assert_not_called()
+        swap.assert_not_called()
+
+
+def _baseline_preprocess(text):
+    """پیش‌پردازش نسخه اول LanguageDetector (سه re.sub جداگانه) برای مقایسه"""
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\d+', '', text)
+    text = text.lower().strip()
+    return re.sub(r'\s+', ' ', text)
+
+
+class NormalizeTextTests(SimpleTestCase):
+    """normalize_text و VocabularyFeatures همان ویژگی‌های پیش‌پردازش و CountVectorizer قبلی را تولید می‌کنند"""
+
+    texts = [
+        'Hello, World! 123 abc',
+        'سلام، دنیا! ۱۲۳ متن۴۵۶فارسی',
+        "İstanbul'da ÇAY içtim.",
+        'mixed中文and日本語テキスト 42',
+        '١٢٣ عربي٤٥٦ text-with-dashes',
+        'under_score snake_case__x',
+        'tabs\tand\nnewlines nbsp  ',
+        'emoji 😀 here!!! ...',
+        '  ---  ',
+        'a1b2c3 d.4e',
+        'ß ẞ Σίσυφος ΣΊΣΥΦΟΣ',
+        'x²³ y½ z⁴',
+    ]
+
+    def test_normalize_text_matches_baseline(self):
+        for text in self.texts:
+            with self.subTest(text=text):
+                self.assertEqual(normalize_text(text), _baseline_preprocess(text))
+
+    def test_vocabulary_features_match_count_vectorizer(self):
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        baseline = [_baseline_preprocess(text) for text in self.texts]
+        vectorizer = CountVectorizer(ngram_range=(1, 2)).fit(baseline)
+        features = VocabularyFeatures.from_vectorizer(vectorizer)
+        normalized, matrix = features.featurize(self.texts)
+        self.assertEqual(normalized, baseline)
+        np.testing.assert_array_equal(matrix.toarray(), vectorizer.transform(baseline).toarray())
+
+
+class ModelArtifactTests(SimpleTestCase):
+    """ذخیره و بارگذاری فایل .ldm و برابری امتیازها با مدل scikit-learn"""
+
+    train_texts = [
+        'the cat sat on the mat', 'a quick brown fox jumps', 'hello world how are you',
+        'le chat est sur le tapis', 'bonjour le monde comment allez vous', 'un renard brun rapide',
+        'der hund ist im garten', 'hallo welt wie geht es dir', 'ein schneller brauner fuchs',
+    ]
+    train_labels = ['english'] * 3 + ['french'] * 3 + ['german'] * 3
+    test_texts = ['the fox and the cat', 'le monde du chat', 'wie geht es dem hund', 'unknown words only']
+
+    def setUp(self):
+        from sklearn.feature_extraction.text import CountVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+
+        self.vectorizer = CountVectorizer(ngram_range=(1, 2))
+        X = self.vectorizer.fit_transform([normalize_text(text) for text in self.train_texts])
+        self.estimator = MultinomialNB().fit(X, self.train_labels)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, model_store.ARTIFACT_NAME)
+        self.header = model_store.save_artifact(
+            self.path, NaiveBayesScorer.from_estimator(self.estimator),
+            VocabularyFeatures.from_vectorizer(self.vectorizer), metadata={'feedback_id': 7},
+        )
+
+    def test_round_trip_matches_sklearn(self):
+        scorer, features, header = model_store.load_artifact(self.path)
+        self.assertEqual(list(header['classes']), list(self.estimator.classes_))
+        self.assertEqual(header['metadata'], {'feedback_id': 7})
+        self.assertEqual(header['checksum']['digest'], self.header['checksum']['digest'])
+
+        _, X = features.featurize(self.test_texts)
+        expected = self.estimator.predict_log_proba(
+            self.vectorizer.transform([normalize_text(text) for text in self.test_texts])
+        )
+        np.testing.assert_allclose(scorer.predict_log_proba(X), expected, rtol=1e-10, atol=1e-12)
+        self.assertEqual(list(scorer.predict(X)), list(self.estimator.predict(self.vectorizer.transform(
+            [normalize_text(text) for text in self.test_texts]
+        ))))
+
+    def test_checksum_mismatch_is_rejected(self):
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+        with self.assertRaisesMessage(model_store.ModelFormatError, 'checksum'):
+            model_store.load_artifact(self.path)
+
+    def test_detector_does_not_fall_back_to_pickles(self):
+        os.makedirs(model_versions.version_dir(self.directory, 'v1'))
+        os.replace(self.path, model_versions.artifact_path(self.directory, 'v1'))
+        model_versions.set_active_version(self.directory, 'v1')
+        with open(model_versions.artifact_path(self.directory, 'v1'), 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\x00' if f.read(1) != b'\x00' else b'\x01')
+        # فایل‌های pickle سالم نباید جایگزین مدل فعال خراب شوند
+        for name, value in (('language_model.pkl', self.estimator), ('vectorizer.pkl', self.vectorizer),
+                            ('languages.pkl', list(self.estimator.classes_))):
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                pickle.dump(value, f)
+
+        detector = LanguageDetector()
+        detector.model_path = self.directory
+        with self.assertRaises(model_store.ModelFormatError), self.assertLogs('detection.language_detector', 'ERROR'):
+            detector.load_model()
+        self.assertIsNone(detector.model)
+
+
+def _small_detector(labels=None, model_version='test'):
+    """تشخیص‌دهنده کوچک آموزش‌دیده روی داده‌های ModelArtifactTests (بدون فایل مدل)"""
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+
+    texts = ModelArtifactTests.train_texts
+    vectorizer = CountVectorizer().fit(texts)
+    model = MultinomialNB().fit(vectorizer.transform(texts), labels or ModelArtifactTests.train_labels)
+    detector = LanguageDetector()
+    detector._set_vectorizer(VocabularyFeatures.from_vectorizer(vectorizer))
+    detector._set_model(NaiveBayesScorer.from_estimator(model))
+    detector.languages = [str(label) for label in model.classes_]
+    detector.model_version = model_version
+    return detector
+
+
+class _BlockingDetector:
+    """تشخیص‌دهنده ساختگی که دسته‌ها را تا آزاد شدن release نگه می‌دارد"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def predict_many(self, texts, top_k=None):
+        self.started.set()
+        self.release.wait(5)
+        return [{'predicted_language': 'batched', 'text': text} for text in texts]
+
+    def predict_with_confidence(self, text, top_k=None):
+        return {'predicted_language': 'direct', 'text': text}
+
+
+class MicroBatcherTests(SimpleTestCase):
+    """مسیر مستقیم، برابری نتایج دسته با تشخیص مستقیم، timeout و پر بودن صف"""
+
+    def test_lone_request_is_detected_directly(self):
+        detector = _small_detector()
+        batcher = MicroBatcher(detector_getter=lambda: detector)
+        result = batcher.predict('the quick fox')
+        self.assertEqual(result, detector.predict_with_confidence('the quick fox'))
+        self.assertEqual((batcher.direct, batcher.batches), (1, 0))
+        self.assertIsNone(batcher._thread)
+
+    def test_batched_results_match_direct_prediction(self):
+        detector = _small_detector()
+        batcher = MicroBatcher(detector_getter=lambda: detector)
+        texts = ModelArtifactTests.test_texts
+        futures = [batcher.submit(text, top_k=2) for text in texts]
+        results = [future.result(5) for future in futures]
+        self.assertEqual(results, [detector.predict_with_confidence(text, top_k=2) for text in texts])
+        self.assertEqual(batcher.items, len(texts))
+
+    def test_timeout_falls_back_to_direct_prediction(self):
+        detector = _BlockingDetector()
+        self.addCleanup(detector.release.set)
+        batcher = MicroBatcher(detector_getter=lambda: detector)
+        # یک تشخیص دیگر در جریان است؛ بنابراین درخواست در صف قرار می‌گیرد
+        batcher._enter()
+        with self.assertLogs('detection.batching', 'WARNING'):
+            result = batcher.predict('slow text', timeout=0.05)
+        self.assertEqual(result['predicted_language'], 'direct')
+        self.assertEqual(batcher.timeouts, 1)
+
+    def test_full_queue_raises_inference_busy(self):
+        detector = _BlockingDetector()
+        self.addCleanup(detector.release.set)
+        batcher = MicroBatcher(max_queue_size=1, detector_getter=lambda: detector)
+        batcher.submit('first')
+        self.assertTrue(detector.started.wait(5))
+        batcher.submit('queued')
+        with self.assertRaises(InferenceBusy):
+            batcher.submit('rejected')
+        self.assertEqual(batcher.rejected, 1)
+
+
+class KeysetPaginationTests(TestCase):
+    """صفحه‌بندی keyset تاریخچه روی (created_at، id)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='password')
+        language = Language.objects.create(code='english', name='English', native_name='English')
+        records = DetectionHistory.objects.bulk_create([
+            DetectionHistory(user=self.user, input_text=f'text {i}', detected_language=language, confidence_score=0.5)
+            for i in range(7)
+        ])
+        # چهار رکورد با created_at یکسان؛ ترتیب آن‌ها فقط با id تعیین می‌شود
+        moment = timezone.now()
+        for i, record in enumerate(records):
+            DetectionHistory.objects.filter(pk=record.pk).update(
+                created_at=moment if i < 4 else moment + timedelta(seconds=i)
+            )
+        self.queryset = DetectionHistory.objects.filter(user=self.user)
+        self.expected = list(self.queryset.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_cursor_round_trip(self):
+        detection = self.queryset.first()
+        for direction in (pagination.NEXT, pagination.PREVIOUS):
+            self.assertEqual(
+                pagination.decode_cursor(pagination.encode_cursor(detection, direction)),
+                (direction, detection.created_at, detection.pk),
+            )
+
+    def test_pages_cover_ties_in_order(self):
+        seen = []
+        page = pagination.keyset_page(self.queryset, page_size=2)
+        pages = [page]
+        while page.has_next:
+            page = pagination.keyset_page(self.queryset, page.next_cursor, page_size=2)
+            pages.append(page)
+        for page in pages:
+            seen.extend(detection.pk for detection in page)
+        self.assertEqual(seen, self.expected)
+
+        # بازگشت از صفحه آخر همان صفحه‌های قبلی را برمی‌گرداند
+        previous = pagination.keyset_page(self.queryset, pages[-1].previous_cursor, page_size=2)
+        self.assertEqual([detection.pk for detection in previous], [detection.pk for detection in pages[-2]])
+
+    def test_invalid_cursor_is_rejected(self):
+        valid = pagination.encode_cursor(self.queryset.first())
+        tampered = base64.urlsafe_b64encode(b'x|not-a-date|1').decode('ascii')
+        naive = base64.urlsafe_b64encode(b'n|2025-01-01T00:00:00|1').decode('ascii')
+        for cursor in ('!!!', valid[:-3], tampered, naive):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                pagination.keyset_page(self.queryset, cursor)
+
+
+class HistoryWriterTests(TestCase):
+    """سیاست‌های پر شدن صف write-behind و نوشتن باقی‌مانده صف هنگام توقف"""
+
+    def setUp(self):
+        self.language = Language.objects.create(code='english', name='English', native_name='English')
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+
+    def writer(self, policy, **options):
+        writer = DetectionHistoryWriter(max_queue_size=2, overflow_policy=policy, **options)
+        # thread پس‌زمینه صف را خالی نمی‌کند تا پر شدن آن قطعی باشد
+        writer._run = lambda: self.gate.wait(5)
+        return writer
+
+    def submit(self, writer, *texts):
+        writer.submit([
+            build_detection(input_text=text, detected_language=self.language, confidence_score=0.5)
+            for text in texts
+        ])
+
+    def written(self):
+        return sorted(DetectionHistory.objects.values_list('input_text', flat=True))
+
+    def test_drop_oldest(self):
+        writer = self.writer('drop_oldest')
+        self.submit(writer, 'a', 'b', 'c')
+        writer.flush()
+        self.assertEqual(writer.dropped, 1)
+        self.assertEqual(self.written(), ['b', 'c'])
+
+    def test_drop_newest(self):
+        writer = self.writer('drop_newest')
+        self.submit(writer, 'a', 'b', 'c')
+        writer.flush()
+        self.assertEqual(writer.dropped, 1)
+        self.assertEqual(self.written(), ['a', 'b'])
+
+    def test_block_waits_then_drops(self):
+        writer = self.writer('block', block_timeout=0.02)
+        start = time.monotonic()
+        self.submit(writer, 'a', 'b', 'c')
+        self.assertGreaterEqual(time.monotonic() - start, 0.02)
+        writer.flush()
+        self.assertEqual(writer.dropped, 1)
+        self.assertEqual(self.written(), ['a', 'b'])
+
+    def test_sync_writes_overflow_immediately(self):
+        writer = self.writer('sync')
+        self.submit(writer, 'a', 'b', 'c')
+        self.assertEqual(self.written(), ['c'])
+        writer.flush()
+        self.assertEqual((writer.dropped, writer.written), (0, 3))
+        self.assertEqual(self.written(), ['a', 'b', 'c'])
+
+    def test_stop_flushes_queue(self):
+        writer = self.writer('drop_oldest')
+        self.submit(writer, 'a', 'b')
+        self.gate.set()
+        writer.stop()
+        self.assertEqual(writer.pending(), 0)
+        self.assertEqual(self.written(), ['a', 'b'])
+
+
+class ResultCacheInvalidationTests(SimpleTestCase):
+    """نتایج cache شده مدل قبلی پس از نسخه جدید مدل یا clear برگردانده نمی‌شوند"""
+
+    text = 'bonjour le monde'
+
+    def setUp(self):
+        result_cache.clear()
+        self.addCleanup(result_cache.clear)
+
+    def test_repeated_text_is_served_from_cache(self):
+        detector = _small_detector(model_version='v1')
+        first = detector.predict_with_confidence(self.text)
+        hits = result_cache.hits
+        self.assertEqual(detector.predict_with_confidence(self.text), first)
+        self.assertEqual(result_cache.hits, hits + 1)
+
+    def test_new_model_version_does_not_serve_old_results(self):
+        old = _small_detector(model_version='v1')
+        self.assertEqual(old.predict_with_confidence(self.text)['predicted_language'], 'french')
+        # مدل بازآموزی شده با برچسب‌های جابه‌جا شده و نسخه جدید
+        labels = ['german'] * 3 + ['english'] * 3 + ['french'] * 3
+        retrained = _small_detector(labels=labels, model_version='v2')
+        self.assertEqual(retrained.predict_with_confidence(self.text)['predicted_language'], 'english')
+
+    def test_clear_drops_cached_results(self):
+        detector = _small_detector(model_version='v1')
+        expected = detector.predict_with_confidence(self.text)
+        # جایگزینی مقدار cache شده با نتیجه کهنه، مثل نتیجه مدل قبلی با همان نسخه
+        key = result_cache.make_key('v1', detector.preprocess_text(self.text), None)
+        result_cache.set(key, ('stale', 1.0, (('stale', 1.0),)))
+        self.assertEqual(detector.predict_with_confidence(self.text)['predicted_language'], 'stale')
+        result_cache.clear()
+        self.assertEqual(detector.predict_with_confidence(self.text), expected)
+
+
+class APIUsageEndpointTests(TestCase):
+    """endpoint رکوردهای APIUsage الگوی URL است تا تعداد مقادیر آن محدود بماند"""
+
+    def submitted_endpoints(self, *paths):
+        # Client تازه تا middleware با تنظیمات فعلی ساخته شود
+        client = Client()
+        with mock.patch.object(usage.usage_writer, 'submit') as submit:
+            for path in paths:
+                client.get(path)
+        return [call.args[0][1] for call in submit.call_args_list]
+
+    def test_path_parameters_share_the_route(self):
+        self.assertEqual(self.submitted_endpoints('/api/languages/?x=1'), ['/api/languages/'])
+        with override_settings(DETECTION_API_USAGE={'PATH_PREFIXES': ('/analytics/api/',)}):
+            self.assertEqual(
+                self.submitted_endpoints('/analytics/api/timeseries/a/', '/analytics/api/timeseries/b/'),
+                ['/analytics/api/timeseries/<str:metric>/'] * 2,
+            )
+
+    def test_unresolved_paths_share_one_label(self):
+        self.assertEqual(
+            self.submitted_endpoints('/api/no-such-path/1/', '/api/no-such-path/2/'),
+            [usage.UNRESOLVED_ENDPOINT, usage.UNRESOLVED_ENDPOINT],
+        )
+
+
+@override_settings(DETECTION_HISTORY_WRITE_BEHIND={'ENABLED': False}, DETECTION_API_USAGE={'ENABLED': False})
+class BatchDetectAPITests(TestCase):
+    """متن خالی در api/detect/batch/ فقط همان مورد را ناموفق می‌کند"""
+
+    def setUp(self):
+        language_catalog.clear()
+        self.addCleanup(language_catalog.clear)
+
+    def test_blank_text_gets_per_item_error(self):
+        texts = ['hello world how are you', '   ', 'bonjour le monde']
+        with mock.patch('api.views.get_detector', return_value=_small_detector()):
+            response = self.client.post(reverse('api_detect_batch'), {'texts': texts}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual([r['language_code'] for r in results], ['english', None, 'french'])
+        self.assertIn('error', results[1])
+        self.assertNotIn('error', results[0])
+        self.assertEqual(DetectionHistory.objects.count(), 2)
@@ -0,0 +1,320 @@
+"""
+اجرای آموزش مدل در پس‌زمینه با صف مبتنی بر پایگاه‌داده
+
+درخواست آموزش فقط یک TrainingJob در وضعیت queued ثبت می‌کند. کارها یا توسط پروسس
+جداگانه دستور run_training_worker (DETECTION_TRAINING_WORKER = 'external'، پیش‌فرض) یا
+توسط یک thread پس‌زمینه در همان پروسس وب ('thread') اجرا می‌شوند. برداشتن کار با
+UPDATE شرطی روی status انجام می‌شود تا هر کار حتی با چند worker فقط یک بار اجرا شود.
+
+worker در حین اجرا heartbeat_at کار را به‌روز می‌کند. اگر پروسس worker وسط آموزش از
+بین برود (مثلاً restart پروسس وب در حالت thread)، کار پس از
+DETECTION_TRAINING_STALE_TIMEOUT ثانیه بدون heartbeat دوباره در صف قرار می‌گیرد یا پس
+از DETECTION_TRAINING_MAX_ATTEMPTS تلاش ناموفق ثبت می‌شود.
+
+پس از آموزش، مدل جدید به عنوان یک نسخه جدید ذخیره و اشاره‌گر نسخه فعال به صورت
+اتمیک جابه‌جا می‌شود؛ registry پروسس‌های دیگر تغییر اشاره‌گر را تشخیص می‌دهند و مدل
+جدید را بارگذاری می‌کنند.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .language_detector import LanguageDetector
+from .models import ModelTrainingLog, TrainingJob
+from .registry import registry
+from .result_cache import result_cache
+
+
+logger = logging.getLogger(__name__)
+
+# فاصله به‌روزرسانی heartbeat کار در حال اجرا (ثانیه)
+HEARTBEAT_INTERVAL = 30
+
+
+def get_mode():
+    return getattr(settings, 'DETECTION_TRAINING_WORKER', 'external')
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(user=None, **parameters):
+    """
+    ثبت یک کار آموزش در صف
+
+    اگر کاری با همین پارامترها هنوز در صف باشد همان برگردانده می‌شود.
+    """
+    job = TrainingJob.objects.filter(status='queued', parameters=parameters).order_by('created_at').first()
+    if job is None:
+        job = TrainingJob.objects.create(
+            created_by=user if user is not None and user.is_authenticated else None,
+            parameters=parameters,
+        )
+    if get_mode() == 'thread':
+        # worker پس از commit بیدار می‌شود تا رکورد کار را ببیند
+        transaction.on_commit(training_worker.wake)
+    return job
+
+
+def claim_next(worker=None):
+    """برداشتن قدیمی‌ترین کار در صف؛ None اگر صف خالی باشد"""
+    while True:
+        job = TrainingJob.objects.filter(status='queued').order_by('created_at', 'id').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = TrainingJob.objects.filter(pk=job.pk, status='queued').update(
+            status='running',
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+            worker=worker or worker_name(),
+            stage='شروع آموزش',
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def recover_stale(timeout=None, max_attempts=None):
+    """
+    بازگرداندن کارهای رها شده (running بدون heartbeat اخیر) به صف
+
+    کارهایی که به سقف تلاش رسیده‌اند ناموفق ثبت می‌شوند.
+    خروجی: (تعداد کارهای بازگشته به صف، تعداد کارهای ناموفق)
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'DETECTION_TRAINING_STALE_TIMEOUT', 300)
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'DETECTION_TRAINING_MAX_ATTEMPTS', 2)
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=timeout)
+    stale = TrainingJob.objects.filter(status='running').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status='failed',
+        error='worker آموزش پیش از پایان کار متوقف شد',
+        finished_at=now,
+    )
+    requeued = stale.update(
+        status='queued',
+        progress=0.0,
+        stage='بازگشت به صف پس از توقف worker',
+        worker='',
+        started_at=None,
+        heartbeat_at=None,
+    )
+    if requeued or failed:
+        logger.warning('%d کار آموزش رها شده دوباره در صف قرار گرفت و %d کار ناموفق ثبت شد', requeued, failed)
+    return requeued, failed
+
+
+def is_stale(job, timeout=None):
+    """آیا کار در حال اجرا heartbeat اخیر ندارد"""
+    if job.status != 'running':
+        return False
+    if timeout is None:
+        timeout = getattr(settings, 'DETECTION_TRAINING_STALE_TIMEOUT', 300)
+    last_seen = job.heartbeat_at or job.started_at
+    return last_seen is None or timezone.now() - last_seen > timedelta(seconds=timeout)
+
+
+class Heartbeat:
+    """thread به‌روزرسانی heartbeat_at کار در حال اجرا (با اتصال پایگاه‌داده جداگانه)"""
+
+    def __init__(self, job, interval=HEARTBEAT_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='detection-training-heartbeat', daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stopping.wait(self.interval):
+                _owned(self.job).update(heartbeat_at=timezone.now())
+        except Exception:
+            logger.exception('خطا در ثبت heartbeat کار آموزش %s', self.job.pk)
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopping.set()
+        self._thread.join()
+
+
+class JobProgress:
+    """ثبت پیشرفت آموزش در رکورد کار (حداکثر هر interval ثانیه یک UPDATE)"""
+
+    def __init__(self, job, interval=0.5):
+        self.job = job
+        self.interval = interval
+        self._written_at = None
+
+    def __call__(self, fraction, stage):
+        now = time.monotonic()
+        if self._written_at is not None and now - self._written_at < self.interval:
+            return
+        self._written_at = now
+        _owned(self.job).update(progress=fraction, stage=stage[:200])
+
+
+def record_training(detector, accuracy, training_time, user=None):
+    """ثبت ModelTrainingLog فعال برای مدلی که تازه آموزش داده و ذخیره شده است"""
+    if detector.artifact_version is None:
+        raise Exception('ذخیره مدل آموزش داده شده ناموفق بود')
+    return ModelTrainingLog.objects.create(
+        # نام نسخه همان نام پوشه مدل روی دیسک است (برای rollback)
+        version=detector.artifact_version,
+        accuracy=accuracy,
+        training_samples=detector.training_samples,
+        training_time=training_time,
+        parameters={**detector.training_parameters(), 'model_version': detector.model_version},
+        is_active=True,
+        created_by=user,
+    )
+
+
+def activate_version(version):
+    """
+    فعال‌سازی یک نسخه ذخیره شده مدل (rollback یا بازگشت به نسخه جدیدتر)
+
+    اشاره‌گر نسخه فعال جابه‌جا و مدل در این پروسس بارگذاری می‌شود؛ ModelTrainingLog
+    همان نسخه (در صورت وجود) فعال علامت می‌خورد.
+    """
+    detector = registry.activate(version)
+    result_cache.clear()
+    training_log = ModelTrainingLog.objects.filter(version=version).order_by('-created_at').first()
+    if training_log is not None:
+        training_log.is_active = True
+        training_log.save()
+    else:
+        ModelTrainingLog.objects.filter(is_active=True).update(is_active=False)
+    return detector
+
+
+def _owned(job):
+    """
+    کار هنوز در اختیار همین اجرا است
+
+    اگر کار پس از توقف heartbeat با recover_stale به صف بازگشته و دوباره برداشته شده
+    باشد، worker یا attempts آن عوض شده است و نتیجه این اجرا ثبت نمی‌شود.
+    """
+    return TrainingJob.objects.filter(pk=job.pk, status='running', worker=job.worker, attempts=job.attempts)
+
+
+def run_job(job):
+    """اجرای یک کار برداشته شده و ثبت نتیجه آن در TrainingJob و ModelTrainingLog"""
+    parameters = job.parameters
+    try:
+        detector = LanguageDetector(feature_backend=parameters.get('feature_backend'))
+        start_time = time.time()
+        with Heartbeat(job):
+            # نسخه جدید فقط پس از تأیید مالکیت کار فعال می‌شود
+            accuracy = detector.train_model(
+                corpus_path=parameters.get('corpus_path'),
+                chunk_size=parameters.get('chunk_size'),
+                progress=JobProgress(job),
+                activate=False,
+            )
+        training_time = time.time() - start_time
+
+        with transaction.atomic():
+            if not _owned(job).select_for_update().exists():
+                logger.warning('کار آموزش %s به worker دیگری سپرده شده است؛ نتیجه این اجرا ثبت نمی‌شود', job.pk)
+                return False
+            training_log = record_training(detector, accuracy, training_time, user=job.created_by)
+            _owned(job).update(
+                status='succeeded',
+                progress=1.0,
+                stage=f'پایان: دقت {accuracy:.2%}',
+                training_log=training_log,
+                finished_at=timezone.now(),
+            )
+            detector.activate_saved()
+
+        # جایگزینی مدل مشترک این پروسس؛ پروسس‌های دیگر تغییر نسخه فعال را تشخیص می‌دهند
+        registry.swap(detector)
+    except Exception as e:
+        logger.exception('خطا در اجرای کار آموزش %s', job.pk)
+        if not _owned(job).update(status='failed', error=str(e), finished_at=timezone.now()):
+            logger.warning('کار آموزش %s به worker دیگری سپرده شده است؛ خطای این اجرا ثبت نمی‌شود', job.pk)
+        return False
+    return True
+
+
+def run_pending(worker=None):
+    """
+    اجرای کارهای موجود در صف تا خالی شدن آن؛ خروجی: تعداد کارهای اجرا شده
+
+    پیش از برداشتن کارها، کارهای رها شده توسط workerهای متوقف شده به صف بازگردانده می‌شوند.
+    """
+    close_old_connections()
+    recover_stale()
+    count = 0
+    while True:
+        close_old_connections()
+        job = claim_next(worker)
+        if job is None:
+            return count
+        run_job(job)
+        count += 1
+
+
+class TrainingWorker:
+    """
+    thread پس‌زمینه اجرای کارهای آموزش در پروسس وب
+
+    با ثبت کار بیدار می‌شود، کارهای صف را یکی‌یکی اجرا می‌کند و پس از خالی شدن صف
+    متوقف می‌شود؛ بنابراین در زمان بیکاری هیچ thread یا کوئری دوره‌ای وجود ندارد.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._pending = False
+
+    def wake(self):
+        with self._lock:
+            self._pending = True
+            # پس از fork (مثلاً gunicorn --preload) thread والد در فرزند وجود ندارد
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='detection-training-worker', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                self._pending = False
+            try:
+                run_pending()
+            except Exception:
+                logger.exception('خطا در worker آموزش')
+            finally:
+                close_old_connections()
+
+    def is_running(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+
+training_worker = TrainingWorker()
@@ -9,6 +9,7 @@ urlpatterns = [
     
     # API endpoint
     path('api/detect/', views.detect_api, name='detect_api'),
+    path('api/detect/async/', views.detect_api_async, name='detect_api_async'),
     
     # تاریخچه تشخیص‌ها (نیاز به ورود)
     path('history/', views.history, name='history'),
@@ -24,4 +25,5 @@ urlpatterns = [
     
     # آموزش مدل (فقط ادمین)
     path('train/', views.train_model, name='train_model'),
+    path('train/jobs/<int:job_id>/', views.training_job_status, name='training_job_status'),
 ]
\ No newline at end of file
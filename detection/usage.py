@@ -0,0 +1,295 @@
+"""
+ثبت نمونه‌برداری شده و دسته‌ای استفاده از API در مدل APIUsage
+
+APIUsageMiddleware برای درخواست‌های مسیرهای PATH_PREFIXES با احتمال SAMPLE_RATE
+مقادیر خام یک رکورد APIUsage را در یک بافر درون پروسس قرار می‌دهد. یک thread
+پس‌زمینه بافر را هر FLUSH_INTERVAL ثانیه (یا با رسیدن به BATCH_SIZE رکورد) با
+bulk_create می‌نویسد؛ بنابراین هزینه هر درخواست چند میکروثانیه است و هیچ درخواستی
+منتظر پایگاه‌داده نمی‌ماند. در صورت پر بودن بافر (MAX_BUFFER_SIZE) قدیمی‌ترین
+رکوردها کنار گذاشته می‌شوند.
+
+نمونه‌برداری یکنواخت است؛ صدک‌های زمان پاسخ بدون تغییر معتبرند و تعداد کل
+درخواست‌ها از تقسیم تعداد رکوردها بر SAMPLE_RATE تخمین زده می‌شود. هر دسته پس از
+نوشتن به rollupهای ساعتی زمان پاسخ (APIUsageRollup) هم افزوده می‌شود.
+
+endpoint هر رکورد الگوی URL مسیر است (مثلاً /api/history/) نه مسیر خام درخواست، تا
+تعداد مقادیر متمایز آن (و ردیف‌های rollup) به تعداد الگوهای URL محدود بماند؛ همه
+درخواست‌هایی که به هیچ الگویی نمی‌رسند با برچسب UNRESOLVED_ENDPOINT ثبت می‌شوند.
+"""
+import atexit
+import ipaddress
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import rollups
+from .models import APIUsage
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'PATH_PREFIXES': ('/api/', '/detection/api/'),
+    'SAMPLE_RATE': 1.0,
+    'MAX_BUFFER_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+}
+
+# برچسب endpoint برای درخواست‌هایی که به هیچ الگوی URL نمی‌رسند (مثلاً 404)
+UNRESOLVED_ENDPOINT = '<unresolved>'
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DETECTION_API_USAGE', {}))
+    return config
+
+
+class APIUsageWriter:
+    """
+    بافر رکوردهای APIUsage و نوشتن دسته‌ای آن‌ها در thread پس‌زمینه
+
+    افزودن به deque در CPython اتمیک است و به قفل نیاز ندارد؛ deque با maxlen
+    قدیمی‌ترین رکورد را هنگام پر بودن کنار می‌گذارد.
+    """
+
+    def __init__(self, max_buffer_size=10000, batch_size=500, flush_interval=2.0):
+        self.max_buffer_size = max_buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._buffer = deque(maxlen=max_buffer_size)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @classmethod
+    def from_settings(cls):
+        config = get_config()
+        return cls(
+            max_buffer_size=config['MAX_BUFFER_SIZE'],
+            batch_size=config['BATCH_SIZE'],
+            flush_interval=config['FLUSH_INTERVAL'],
+        )
+
+    def _ensure_started(self):
+        # پس از fork (مثلاً gunicorn --preload) thread والد در فرزند وجود ندارد
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._buffer.clear()
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='detection-api-usage-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, record):
+        """قرار دادن یک رکورد (آرگومان‌های build_usage به صورت tuple) در بافر"""
+        self._ensure_started()
+        if len(self._buffer) >= self.max_buffer_size:
+            self.dropped += 1
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._buffer.popleft())
+            except IndexError:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            # اتصال‌های منقضی فقط در thread پس‌زمینه بسته می‌شوند، نه در thread فراخواننده flush
+            close_old_connections()
+            self.flush()
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                objs = [build_usage(*row) for row in batch]
+                APIUsage.objects.bulk_create(objs, batch_size=self.batch_size)
+                self.written += len(batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception('خطا در ثبت %d رکورد استفاده از API', len(batch))
+                return
+            try:
+                rollups.apply_usage(objs)
+            except Exception:
+                # rollupها با دستور rollup_detections قابل بازسازی‌اند
+                logger.exception('خطا در به‌روزرسانی rollupهای استفاده از API')
+
+    def pending(self):
+        """تعداد رکوردهای منتظر در بافر"""
+        return len(self._buffer)
+
+    def flush(self):
+        """نوشتن همگام همه رکوردهای موجود در بافر"""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout=5.0):
+        """توقف thread پس‌زمینه و نوشتن باقی‌مانده بافر (هنگام خاموش شدن پروسس)"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        return {
+            'pending': self.pending(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+
+usage_writer = APIUsageWriter.from_settings()
+atexit.register(usage_writer.stop)
+
+
+def _client_ip(forwarded, remote_addr):
+    """IP کاربر (مانند get_client_ip)؛ مقدار نامعتبر X-Forwarded-For نوشتن دسته را خراب نکند"""
+    for candidate in (forwarded.split(',')[0].strip() if forwarded else None, remote_addr):
+        if not candidate:
+            continue
+        try:
+            return str(ipaddress.ip_address(candidate))
+        except ValueError:
+            continue
+    return '0.0.0.0'
+
+
+def endpoint_label(request):
+    """الگوی URL حل‌شده درخواست (مانند /api/detect/)؛ مقادیر متمایز آن محدودند"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.route:
+        return UNRESOLVED_ENDPOINT
+    return '/' + match.route
+
+
+def build_usage(created_at, endpoint, method, forwarded, remote_addr, user_agent, response_time,
+                status_code, content_length, response_size):
+    """
+    ساخت نمونه APIUsage از مقادیر خام ثبت شده در middleware
+
+    ساخت نمونه مدل و اعتبارسنجی‌ها در thread نوشتن انجام می‌شود تا مسیر درخواست
+    فقط یک tuple بسازد.
+    """
+    try:
+        request_size = int(content_length or 0)
+    except ValueError:
+        request_size = 0
+    return APIUsage(
+        endpoint=endpoint[:100],
+        method=method[:10],
+        ip_address=_client_ip(forwarded, remote_addr),
+        user_agent=user_agent,
+        response_time=response_time,
+        status_code=status_code,
+        request_size=request_size,
+        response_size=response_size,
+        created_at=created_at,
+    )
+
+
+def _response_size(response):
+    if response.streaming:
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
+
+
+class APIUsageMiddleware:
+    """
+    ثبت نمونه‌برداری شده استفاده از API
+
+    تصمیم نمونه‌برداری پیش از هر کار دیگری گرفته می‌شود؛ درخواست‌های انتخاب نشده
+    فقط یک مقایسه رشته و یک عدد تصادفی هزینه دارند. برای viewهای همگام و async
+    قابل استفاده است.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = get_config()
+        self.enabled = config['ENABLED'] and config['SAMPLE_RATE'] > 0
+        self.prefixes = tuple(config['PATH_PREFIXES'])
+        self.sample_rate = config['SAMPLE_RATE']
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self, request):
+        return (
+            self.enabled
+            and request.path.startswith(self.prefixes)
+            and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled(request):
+            return self.get_response(request)
+        start = time.perf_counter_ns()
+        response = self.get_response(request)
+        self._record(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled(request):
+            return await self.get_response(request)
+        start = time.perf_counter_ns()
+        response = await self.get_response(request)
+        self._record(request, response, start)
+        return response
+
+    def _record(self, request, response, start):
+        response_time = (time.perf_counter_ns() - start) / 1e6
+        try:
+            meta = request.META
+            usage_writer.submit((
+                timezone.now(),
+                endpoint_label(request),
+                request.method,
+                meta.get('HTTP_X_FORWARDED_FOR'),
+                meta.get('REMOTE_ADDR'),
+                meta.get('HTTP_USER_AGENT', ''),
+                response_time,
+                response.status_code,
+                meta.get('CONTENT_LENGTH'),
+                _response_size(response),
+            ))
+        except Exception:
+            # ثبت آمار هرگز پاسخ درخواست را خراب نمی‌کند
+            logger.exception('خطا در ثبت استفاده از API')
@@ -1,17 +1,22 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Count, Avg
-from django.utils import timezone
+from asgiref.sync import sync_to_async
 import json
 import time
 
-from .language_detector import LanguageDetector
-from .models import DetectionHistory, Language, UserFeedback
+from .executor import InferenceBusy, run_inference
+from .batching import detect_text, micro_batcher
+from .history_writer import alog_detection, log_detection
+from . import rollups, training_jobs
+from .language_catalog import language_catalog
+from .metrics import stage
+from .pagination import history_count, keyset_page
+from .result_cache import result_cache
+from .models import DetectionHistory, TrainingJob, UserFeedback
 from .forms import DetectionForm, FeedbackForm
 
 
@@ -26,7 +31,14 @@ def get_client_ip(request):
 
 
 def index(request):
-    """صفحه اصلی تشخیص زبان"""
+    """
+    صفحه اصلی تشخیص زبان
+
+    استثنای ثبت write-behind: برای کاربر وارد شده رکورد تاریخچه همگام (یک INSERT و
+    به‌روزرسانی rollup) نوشته می‌شود، چون لینک بازخورد صفحه نتیجه به شناسه آن نیاز
+    دارد. کاربران مهمان لینک بازخورد ندارند و ثبت آن‌ها از صف write-behind می‌گذرد؛
+    مسیرهای API هرگز منتظر پایگاه‌داده نمی‌مانند.
+    """
     form = DetectionForm()
     result = None
     
@@ -37,33 +49,30 @@ def index(request):
             
             try:
                 # تشخیص زبان
-                detector = LanguageDetector()
                 start_time = time.time()
-                prediction_result = detector.predict_with_confidence(text)
+                with stage('inference'):
+                    prediction_result = detect_text(text)
                 processing_time = time.time() - start_time
                 
                 if prediction_result['predicted_language']:
                     # پیدا کردن یا ایجاد زبان
-                    language, created = Language.objects.get_or_create(
-                        code=prediction_result['predicted_language'],
-                        defaults={
-                            'name': prediction_result['predicted_language'].title(),
-                            'native_name': prediction_result['predicted_language'].title()
-                        }
-                    )
+                    with stage('db_lookup'):
+                        language = language_catalog.get_or_create(prediction_result['predicted_language'])
                     
-                    # ذخیره در تاریخچه
-                    detection_history = DetectionHistory.objects.create(
-                        user=request.user if request.user.is_authenticated else None,
-                        input_text=text,
-                        detected_language=language,
-                        confidence_score=prediction_result['confidence'],
-                        processing_time=processing_time,
-                        ip_address=get_client_ip(request),
-                        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                        text_length=prediction_result['text_length'],
-                        word_count=len(text.split())
-                    )
+                    # ذخیره در تاریخچه؛ برای کاربر وارد شده همگام (استثنای write-behind) تا شناسه برای لینک بازخورد موجود باشد
+                    with stage('db_write'):
+                        detection_history = log_detection(
+                            sync=request.user.is_authenticated,
+                            user=request.user if request.user.is_authenticated else None,
+                            input_text=text,
+                            detected_language=language,
+                            confidence_score=prediction_result['confidence'],
+                            processing_time=processing_time,
+                            ip_address=get_client_ip(request),
+                            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                            text_length=prediction_result['text_length'],
+                            word_count=len(text.split())
+                        )
                     result = {
                         'detected_language': language.name,
                         'confidence': round(prediction_result['confidence']*100, 1),
@@ -84,7 +93,7 @@ def index(request):
     
     # آمار کلی برای نمایش
     total_detections = DetectionHistory.objects.count()
-    supported_languages = Language.objects.filter(is_active=True).count()
+    supported_languages = language_catalog.active_count()
     
     context = {
         'form': form,
@@ -96,59 +105,148 @@ def index(request):
     return render(request, 'detection/index.html', context)
 
 
+def _parse_detect_payload(body):
+    """
+    اعتبارسنجی بدنه JSON درخواست تشخیص
+
+    خروجی: (متن، top_k، پاسخ خطا یا None)؛ برای JSON نامعتبر JSONDecodeError
+    """
+    with stage('parse'):
+        data = json.loads(body)
+    text = data.get('text', '').strip()
+    
+    if not text:
+        return None, None, JsonResponse({
+            'error': 'متن ورودی خالی است',
+            'success': False
+        }, status=400)
+    
+    # تعداد زبان‌های محتمل در خروجی (اختیاری)
+    top_k = data.get('top_k')
+    if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1):
+        return None, None, JsonResponse({
+            'error': 'top_k باید عدد صحیح مثبت باشد',
+            'success': False
+        }, status=400)
+    
+    return text, top_k, None
+
+
+def run_detection(text, top_k=None):
+    """تشخیص زبان با مدل مشترک (از طریق micro-batching)؛ خروجی: (نتیجه، زمان پردازش)"""
+    start_time = time.time()
+    with stage('inference'):
+        result = detect_text(text, top_k)
+    return result, time.time() - start_time
+
+
+async def arun_detection(text, top_k=None):
+    """
+    نسخه async از run_detection
+
+    با micro-batching فعال، view بدون اشغال thread منتظر نتیجه دسته می‌ماند؛ در غیر
+    این صورت محاسبه در executor محدود انجام می‌شود.
+    """
+    if not micro_batcher.enabled:
+        return await run_inference(run_detection, text, top_k)
+    start_time = time.time()
+    with stage('inference'):
+        result = await micro_batcher.apredict(text, top_k)
+    return result, time.time() - start_time
+
+
+def _detection_fields(request, text, language, result, processing_time):
+    """فیلدهای رکورد تاریخچه برای ثبت یک تشخیص API"""
+    return {
+        'input_text': text,
+        'detected_language': language,
+        'confidence_score': result['confidence'],
+        'processing_time': processing_time,
+        'ip_address': get_client_ip(request),
+        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+        'text_length': result['text_length'],
+        'word_count': len(text.split())
+    }
+
+
+def _detection_response(text, language, result, processing_time):
+    with stage('serialize'):
+        return JsonResponse({
+            'success': True,
+            'detected_language': language.name,
+            'language_code': language.code,
+            'confidence': result['confidence'],
+            'all_probabilities': result['all_probabilities'],
+            'processing_time': processing_time,
+            'text_length': result['text_length'],
+            'word_count': len(text.split())
+        })
+
+
 @require_http_methods(["POST"])
 @csrf_exempt
 def detect_api(request):
     """API endpoint برای تشخیص زبان"""
     try:
-        # پارس کردن JSON
-        data = json.loads(request.body)
-        text = data.get('text', '').strip()
-        
-        if not text:
-            return JsonResponse({
-                'error': 'متن ورودی خالی است',
-                'success': False
-            }, status=400)
+        text, top_k, error_response = _parse_detect_payload(request.body)
+        if error_response is not None:
+            return error_response
         
         # تشخیص زبان
-        detector = LanguageDetector()
-        start_time = time.time()
-        result = detector.predict_with_confidence(text)
-        processing_time = time.time() - start_time
+        result, processing_time = run_detection(text, top_k)
         
         if result['predicted_language']:
             # پیدا کردن یا ایجاد زبان
-            language, created = Language.objects.get_or_create(
-                code=result['predicted_language'],
-                defaults={
-                    'name': result['predicted_language'].title(),
-                    'native_name': result['predicted_language'].title()
-                }
-            )
+            with stage('db_lookup'):
+                language = language_catalog.get_or_create(result['predicted_language'])
             
-            # ذخیره در تاریخچه
-            DetectionHistory.objects.create(
-                input_text=text,
-                detected_language=language,
-                confidence_score=result['confidence'],
-                processing_time=processing_time,
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                text_length=result['text_length'],
-                word_count=len(text.split())
-            )
+            # ذخیره در تاریخچه (write-behind)
+            with stage('db_write'):
+                log_detection(**_detection_fields(request, text, language, result, processing_time))
             
+            return _detection_response(text, language, result, processing_time)
+        
+        else:
             return JsonResponse({
-                'success': True,
-                'detected_language': language.name,
-                'language_code': language.code,
-                'confidence': result['confidence'],
-                'all_probabilities': result['all_probabilities'],
-                'processing_time': processing_time,
-                'text_length': result['text_length'],
-                'word_count': len(text.split())
-            })
+                'error': 'متن قابل تشخیص نیست',
+                'success': False
+            }, status=400)
+    
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'error': 'فرمت JSON نامعتبر',
+            'success': False
+        }, status=400)
+    
+    except Exception as e:
+        return JsonResponse({
+            'error': f'خطا در پردازش: {str(e)}',
+            'success': False
+        }, status=500)
+
+
+@require_http_methods(["POST"])
+@csrf_exempt
+async def detect_api_async(request):
+    """
+    نسخه async از detect_api برای اجرا با ASGI
+
+    محاسبه در executor محدود انجام می‌شود و event loop آزاد می‌ماند؛ در صورت پر
+    بودن ظرفیت executor پاسخ 503 برگردانده می‌شود.
+    """
+    try:
+        text, top_k, error_response = _parse_detect_payload(request.body)
+        if error_response is not None:
+            return error_response
+        
+        result, processing_time = await arun_detection(text, top_k)
+        
+        if result['predicted_language']:
+            with stage('db_lookup'):
+                language = await sync_to_async(language_catalog.get_or_create)(result['predicted_language'])
+            with stage('db_write'):
+                await alog_detection(**_detection_fields(request, text, language, result, processing_time))
+            return _detection_response(text, language, result, processing_time)
         
         else:
             return JsonResponse({
@@ -162,6 +260,12 @@ def detect_api(request):
             'success': False
         }, status=400)
     
+    except InferenceBusy as e:
+        return JsonResponse({
+            'error': str(e),
+            'success': False
+        }, status=503)
+    
     except Exception as e:
         return JsonResponse({
             'error': f'خطا در پردازش: {str(e)}',
@@ -172,16 +276,17 @@ def detect_api(request):
 @login_required
 def history(request):
     """نمایش تاریخچه تشخیص‌های کاربر"""
-    detections = DetectionHistory.objects.filter(user=request.user).order_by('-created_at')
+    detections = DetectionHistory.objects.filter(user=request.user).select_related('detected_language')
     
-    # صفحه‌بندی
-    paginator = Paginator(detections, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # صفحه‌بندی keyset: هزینه صفحه‌های عمیق با صفحه اول یکسان است
+    try:
+        page_obj = keyset_page(detections, request.GET.get('cursor'), page_size=10)
+    except ValueError:
+        page_obj = keyset_page(detections, page_size=10)
     
     context = {
         'page_obj': page_obj,
-        'total_detections': detections.count(),
+        'total_detections': history_count(request.user),
     }
     
     return render(request, 'detection/history.html', context)
@@ -189,42 +294,13 @@ def history(request):
 
 def statistics(request):
     """نمایش آمار عمومی"""
-    # آمار کلی
-    total_detections = DetectionHistory.objects.count()
-    total_users = DetectionHistory.objects.values('user').distinct().count()
-    
-    # آمار زبان‌ها
-    language_stats = DetectionHistory.objects.values(
-        'detected_language__name', 'detected_language__code'
-    ).annotate(
-        count=Count('id'),
-        avg_confidence=Avg('confidence_score')
-    ).order_by('-count')[:10]
-    
-    # آمار روزانه (7 روز گذشته)
-    from datetime import datetime, timedelta
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    daily_stats = DetectionHistory.objects.filter(
-        created_at__gte=seven_days_ago
-    ).extra(
-        select={'day': 'date(created_at)'}
-    ).values('day').annotate(
-        count=Count('id')
-    ).order_by('day')
-    
-    # میانگین زمان پردازش
-    avg_processing_time = DetectionHistory.objects.aggregate(
-        avg_time=Avg('processing_time')
-    )['avg_time'] or 0
-    
-    context = {
-        'total_detections': total_detections,
-        'total_users': total_users,
-        'language_stats': language_stats,
-        'daily_stats': daily_stats,
-        'avg_processing_time': avg_processing_time,
-        'supported_languages': Language.objects.filter(is_active=True).count(),
-    }
+    # همه آمار از جدول کوچک DetectionRollup خوانده می‌شود، نه از کل تاریخچه
+    context = rollups.summary(days=7, top_languages=10)
+    context.update({
+        'supported_languages': language_catalog.active_count(),
+        'result_cache': result_cache.stats(),
+        'micro_batching': micro_batcher.stats(),
+    })
     
     return render(request, 'detection/statistics.html', context)
 
@@ -272,61 +348,65 @@ def feedback(request, detection_id):
 
 
 def train_model(request):
-    """آموزش مجدد مدل (فقط برای ادمین)"""
+    """
+    آموزش مجدد مدل (فقط برای ادمین)
+    
+    آموزش در درخواست انجام نمی‌شود؛ یک کار در صف ثبت و وضعیت آن در همین صفحه
+    نمایش داده می‌شود.
+    """
     if not request.user.is_superuser:
         messages.error(request, 'شما دسترسی لازم را ندارید.')
         return redirect('detection:index')
     
     if request.method == 'POST':
-        try:
-            detector = LanguageDetector()
-            start_time = time.time()
-            accuracy = detector.train_model()
-            training_time = time.time() - start_time
-            
-            # ذخیره لاگ آموزش
-            from .models import ModelTrainingLog
-            ModelTrainingLog.objects.create(
-                version=f"v{timezone.now().strftime('%Y%m%d_%H%M%S')}",
-                accuracy=accuracy,
-                training_samples=0,  # باید از داده‌های واقعی محاسبه شود
-                training_time=training_time,
-                parameters={
-                    'algorithm': 'MultinomialNB',
-                    'vectorizer': 'CountVectorizer',
-                    'max_features': 5000
-                },
-                is_active=True,
-                created_by=request.user
-            )
-            
-            messages.success(request, f'مدل با موفقیت آموزش داده شد. دقت: {accuracy:.2%}')
-            
-        except Exception as e:
-            messages.error(request, f'خطا در آموزش مدل: {str(e)}')
+        job = training_jobs.enqueue(user=request.user)
+        messages.success(request, f'کار آموزش #{job.pk} در صف قرار گرفت.')
+        return redirect('detection:train_model')
+    
+    context = {
+        'jobs': TrainingJob.objects.select_related('training_log', 'created_by')[:10],
+        'worker_mode': training_jobs.get_mode(),
+    }
+    return render(request, 'detection/train_model.html', context)
+
+
+def training_job_status(request, job_id):
+    """وضعیت و پیشرفت یک کار آموزش (JSON برای به‌روزرسانی صفحه آموزش)"""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'دسترسی غیرمجاز', 'success': False}, status=403)
     
-    return render(request, 'detection/train_model.html')
+    job = get_object_or_404(TrainingJob.objects.select_related('training_log'), pk=job_id)
+    if training_jobs.is_stale(job):
+        # worker اجراکننده متوقف شده است؛ کار دوباره در صف قرار می‌گیرد (یا ناموفق ثبت می‌شود)
+        training_jobs.recover_stale()
+        if training_jobs.get_mode() == 'thread':
+            training_jobs.training_worker.wake()
+        job.refresh_from_db()
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'stage': job.stage,
+        'error': job.error,
+        'finished': job.is_finished,
+        'accuracy': job.training_log.accuracy if job.training_log else None,
+        'training_samples': job.training_log.training_samples if job.training_log else None,
+    })
 
 
 def supported_languages(request):
     """نمایش زبان‌های پشتیبانی شده"""
-    languages = Language.objects.filter(is_active=True).order_by('name')
+    languages = language_catalog.active()
     
-    # آمار هر زبان
-    language_stats = {}
-    for lang in languages:
-        stats = DetectionHistory.objects.filter(detected_language=lang).aggregate(
-            count=Count('id'),
-            avg_confidence=Avg('confidence_score')
-        )
-        language_stats[lang.id] = {
-            'count': stats['count'] or 0,
-            'avg_confidence': stats['avg_confidence'] or 0
-        }
+    # آمار همه زبان‌ها با یک کوئری روی rollupها (نه یک aggregate برای هر زبان)
+    totals = rollups.language_totals()
+    empty = {'count': 0, 'avg_confidence': 0}
+    language_stats = {lang.id: totals.get(lang.id, empty) for lang in languages}
     
     context = {
         'languages': languages,
         'language_stats': language_stats,
     }
     
-    return render(request, 'detection/supported_languages.html', context)
\ No newline at end of file
+    return render(request, 'detection/supported_languages.html', context)
@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'language_detection.settings')
 
 application = get_asgi_application()
+
+# بارگذاری یک‌باره مدل تشخیص زبان و فهرست زبان‌ها هنگام راه‌اندازی worker
+from detection.language_catalog import language_catalog  # noqa: E402
+from detection.registry import preload_detector  # noqa: E402
+
+preload_detector()
+language_catalog.warm()
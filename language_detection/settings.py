@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # اولین middleware تا زمان کل درخواست اندازه‌گیری شود
+    'detection.metrics.MetricsMiddleware',
+    'detection.usage.APIUsageMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,6 +87,16 @@ DATABASES = {
 }
 
 
+# cache مشترک بین همه پروسس‌ها و سرورها (جدول پایگاه‌داده؛ یک بار `python manage.py createcachetable`)
+# باطل‌سازی فهرست زبان‌ها و شمارش تقریبی تاریخچه به آن وابسته‌اند؛ LocMem پیش‌فرض جنگو فقط درون یک پروسس است
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -124,3 +137,105 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Language detection
+# بارگذاری مدل هنگام راه‌اندازی worker به جای اولین درخواست
+DETECTION_PRELOAD_MODEL = True
+
+# حداکثر تعداد متن در هر درخواست تشخیص دسته‌ای
+DETECTION_BATCH_MAX_SIZE = 1000
+
+# نوع ویژگی‌ها در آموزش مدل: 'bow' (کیسه کلمات) یا 'hashing' (n-gram کاراکتری)
+DETECTION_FEATURE_BACKEND = 'bow'
+DETECTION_HASHING_N_FEATURES = 2 ** 16
+
+# بررسی checksum فایل مدل memory-mapped هنگام بارگذاری
+DETECTION_MODEL_VERIFY_CHECKSUM = True
+
+# ثبت write-behind تاریخچه تشخیص‌ها (صف درون پروسس و bulk_create دسته‌ای در پس‌زمینه)
+# OVERFLOW_POLICY: 'drop_oldest' | 'drop_newest' | 'block' | 'sync'
+DETECTION_HISTORY_WRITE_BEHIND = {
+    'ENABLED': True,
+    'MAX_QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'OVERFLOW_POLICY': 'drop_oldest',
+}
+
+# فاصله (ثانیه) بررسی نسخه فهرست زبان‌ها در cache برای باطل‌سازی بین پروسس‌ها
+DETECTION_LANGUAGE_CATALOG_VERSION_CHECK_INTERVAL = 1.0
+
+# cache نتایج تشخیص برای متن‌های تکراری (LRU درون پروسس؛ BACKEND: نام یک cache در CACHES برای اشتراک بین پروسس‌ها)
+DETECTION_RESULT_CACHE = {
+    'ENABLED': True,
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+    'BACKEND': None,
+}
+
+# دوره نگهداری rollupهای ساعتی آمار (روز)؛ rollupهای روزانه همیشه نگهداری می‌شوند
+DETECTION_ROLLUP_HOURLY_RETENTION_DAYS = 30
+
+# تشخیص جریانی NDJSON: اندازه هر دسته پردازش و حداکثر طول هر خط ورودی (بایت)
+DETECTION_STREAM_BATCH_SIZE = 256
+DETECTION_STREAM_MAX_LINE_BYTES = 1024 * 1024
+
+# viewهای async تشخیص (ASGI): تعداد thread محاسبه و سقف درخواست‌های در انتظار (بیش از آن پاسخ 503)
+DETECTION_INFERENCE_WORKERS = 4
+DETECTION_INFERENCE_MAX_PENDING = 256
+
+# micro-batching درخواست‌های تشخیص تکی همزمان: حداکثر اندازه دسته، حداکثر انتظار برای تکمیل دسته (میلی‌ثانیه)، سقف صف
+# و حداکثر انتظار برای نتیجه دسته پیش از تشخیص مستقیم (میلی‌ثانیه)
+DETECTION_MICRO_BATCHING = {
+    'ENABLED': True,
+    'MAX_BATCH_SIZE': 64,
+    'MAX_WAIT_MS': 1.0,
+    'MAX_QUEUE_SIZE': 1024,
+    'TIMEOUT_MS': 5000,
+}
+
+# داده آموزشی: پوشه corpus (هر زبان یک فایل txt/jsonl یا پوشه shardها)، اندازه قطعه‌های آموزش جریانی (hashing) و سقف نمونه‌های آزمون در حافظه
+DETECTION_CORPUS_PATH = BASE_DIR / 'detection' / 'training_data'
+DETECTION_TRAINING_CHUNK_SIZE = 10000
+DETECTION_TRAINING_MAX_TEST_SAMPLES = 20000
+
+# اجرای کارهای آموزش مدل: 'external' (دستور run_training_worker در پروسس جداگانه) یا 'thread' (thread پس‌زمینه در
+# پروسس وب). آموزش پردازنده‌محور است؛ در حالت 'thread' همان پروسس‌های پاسخ‌گو را کند می‌کند و با هر restart یا
+# deploy پروسس وب قطع می‌شود (کار قطع شده پس از DETECTION_TRAINING_STALE_TIMEOUT دوباره در صف قرار می‌گیرد).
+# 'thread' فقط برای توسعه یا استقرار تک‌پروسسی بدون worker جداگانه مناسب است.
+DETECTION_TRAINING_WORKER = 'external'
+
+# کار در حال اجرایی که این مدت (ثانیه) heartbeat نداشته رها شده تلقی می‌شود و تا DETECTION_TRAINING_MAX_ATTEMPTS بار
+# دوباره در صف قرار می‌گیرد (سپس ناموفق ثبت می‌شود)
+DETECTION_TRAINING_STALE_TIMEOUT = 300
+DETECTION_TRAINING_MAX_ATTEMPTS = 2
+
+# فاصله بررسی تغییر فایل مدل برای بارگذاری خودکار مدل جدید در پروسس‌های سرویس‌دهی (ثانیه)
+DETECTION_MODEL_RELOAD_CHECK_INTERVAL = 2.0
+
+# تعداد نسخه‌های ذخیره شده مدل که برای rollback نگهداری می‌شوند (نسخه فعال هرگز حذف نمی‌شود)
+DETECTION_MODEL_KEEP_VERSIONS = 20
+
+# معیارهای تأخیر مراحل تشخیص در /metrics (قالب Prometheus): فعال بودن، IPهای مجاز (فقط REMOTE_ADDR؛ خالی: 404) و صدک‌های خروجی
+DETECTION_METRICS = {
+    'ENABLED': True,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'QUANTILES': (0.5, 0.9, 0.99, 0.999),
+}
+
+# ثبت استفاده از API در APIUsage: مسیرهای ثبت شده، نرخ نمونه‌برداری (0 تا 1)، اندازه بافر درون پروسس، اندازه دسته و فاصله نوشتن (ثانیه)
+DETECTION_API_USAGE = {
+    'ENABLED': True,
+    'PATH_PREFIXES': ('/api/', '/detection/api/'),
+    'SAMPLE_RATE': 1.0,
+    'MAX_BUFFER_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+}
+
+# مدت اعتبار پاسخ‌های API سری زمانی تحلیل‌ها در cache مرورگر (ثانیه)؛ پس از آن با ETag اعتبارسنجی می‌شوند
+ANALYTICS_TIMESERIES_MAX_AGE = 5
+
+# مدت نگهداری تعداد تقریبی تشخیص‌های هر کاربر (صفحه تاریخچه و api/history/) در cache (ثانیه)
+DETECTION_HISTORY_COUNT_CACHE_TIMEOUT = 60
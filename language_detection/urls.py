@@ -17,10 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from detection.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('detection/', include('detection.urls')),
     path('accounts/', include('accounts.urls')),
     path('analytics/', include('analytics.urls')),
+    # معیارهای تأخیر و توان عملیاتی با قالب Prometheus
+    path('metrics', metrics_view, name='metrics'),
 ]
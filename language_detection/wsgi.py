@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'language_detection.settings')
 
 application = get_wsgi_application()
+
+# بارگذاری یک‌باره مدل تشخیص زبان و فهرست زبان‌ها هنگام راه‌اندازی worker
+from detection.language_catalog import language_catalog  # noqa: E402
+from detection.registry import preload_detector  # noqa: E402
+
+preload_detector()
+language_catalog.warm()